@@ -1,71 +1,221 @@
-import tensorflow as tf
+"""
+Exports the trained Keras model to TFLite variants and compares them.
+
+    python Convert_Model.py
+    python Convert_Model.py --variants int8 pruned --sparsity 0.6 --deploy pruned
+
+Variants:
+  float32  plain conversion (reference)
+  float16  float16 weights, float32 compute
+  dynamic  int8 weights, activations quantized on the fly
+  int8     full integer, int8 input/output (what microcontrollers run)
+  pruned   magnitude-pruned to --sparsity, fine-tuned, then full int8;
+           needs tensorflow-model-optimization
+
+Features come from the cached feature file of the synthetic dataset
+(msitushield_model.load_feature_file; generated on first use): the int8
+calibration streams --representative-samples training windows from it and
+accuracy is measured on the held-out split used in training. For each
+variant the report gives test accuracy and its drop against the Keras
+model, file size (raw and gzipped; pruning only pays off compressed), the
+tensor arena an interpreter needs (peak of simultaneously live
+activations; float16 weights count too, being dequantized into it) and
+single-threaded latency per inference. Each variant is
+written to --out-dir, the report to <out-dir>/export_report.json, and the
+--deploy variant (int8 by default) to audio_classifier_quantized.tflite.
+"""
+import argparse
+import gzip
+import json
+import shutil
+import time
+from pathlib import Path
+
 import numpy as np
+import tensorflow as tf
+
+from msitushield_model import (
+    BATCH_SIZE, DATASET_PATH, N_SAMPLES_PER_CLASS, load_feature_file, make_feature_dataset, train_test_indices,
+)
+from streaming_detector import TFLiteModel
 
 # --- Configuration ---
 MODEL_H5_PATH = "audio_classifier.h5"
 MODEL_TFLITE_PATH = "audio_classifier_quantized.tflite"
+EXPORT_DIR = "exported_models"
+VARIANTS = ("float32", "float16", "dynamic", "int8", "pruned")
+
+# --- 1. Representative Dataset ---
+# The converter needs a sample of real inputs to calibrate the int8 ranges of
+# every activation. It is streamed from the cached feature file one window at
+# a time, so nothing is regenerated and the dataset never has to fit in RAM.
+
+def representative_dataset(features, indices, n_samples, seed=0):
+    chosen = np.sort(np.random.default_rng(seed).choice(indices, size=min(n_samples, len(indices)), replace=False))
+
+    def generate():
+        for index in chosen:
+            yield [np.asarray(features[index], dtype=np.float32)[np.newaxis, ..., np.newaxis]]
+
+    return generate
+
+# --- 2. Conversion ---
+
+try:
+    import tensorflow_model_optimization as tfmot
+except ImportError:  # only needed for the pruned variant
+    tfmot = None
+
+def prune_model(model, features, labels, train_idx, sparsity, epochs):
+    """Magnitude-prunes the weights to sparsity, fine-tuning on the training split."""
+    train_ds = make_feature_dataset(features, labels, train_idx, shuffle=True, seed=42)
+    steps = epochs * int(np.ceil(len(train_idx) / BATCH_SIZE))
+    schedule = tfmot.sparsity.keras.PolynomialDecay(initial_sparsity=0.0, final_sparsity=sparsity,
+                                                    begin_step=0, end_step=max(1, steps - 1))
+    pruned = tfmot.sparsity.keras.prune_low_magnitude(model, pruning_schedule=schedule)
+    pruned.compile(optimizer="adam", loss="categorical_crossentropy", metrics=["accuracy"])
+    pruned.fit(train_ds, epochs=epochs, callbacks=[tfmot.sparsity.keras.UpdatePruningStep()], verbose=0)
+    return tfmot.sparsity.keras.strip_pruning(pruned)
+
+def convert(model, variant, representative=None):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif variant in ("int8", "pruned"):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if variant == "pruned":
+            # Keeps the zeros from being spread out by requantization
+            converter.optimizations.append(tf.lite.Optimize.EXPERIMENTAL_SPARSITY)
+        converter.representative_dataset = representative
+        # Integer-only ops, and integer input/output tensors, for microcontrollers
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    return converter.convert()
+
+# --- 3. Measurement ---
+
+def arena_bytes(interpreter):
+    """
+    Peak bytes of activations alive at once, following the operator order:
+    roughly the tensor arena a memory-planning interpreter (TFLite Micro)
+    must reserve, before per-op scratch buffers. Weights are not included.
+    """
+    if not hasattr(interpreter, "_get_ops_details"):
+        return None  # this runtime does not expose the graph
+    tensors = {t["index"]: t for t in interpreter.get_tensor_details()}
+    ops = interpreter._get_ops_details()
+    inputs = [t["index"] for t in interpreter.get_input_details()]
+    outputs = [t["index"] for t in interpreter.get_output_details()]
+
+    first = {index: 0 for index in inputs}
+    last = {}
+    for position, op in enumerate(ops):
+        for index in op["outputs"]:
+            first.setdefault(index, position)
+        for index in op["inputs"]:
+            if index in first:
+                last[index] = position
+    for index in outputs:
+        last[index] = len(ops)
+
+    def nbytes(index):
+        detail = tensors[index]
+        return int(np.prod(detail["shape"])) * np.dtype(detail["dtype"]).itemsize
+
+    return max(
+        sum(nbytes(index) for index, start in first.items() if start <= position <= last.get(index, start))
+        for position in range(len(ops) + 1)
+    )
+
+def measure_latency(interpreter, runs):
+    """Median seconds per invoke(), after a warm-up."""
+    for _ in range(10):
+        interpreter.invoke()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        interpreter.invoke()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+def evaluate(path, features, labels, test_idx, latency_runs):
+    model = TFLiteModel(path, num_threads=1)
+    predictions = np.array([np.argmax(model(features[index])) for index in np.sort(test_idx)])
+    accuracy = float(np.mean(predictions == labels[np.sort(test_idx)]))
+    data = Path(path).read_bytes()
+    arena = arena_bytes(model.interpreter)
+    return {
+        "accuracy": round(accuracy, 4),
+        "size_kb": round(len(data) / 1024, 1),
+        "gzip_kb": round(len(gzip.compress(data)) / 1024, 1),
+        "arena_kb": round(arena / 1024, 1) if arena is not None else None,
+        "latency_us": round(measure_latency(model.interpreter, latency_runs) * 1e6, 1),
+    }
+
+def keras_accuracy(model, features, labels, test_idx):
+    test_ds = make_feature_dataset(features, labels, test_idx, batch_size=256)
+    _, accuracy = model.evaluate(test_ds, verbose=0)
+    return float(accuracy)
+
+# --- 4. Main Execution Block ---
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_H5_PATH)
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=["float32", "float16", "dynamic", "int8"])
+    parser.add_argument("--dataset", default=DATASET_PATH, help="synthetic dataset whose features are cached")
+    parser.add_argument("--representative-samples", type=int, default=200)
+    parser.add_argument("--sparsity", type=float, default=0.5, help="pruned variant: fraction of zero weights")
+    parser.add_argument("--prune-epochs", type=int, default=2)
+    parser.add_argument("--latency-runs", type=int, default=500)
+    parser.add_argument("--out-dir", default=EXPORT_DIR)
+    parser.add_argument("--deploy", choices=VARIANTS, default="int8",
+                        help=f"variant copied to {MODEL_TFLITE_PATH} (must be exported)")
+    args = parser.parse_args()
+    if args.deploy not in args.variants:
+        parser.error(f"--deploy {args.deploy} is not among --variants")
+    if "pruned" in args.variants and tfmot is None:
+        parser.error("the pruned variant needs tensorflow-model-optimization")
+
+    print(f"Loading model from {args.model}...")
+    model = tf.keras.models.load_model(args.model)
+    features, labels = load_feature_file(args.dataset, N_SAMPLES_PER_CLASS)
+    train_idx, test_idx = train_test_indices(len(labels), test_size=0.2, seed=42)
+    representative = representative_dataset(features, train_idx, args.representative_samples)
+
+    baseline = keras_accuracy(model, features, labels, test_idx)
+    report = {"keras": {"accuracy": round(baseline, 4),
+                        "size_kb": round(Path(args.model).stat().st_size / 1024, 1)}}
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    for variant in args.variants:
+        print(f"\nConverting {variant}...")
+        source = model
+        if variant == "pruned":
+            source = tf.keras.models.clone_model(model)
+            source.set_weights(model.get_weights())
+            source = prune_model(source, features, labels, train_idx, args.sparsity, args.prune_epochs)
+        path = out_dir / f"audio_classifier_{variant}.tflite"
+        path.write_bytes(convert(source, variant, representative))
+        report[variant] = evaluate(path, features, labels, test_idx, args.latency_runs)
+        report[variant]["accuracy_drop"] = round(baseline - report[variant]["accuracy"], 4)
+
+    (out_dir / "export_report.json").write_text(json.dumps(report, indent=2) + "\n")
+    columns = ("accuracy", "accuracy_drop", "size_kb", "gzip_kb", "arena_kb", "latency_us")
+    print(f"\n{'variant':>8}" + "".join(f"{column:>15}" for column in columns))
+    for variant, row in report.items():
+        # Missing or unknown (e.g. arena_kb without graph details) as "-"
+        cells = (str(row[column]) if row.get(column) is not None else "-" for column in columns)
+        print(f"{variant:>8}" + "".join(f"{cell:>15}" for cell in cells))
+
+    shutil.copyfile(out_dir / f"audio_classifier_{args.deploy}.tflite", MODEL_TFLITE_PATH)
+    print(f"\n✅ {args.deploy} model saved to {MODEL_TFLITE_PATH}; report in {out_dir / 'export_report.json'}")
+
 
-# --- 1. Load the Trained Keras Model ---
-print(f"Loading model from {MODEL_H5_PATH}...")
-model = tf.keras.models.load_model(MODEL_H5_PATH)
-print("Model loaded successfully.")
-model.summary()
-
-# --- 2. Generate Representative Dataset for Quantization ---
-# This is a crucial step. The converter needs a sample of real data
-# to understand the range of values (min/max) for each activation
-# in the model. This ensures the 8-bit integer conversion is accurate.
-
-def representative_dataset():
-    # Load the same synthetic data generator you used for training
-    # We need this to create samples for the converter
-    # NOTE: For a real project, you would use a small subset of your
-    # actual training/validation data, not synthetic data.
-    from msitushield_model import create_synthetic_audio, extract_spectrogram_features, N_MFCC, SAMPLE_RATE, DURATION
-    
-    # Generate a small batch of data
-    X_audio, _ = create_synthetic_audio()
-    # We only need a few samples, e.g., 10-20
-    X_audio = X_audio[:20] 
-    
-    # Extract features in the same way as training
-    X_features = extract_spectrogram_features(X_audio, SAMPLE_RATE, N_MFCC)
-    
-    # The model expects a 4D tensor: (batch_size, height, width, channels)
-    # We yield one sample at a time as a list
-    for sample in X_features:
-        # Add the channel dimension and wrap in a list
-        yield [np.expand_dims(sample, axis=0).astype(np.float32)]
-
-print("\nPreparing representative dataset for quantization...")
-# This is just a sanity check to make sure the function works
-for sample in representative_dataset():
-    print(f"Sample shape for converter: {sample[0].shape}")
-    break
-
-# --- 3. Convert the Model to TensorFlow Lite with Quantization ---
-print("\nStarting model conversion to TFLite with full integer quantization...")
-
-converter = tf.lite.TFLiteConverter.from_keras_model(model)
-
-# This is the key line for microcontroller deployment
-converter.optimizations = [tf.lite.Optimize.DEFAULT]
-
-# This tells the converter to use our representative dataset
-converter.representative_dataset = representative_dataset
-
-# This ensures the model's input and output tensors are also integers
-converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
-converter.inference_input_type = tf.int8
-converter.inference_output_type = tf.int8
-
-# Perform the conversion
-tflite_quant_model = converter.convert()
-
-# --- 4. Save the Quantized Model ---
-with open(MODEL_TFLITE_PATH, 'wb') as f:
-    f.write(tflite_quant_model)
-
-print(f"\n✅ Model successfully converted and saved to {MODEL_TFLITE_PATH}")
-print(f"Original .h5 model size: ~{len(open(MODEL_H5_PATH, 'rb').read()) / 1024:.2f} KB")
-print(f"Quantized .tflite model size: ~{len(open(MODEL_TFLITE_PATH, 'rb').read()) / 1024:.2f} KB")
+if __name__ == "__main__":
+    main()
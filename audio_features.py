@@ -0,0 +1,78 @@
+"""
+Audio preprocessing shared by training (msitushield_model.py), export
+(Convert_Model.py) and the backend inference service. Depends only on
+NumPy and SciPy so it can be imported without TensorFlow.
+"""
+import numpy as np
+import scipy.signal # Use scipy.signal directly
+
+SAMPLE_RATE = 16000  # Hz, typical for audio processing
+DURATION = 2.0       # seconds per audio clip
+N_SAMPLES = int(SAMPLE_RATE * DURATION)
+N_MFCC = 13          # Number of MFCC features to extract
+FIXED_TIME_STEPS = 32 # Spectrogram frames kept per clip
+
+# Model output order
+CLASS_NAMES = ["chainsaw", "truck_engine", "forest_noise"]
+
+def extract_spectrogram_features(audio_data, sample_rate, n_mfcc, n_fft=512, hop_length=256):
+    """
+    Extracts spectrogram features from audio data.
+    This is a more robust approach for our CNN.
+    """
+    print("Extracting spectrogram features...")
+    features = []
+    # We'll use a fixed number of time steps for the model input
+    fixed_time_steps = 32 
+    
+    for audio in audio_data:
+        # Compute the spectrogram
+        f, t, Sxx = scipy.signal.spectrogram(audio, fs=sample_rate, nperseg=n_fft, noverlap=n_fft - hop_length)
+        
+        # Take the first n_mfcc frequency bins (simulating MFCCs)
+        feature = Sxx[:n_mfcc, :]
+        
+        # FIX: Ensure the time dimension is consistent
+        # Pad with zeros if the spectrogram is too short, or truncate if too long
+        if feature.shape[1] < fixed_time_steps:
+            pad_width = fixed_time_steps - feature.shape[1]
+            feature = np.pad(feature, pad_width=((0, 0), (0, pad_width)), mode='constant')
+        elif feature.shape[1] > fixed_time_steps:
+            feature = feature[:, :fixed_time_steps]
+            
+        features.append(feature)
+        
+    return np.array(features)
+
+
+def extract_spectrogram_features_batch(audio_data, sample_rate, n_mfcc, n_fft=512, hop_length=256,
+                                       fixed_time_steps=FIXED_TIME_STEPS, dtype=np.float64, chunk_size=1024,
+                                       out=None, verbose=True):
+    """
+    Vectorized version of extract_spectrogram_features for an (N, N_SAMPLES) array.
+    The STFT is computed for a whole chunk of clips in one call, straight into a
+    preallocated output, so memory stays bounded by chunk_size however large N is
+    (audio_data can be a memory-mapped array). With the default float64 the
+    features are identical to extract_spectrogram_features; float32 halves the
+    memory and is faster at the cost of float32 rounding.
+    """
+    if verbose:
+        print("Extracting spectrogram features (batched)...")
+    n_clips = audio_data.shape[0]
+    if out is None:
+        out = np.zeros((n_clips, n_mfcc, fixed_time_steps), dtype=dtype)
+
+    # Only the first fixed_time_steps frames are kept, so only the samples they
+    # cover need to be transformed
+    samples_needed = n_fft + (fixed_time_steps - 1) * hop_length
+
+    for start in range(0, n_clips, chunk_size):
+        chunk = np.asarray(audio_data[start:start + chunk_size, :samples_needed], dtype=dtype)
+        _, _, Sxx = scipy.signal.spectrogram(chunk, fs=sample_rate, nperseg=n_fft,
+                                             noverlap=n_fft - hop_length, axis=-1)
+        # Clips shorter than fixed_time_steps frames keep the zero padding in out
+        n_frames = min(Sxx.shape[-1], fixed_time_steps)
+        out[start:start + len(chunk), :, :n_frames] = Sxx[:, :n_mfcc, :n_frames]
+        out[start:start + len(chunk), :, n_frames:] = 0
+
+    return out
@@ -0,0 +1,182 @@
+"""
+Archival of old resolved alerts.
+
+Resolved alerts raised more than ARCHIVE_AFTER_DAYS days ago are moved from
+alerts to alerts_archive, a batch per transaction (insert into the archive
+and delete from alerts together), so the hot table and its indexes only hold
+recent and open alerts. Archived alerts are listed by GET /api/alerts/archive
+and their attachments stay downloadable.
+
+On PostgreSQL alerts_archive is range-partitioned by month of alert_time;
+each month's partition (alerts_archive_yYYYYmMM) is created by the first
+batch that needs it, so an old month can later be detached or dropped whole.
+On SQLite it is a plain table with the same columns and indexes.
+
+On SQLite alerts uses AUTOINCREMENT, so the id of an archived alert is never
+given to a new one (reserve_archived_ids() covers databases whose alerts
+table was rebuilt for it after alerts had already been archived).
+
+With an export directory (--export-dir / ARCHIVE_EXPORT_DIR) every batch is
+also appended to <dir>/alerts-YYYY-MM.jsonl.gz, one JSON object per alert,
+and synced to disk before the transaction commits. A batch interrupted in
+between is archived (and exported) again by the next run, so readers of the
+files should de-duplicate by id.
+
+Counters are left alone: sensor_states.total_alerts and the analytics
+rollups keep counting archived alerts (only resolved alerts are archived, so
+open counts do not change), and ``sensor_state.py rebuild`` and
+``rollups.py backfill`` read both tables.
+
+The API archives every ARCHIVE_INTERVAL_HOURS when ARCHIVE_AFTER_DAYS is set
+(0, the default, disables it). To run it by hand or from cron:
+
+    python archive.py run --days 90 [--export-dir archive/]
+
+A run from outside the API does not change its ETags, so cached alert lists
+keep showing the archived alerts until the next alert is written.
+"""
+import argparse
+import gzip
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import Session
+
+from database import upsert
+from http_cache import serialize_json
+from models import Alert, AlertArchive
+
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "0"))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+ARCHIVE_EXPORT_DIR = os.getenv("ARCHIVE_EXPORT_DIR") or None
+
+_known_partitions = set()
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value: datetime) -> datetime:
+    return (month_start(value) + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{AlertArchive.__tablename__}_y{month:%Y}m{month:%m}"
+
+
+def ensure_partitions(session: Session, months: Iterable[datetime]):
+    """Create the monthly partitions of alerts_archive (PostgreSQL only)."""
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    for month in sorted(set(months) - _known_partitions):
+        session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {AlertArchive.__tablename__} "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month(month):%Y-%m-%d}')"
+        ))
+
+
+def reserve_archived_ids(conn):
+    """SQLite: move the alerts id sequence past every archived id."""
+    if conn.dialect.name != "sqlite":
+        return
+    highest = conn.execute(select(func.max(AlertArchive.id))).scalar()
+    if not highest:
+        return
+    current = conn.execute(
+        text("SELECT seq FROM sqlite_sequence WHERE name = :name"), {"name": Alert.__tablename__}
+    ).scalar()
+    if current is None or current < highest:
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": Alert.__tablename__})
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                     {"name": Alert.__tablename__, "seq": highest})
+
+
+def export_batch(export_dir, records):
+    """Append records to the month's gzipped JSONL file and sync it to disk."""
+    by_month = defaultdict(list)
+    for record in records:
+        by_month[month_start(record["alert_time"])].append(record)
+    directory = Path(export_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    for month, rows in by_month.items():
+        # Appending adds a gzip member; readers (gzip, zcat) see one stream
+        with open(directory / f"alerts-{month:%Y-%m}.jsonl.gz", "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as compressed:
+                compressed.write(b"".join(serialize_json(row) + b"\n" for row in rows))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def archive_batch(session: Session, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE,
+                  export_dir: Optional[str] = None) -> int:
+    """Move up to batch_size resolved alerts raised before cutoff; commits. Returns the count."""
+    alerts = Alert.__table__
+    result = session.execute(
+        select(*alerts.columns)
+        .where(alerts.c.resolved == True, alerts.c.alert_time < cutoff)
+        .order_by(alerts.c.alert_time, alerts.c.id)
+        .limit(batch_size)
+    )
+    now = datetime.utcnow()
+    records = [{**row, "archived_at": now} for row in result.mappings()]
+    if not records:
+        return 0
+
+    months = {month_start(record["alert_time"]) for record in records}
+    ensure_partitions(session, months)
+    archive = AlertArchive.__table__
+    # Rows already archived by an interrupted run are left as they are
+    session.execute(
+        upsert(archive, session.get_bind().dialect.name).on_conflict_do_nothing(
+            index_elements=[archive.c.id, archive.c.alert_time]
+        ),
+        records,
+    )
+    if export_dir:
+        export_batch(export_dir, records)
+    session.execute(delete(alerts).where(alerts.c.id.in_([record["id"] for record in records])))
+    session.commit()
+    _known_partitions.update(months)
+    return len(records)
+
+
+def archive_alerts(session: Session, older_than_days: float = ARCHIVE_AFTER_DAYS,
+                   batch_size: int = ARCHIVE_BATCH_SIZE, export_dir: Optional[str] = ARCHIVE_EXPORT_DIR) -> int:
+    """
+    Archive every resolved alert raised more than older_than_days ago, one
+    transaction per batch. Returns the number of alerts moved.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    total = 0
+    while True:
+        moved = archive_batch(session, cutoff, batch_size, export_dir)
+        total += moved
+        if moved < batch_size:
+            return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old resolved alerts to alerts_archive")
+    parser.add_argument("command", choices=["run"])
+    parser.add_argument("--days", type=float, default=ARCHIVE_AFTER_DAYS or None, required=not ARCHIVE_AFTER_DAYS,
+                        help="archive resolved alerts raised more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--export-dir", default=ARCHIVE_EXPORT_DIR,
+                        help="also append them to gzipped JSONL files here")
+    args = parser.parse_args()
+
+    from database import Base, SessionLocal, create_missing_autoincrement, engine
+
+    Base.metadata.create_all(bind=engine)
+    create_missing_autoincrement(engine)
+    with engine.begin() as conn:
+        reserve_archived_ids(conn)
+    with SessionLocal() as session:
+        count = archive_alerts(session, args.days, args.batch_size, args.export_dir)
+    print(f"Archived {count} alerts")
@@ -0,0 +1,104 @@
+"""
+Benchmark: alert ingestion throughput, POST /api/alerts vs POST /api/alerts/batch.
+
+    python benchmarks/bench_alert_ingestion.py --alerts 2000 --batch-sizes 100 500
+
+Simulates a gateway replaying buffered uplinks for ``--sensors`` sensors
+(half of them unknown, so sensor auto-creation is exercised) and reports
+alerts/second for each path. Runs in-process against a fresh SQLite file.
+Coalescing and per-sensor rate limiting are switched off so every payload
+is a row insert. With ``--queue`` the ingestion queue (ingest_queue.py) is
+enabled: POST /api/alerts then only queues, and is reported both as
+accepted (202 responses) and as drained into the database.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import common
+
+
+def make_payloads(n_alerts, n_sensors):
+    start = datetime.utcnow() - timedelta(hours=1)
+    return [
+        {
+            "sensor_id": f"sensor_{i % n_sensors:04d}",
+            "alert_time": (start + timedelta(seconds=i)).isoformat(),
+        }
+        for i in range(n_alerts)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alerts", type=int, default=2000)
+    parser.add_argument("--sensors", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--queue", action="store_true", help="enable the ingestion queue")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_ingest_"))
+    common.use_database(workdir / "bench.db")
+    if args.queue:
+        common.use_ingest_queue()
+    os.environ["ALERT_COALESCE_WINDOW_SECONDS"] = "0"
+    os.environ["ALERT_RATE_PER_SECOND"] = "0"
+
+    from fastapi.testclient import TestClient
+    import main as app_module
+    from ingest_queue import queue
+    from database import SessionLocal
+    from models import Alert, Sensor, SensorState
+
+    with TestClient(app_module.app) as client:
+        payloads = make_payloads(args.alerts, args.sensors)
+
+        def reset():
+            db = SessionLocal()
+            db.query(Alert).delete()
+            db.query(SensorState).delete()
+            db.query(Sensor).filter(Sensor.sensor_id >= f"sensor_{args.sensors // 2:04d}").delete()
+            db.commit()
+            db.close()
+
+        reset()
+        start = time.perf_counter()
+        for payload in payloads:
+            client.post("/api/alerts", json=payload).raise_for_status()
+        accepted = time.perf_counter() - start
+        if args.queue:
+            while queue.pending:
+                time.sleep(0.01)
+            drained = time.perf_counter() - start
+            print(f"{'single queued':>14}: {args.alerts / accepted:9.0f} alerts/s ({accepted:.2f}s)")
+            single_rate = args.alerts / drained
+            print(f"{'single drained':>14}: {single_rate:9.0f} alerts/s ({drained:.2f}s)")
+        else:
+            single_rate = args.alerts / accepted
+            print(f"{'single':>14}: {single_rate:9.0f} alerts/s ({accepted:.2f}s)")
+
+        for batch_size in args.batch_sizes:
+            reset()
+            with common.timer() as elapsed:
+                for start in range(0, args.alerts, batch_size):
+                    batch = payloads[start:start + batch_size]
+                    client.post("/api/alerts/batch", json=batch).raise_for_status()
+            rate = args.alerts / elapsed["seconds"]
+            print(f"{f'batch x{batch_size}':>14}: {rate:9.0f} alerts/s ({elapsed['seconds']:.2f}s, "
+                  f"{rate / single_rate:.1f}x)")
+
+        reset()
+        body = "\n".join(json.dumps(payload) for payload in payloads).encode()
+        with common.timer() as elapsed:
+            client.post("/api/alerts/batch", content=body,
+                        headers={"content-type": "application/x-ndjson"}).raise_for_status()
+        rate = args.alerts / elapsed["seconds"]
+        print(f"{'ndjson stream':>14}: {rate:9.0f} alerts/s ({elapsed['seconds']:.2f}s, {rate / single_rate:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: GET /api/analytics from the rollup tables vs. the same report
+computed from the raw alerts table.
+
+    python benchmarks/bench_analytics.py --sensors 1000 --alerts 1000000
+
+Times a 30-day daily report (histogram + per-sensor breakdown) both ways
+and checks the totals agree. The raw version is the pair of GROUP BY
+queries the endpoint would otherwise run (SQLite date functions). The
+seeded database is kept at ``--db``.
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import common
+
+RAW_COUNTERS = """
+    count(*) AS alerts,
+    sum(resolved) AS resolved,
+    sum(threat_type = 'real') AS real_threats,
+    sum(threat_type = 'false') AS false_alarms,
+    sum(CASE WHEN resolved THEN (julianday(resolved_at) - julianday(alert_time)) * 86400 ELSE 0 END)
+        AS resolve_seconds
+"""
+
+
+def raw_report(engine, since):
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        histogram = conn.execute(text(
+            f"SELECT date(alert_time) AS bucket, {RAW_COUNTERS} FROM alerts "
+            "WHERE alert_time >= :since GROUP BY 1 ORDER BY 1"
+        ), {"since": since}).all()
+        per_sensor = conn.execute(text(
+            f"SELECT sensor_id, {RAW_COUNTERS} FROM alerts "
+            "WHERE alert_time >= :since GROUP BY 1 ORDER BY 1"
+        ), {"since": since}).all()
+    return histogram, per_sensor
+
+
+def rollup_report(since, until):
+    import main
+    from database import AsyncSessionLocal
+
+    async def report():
+        async with AsyncSessionLocal() as db:
+            return await main.get_analytics(
+                interval="day", since=since, until=until, sensor_id=None, db=db, current_user=None
+            )
+
+    return asyncio.run(report())
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        with common.timer() as elapsed:
+            result = fn()
+        timings.append(elapsed["seconds"])
+    return result, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=1000)
+    parser.add_argument("--alerts", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--db", default=str(Path(tempfile.gettempdir()) / "bench_analytics.db"))
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    common.use_database(db_path)
+    fresh = not db_path.exists()
+
+    from database import Base, create_missing_indexes, engine
+    import models  # noqa: F401  (registers the tables on Base)
+
+    Base.metadata.create_all(bind=engine)
+    create_missing_indexes(engine)
+    if fresh:
+        print(f"Seeding {args.sensors} sensors / {args.alerts} alerts into {db_path} ...")
+        with common.timer() as elapsed:
+            common.seed_database(engine, args.sensors, args.alerts)
+        print(f"Seeded in {elapsed['seconds']:.1f}s")
+
+    until = datetime.utcnow() + timedelta(days=1)
+    since = (until - timedelta(days=30)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    (histogram, per_sensor), raw_seconds = timed(lambda: raw_report(engine, since), args.repeat)
+    report, rollup_seconds = timed(lambda: rollup_report(since, until), args.repeat)
+    print(f"   raw alerts: median {raw_seconds * 1000:8.1f} ms")
+    print(f"      rollups: median {rollup_seconds * 1000:8.1f} ms ({raw_seconds / rollup_seconds:.0f}x)")
+
+    assert report["totals"]["alerts"] == sum(row.alerts for row in per_sensor)
+    assert report["totals"]["false_alarms"] == sum(row.false_alarms for row in per_sensor)
+    assert len(report["histogram"]) == len(histogram)
+    assert len(report["sensors"]) == len(per_sensor)
+    print("Totals match.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: latency under concurrent load, in-process against the ASGI app.
+
+    python benchmarks/bench_concurrency.py --operators 20 --duration 15
+
+``--operators`` simulated users poll GET /api/dashboard/overview back to
+back while a probe hits GET /health every ``--probe-interval`` seconds, as
+Render's health checker does. Probe latency counts from the scheduled
+send time, so a stalled event loop shows up in it. Prints p50/p95/p99 per endpoint. When
+handlers block the event loop on database I/O, /health latency tracks the
+slowest query; with the async session it stays flat.
+
+To compare before/after, run the same command on both revisions, reusing
+the seeded database via ``--db``.
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import common
+
+
+async def drive(app, args):
+    import httpx
+
+    latencies = {"overview": [], "health": []}
+    errors = 0
+    deadline = time.perf_counter() + args.duration
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.post("/api/auth/register", json={
+            "username": "bench", "email": "bench@example.com", "full_name": "Bench", "password": "benchpass"
+        })
+        response = await client.post("/api/auth/login", data={"username": "bench", "password": "benchpass"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        async def timed(name, method, url, start=None, **kwargs):
+            nonlocal errors
+            start = start or time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies[name].append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+        async def operator():
+            while time.perf_counter() < deadline:
+                await timed("overview", "GET", "/api/dashboard/overview", headers=headers)
+
+        async def probe():
+            # Latency is measured from the scheduled send time, so time spent
+            # waiting for a blocked event loop counts against the probe.
+            scheduled = time.perf_counter()
+            while scheduled < deadline:
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                await timed("health", "GET", "/health", start=scheduled)
+                scheduled += args.probe_interval
+
+        await asyncio.gather(probe(), *(operator() for _ in range(args.operators)))
+
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=2000)
+    parser.add_argument("--alerts", type=int, default=200_000)
+    parser.add_argument("--operators", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--db", default=str(Path(tempfile.gettempdir()) / "bench_concurrency.db"))
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    common.use_database(db_path)
+    fresh = not db_path.exists()
+
+    from database import Base, engine
+    import models  # noqa: F401  (registers the tables on Base)
+    from sensor_state import ensure_sensor_states
+
+    Base.metadata.create_all(bind=engine)
+    if fresh:
+        print(f"Seeding {args.sensors} sensors / {args.alerts} alerts into {db_path} ...")
+        common.seed_database(engine, args.sensors, args.alerts)
+    with engine.begin() as conn:
+        ensure_sensor_states(conn)
+
+    import main as app_module
+
+    latencies, errors = asyncio.run(drive(app_module.app, args))
+    report = {"operators": args.operators, "duration_s": args.duration, "errors": errors}
+    for name, samples in latencies.items():
+        report[name] = common.latency_summary(samples)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
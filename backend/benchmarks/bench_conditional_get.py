@@ -0,0 +1,76 @@
+"""
+Benchmark: dashboard polling with ETag / If-None-Match and the response cache.
+
+    python benchmarks/bench_conditional_get.py --sensors 1000 --alerts 200000
+
+For GET /api/alerts, /api/sensors and /api/dashboard/overview, times per
+request: a cold request (data version just bumped, so the queries run), a
+warm one from another client (same URL, body served from the response
+cache) and a revalidation sending the ETag back (304, empty body). The
+seeded database is kept at ``--db``.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import common
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=1000)
+    parser.add_argument("--alerts", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--db", default=str(Path(tempfile.gettempdir()) / "bench_conditional_get.db"))
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    common.use_database(db_path)
+    fresh = not db_path.exists()
+
+    from database import Base, create_missing_indexes, engine
+    import models  # noqa: F401  (registers the tables on Base)
+
+    Base.metadata.create_all(bind=engine)
+    create_missing_indexes(engine)
+    if fresh:
+        print(f"Seeding {args.sensors} sensors / {args.alerts} alerts into {db_path} ...")
+        common.seed_database(engine, args.sensors, args.alerts)
+
+    from fastapi.testclient import TestClient
+    from main import app, response_cache
+
+    with TestClient(app) as client:
+        client.post("/api/auth/register", json={
+            "username": "bench", "email": "bench@example.com", "full_name": "Bench", "password": "benchpass"
+        })
+        response = client.post("/api/auth/login", data={"username": "bench", "password": "benchpass"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        def timed(url, extra_headers=None, before=None):
+            timings = []
+            for _ in range(args.repeat):
+                if before:
+                    before()
+                start = time.perf_counter()
+                response = client.get(url, headers={**headers, **(extra_headers or {})})
+                timings.append(time.perf_counter() - start)
+                assert response.status_code in (200, 304), response.status_code
+            return statistics.median(timings) * 1000, response
+
+        for url in ("/api/alerts", "/api/alerts?fields=summary&limit=1000", "/api/sensors", "/api/dashboard/overview"):
+            cold, response = timed(url, before=response_cache.bump)
+            warm, _ = timed(url)
+            etag = client.get(url, headers=headers).headers["ETag"]
+            revalidate, not_modified = timed(url, {"If-None-Match": etag})
+            assert not_modified.status_code == 304
+            print(f"{url}")
+            print(f"    cold {cold:8.2f} ms  warm {warm:8.2f} ms ({cold / warm:.0f}x)  "
+                  f"304 {revalidate:8.2f} ms ({cold / revalidate:.0f}x)  "
+                  f"body {len(response.content) / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: GET /api/dashboard/overview (sensors joined with the maintained
+sensor_states table) vs. the old per-sensor loop.
+
+    python benchmarks/bench_dashboard_overview.py --sensors 10000 --alerts 1000000
+
+Reports the number of SQL statements and wall time for each implementation
+and checks that both produce the same payload. The seeded database is kept
+at ``--db`` so repeated runs skip seeding.
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+from pathlib import Path
+
+import common
+
+
+def legacy_overview(db):
+    """The original N+1 implementation, kept here as the baseline."""
+    from sqlalchemy import desc
+    from models import Alert, Sensor
+
+    sensors = db.query(Sensor).all()
+    sensor_statuses = []
+    for sensor in sensors:
+        unresolved_alert = db.query(Alert).filter(
+            Alert.sensor_id == sensor.sensor_id,
+            Alert.resolved == False
+        ).order_by(desc(Alert.alert_time)).first()
+        sensor_statuses.append({
+            "sensor_id": sensor.sensor_id,
+            "sensor_name": sensor.sensor_name,
+            "latitude": sensor.latitude,
+            "longitude": sensor.longitude,
+            "status": "red" if unresolved_alert else "green",
+            "last_alert_time": unresolved_alert.alert_time.isoformat() if unresolved_alert else None
+        })
+    return {
+        "sensors": sensor_statuses,
+        "statistics": {
+            "total_alerts": db.query(Alert).count(),
+            "unresolved_alerts": db.query(Alert).filter(Alert.resolved == False).count(),
+            "resolved_alerts": db.query(Alert).filter(Alert.resolved == True).count(),
+            "total_sensors": len(sensors)
+        }
+    }
+
+
+def current_overview():
+    import main
+    from database import AsyncSessionLocal
+
+    async def overview():
+        async with AsyncSessionLocal() as db:
+            return await main.dashboard_overview(db)
+
+    return asyncio.run(overview())
+
+
+def run(name, fn, counter, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        with counter.track(), common.timer() as elapsed:
+            result = fn()
+        timings.append(elapsed["seconds"])
+    print(f"{name:>10}: {counter.count:>6} queries, "
+          f"median {statistics.median(timings) * 1000:9.1f} ms, "
+          f"min {min(timings) * 1000:9.1f} ms over {repeat} run(s)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=10_000)
+    parser.add_argument("--alerts", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true", help="only time the current implementation")
+    parser.add_argument("--db", default=str(Path(tempfile.gettempdir()) / "bench_overview.db"))
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    common.use_database(db_path)
+    fresh = not db_path.exists()
+
+    from database import Base, SessionLocal, async_engine, engine
+    import models  # noqa: F401  (registers the tables on Base)
+    from sensor_state import ensure_sensor_states
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        ensure_sensor_states(conn)
+    if fresh:
+        print(f"Seeding {args.sensors} sensors / {args.alerts} alerts into {db_path} ...")
+        with common.timer() as elapsed:
+            common.seed_database(engine, args.sensors, args.alerts)
+        print(f"Seeded in {elapsed['seconds']:.1f}s")
+
+    def run_legacy():
+        with SessionLocal() as db:
+            return legacy_overview(db)
+
+    current = run("current", current_overview, common.QueryCounter(async_engine.sync_engine), args.repeat)
+    if not args.skip_legacy:
+        legacy = run("legacy", run_legacy, common.QueryCounter(engine), args.repeat)
+        key = lambda s: s["sensor_id"]
+        assert sorted(current["sensors"], key=key) == sorted(legacy["sensors"], key=key)
+        assert current["statistics"] == legacy["statistics"]
+        print("Payloads match.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark: POST /api/inference/classify throughput and latency, in-process
+against the ASGI app, with and without micro-batching.
+
+    python benchmarks/bench_inference.py --clients 64 --requests 2000
+
+Without ``--model`` an untrained copy of the training CNN is built and
+converted to an int8 TFLite model (needs TensorFlow); latency and
+throughput do not depend on the weights. Each configuration in
+``--batch-sizes`` runs the same load: ``--clients`` concurrent clients
+sending the same clip back to back, as a 16-bit WAV body by default
+(``--input json`` sends float samples in JSON, ``--input features`` a
+pre-computed feature tensor). A max batch size of 1 is the
+unbatched baseline (one interpreter call per request). Prints JSON with
+requests/s, p50/p95/p99 latency and the mean batch size served.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+import common
+
+REPO_ROOT = common.BACKEND_DIR.parent
+
+
+def build_test_model(path: Path):
+    sys.path.insert(0, str(REPO_ROOT))
+    import tensorflow as tf
+    from audio_features import CLASS_NAMES, FIXED_TIME_STEPS, N_MFCC
+    from msitushield_model import build_model
+
+    model = build_model((N_MFCC, FIXED_TIME_STEPS, 1), len(CLASS_NAMES))
+    rng = np.random.default_rng(0)
+
+    def representative_dataset():
+        for _ in range(20):
+            yield [rng.random((1, N_MFCC, FIXED_TIME_STEPS, 1), dtype=np.float32)]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    path.write_bytes(converter.convert())
+
+
+def request_body(kind, clip, sample_rate):
+    if kind == "json":
+        return json.dumps({"audio": clip.tolist()}), "application/json"
+    if kind == "features":
+        from audio_features import N_MFCC, extract_spectrogram_features_batch
+
+        features = extract_spectrogram_features_batch(clip[np.newaxis], sample_rate, N_MFCC, verbose=False)[0]
+        return json.dumps({"features": features.tolist()}), "application/json"
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes((clip * 32767).astype("<i2").tobytes())
+    return buffer.getvalue(), "audio/wav"
+
+
+async def drive(app, args, body, content_type, batcher):
+    import httpx
+
+    latencies = []
+    errors = 0
+    remaining = args.requests
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.post("/api/auth/register", json={
+            "username": "bench", "email": "bench@example.com", "full_name": "Bench", "password": "benchpass"
+        })
+        response = await client.post("/api/auth/login", data={"username": "bench", "password": "benchpass"})
+        headers = {"Content-Type": content_type, "Authorization": f"Bearer {response.json()['access_token']}"}
+
+        async def client_loop():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await client.post("/api/inference/classify", content=body, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(client_loop() for _ in range(args.clients)))
+        finally:
+            await batcher.close()
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="TFLite model to serve (default: build an untrained int8 model)")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--batch-sizes", default="1,32", help="comma-separated max batch sizes to compare")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--input", choices=["wav", "json", "features"], default="wav")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_inference_"))
+    model_path = Path(args.model) if args.model else workdir / "model.tflite"
+    if not args.model:
+        print("Building int8 test model...", file=sys.stderr)
+        build_test_model(model_path)
+    os.environ["INFERENCE_MODEL_PATH"] = str(model_path.resolve())
+    common.use_database(workdir / "bench.db")
+
+    from database import Base, engine
+    import models  # noqa: F401  (registers the tables on Base)
+
+    Base.metadata.create_all(bind=engine)
+
+    import inference
+    from main import app
+
+    rng = np.random.default_rng(0)
+    clip = rng.uniform(-0.5, 0.5, inference.audio_features.N_SAMPLES).astype(np.float32)
+    body, content_type = request_body(args.input, clip, inference.audio_features.SAMPLE_RATE)
+
+    report = {
+        "input": args.input, "clients": args.clients, "requests": args.requests,
+        "max_wait_ms": args.max_wait_ms, "runs": []
+    }
+    for max_batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        inference.batcher = inference.MicroBatcher(max_batch_size, args.max_wait_ms)
+        latencies, errors, elapsed = asyncio.run(drive(app, args, body, content_type, inference.batcher))
+        stats = inference.batcher.stats()
+        report["runs"].append({
+            "max_batch_size": max_batch_size,
+            "requests_per_second": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(common.percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(common.percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(common.percentile(latencies, 99) * 1000, 2),
+            "mean_batch_size": round(stats["mean_batch_size"], 2),
+            "errors": errors,
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Load test: mixed API traffic against the in-process ASGI app.
+
+    python benchmarks/bench_load.py --duration 30 --output load.json
+    python benchmarks/bench_load.py --db postgresql://user:pw@localhost/bench_scratch
+
+Seeds ``--sensors`` sensors, ``--alerts`` alerts and ``--users`` operators
+(once per database; SQLite files are kept at ``--db``, other URLs are
+seeded when they have no sensors), then runs these scenarios together for
+``--duration`` seconds:
+
+* ingest: ``--devices`` sensors each POST /api/alerts bursts of ``--burst``
+  detections every ``--burst-interval`` seconds (coalescing and the
+  per-sensor rate limit apply; 429s are reported as ``throttled``). With
+  ``--queue`` the ingestion queue is enabled, so accepted detections are
+  202s and the database writes happen in the background;
+* poll: every operator polls GET /api/dashboard/overview, /api/alerts and
+  /api/sensors every ``--poll-interval`` seconds, revalidating with
+  If-None-Match as a browser does (``--no-etag`` to always fetch);
+* resolve: ``--resolvers`` operators concurrently resolve seeded open
+  alerts with a ``--upload-kb`` attachment until none are left.
+
+``--scenarios`` selects a subset. The report (stdout, and ``--output``) is
+JSON: throughput, p50/p95/p99/max latency, errors and status counts per
+scenario and per endpoint, so runs can be diffed between revisions.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import common
+
+SCENARIOS = ("ingest", "poll", "resolve")
+
+
+class Recorder:
+    """Latency samples and status counts per scenario and per endpoint."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, scenario, endpoint, seconds, status_code):
+        for key in (scenario, f"{scenario} {endpoint}"):
+            self.samples[key].append(seconds)
+            self.statuses[key][status_code] += 1
+
+    def report(self, seconds):
+        report = {}
+        for key, samples in self.samples.items():
+            statuses = self.statuses[key]
+            report[key] = {
+                **common.latency_summary(samples, seconds),
+                "errors": sum(count for status, count in statuses.items() if status >= 400 and status != 429),
+                "throttled": statuses.get(429, 0),
+                "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            }
+        return report
+
+
+async def drive(app, args, tokens, open_alert_ids):
+    import httpx
+
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    deadline = time.perf_counter() + args.duration
+    upload = os.urandom(args.upload_kb * 1024)
+
+    async with httpx.AsyncClient(
+        # Unhandled exceptions become 500s in the report instead of aborting the run
+        transport=httpx.ASGITransport(app=app, raise_app_exceptions=False), base_url="http://bench", timeout=None
+    ) as client:
+
+        async def request(scenario, endpoint, method, url, **kwargs):
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            recorder.record(scenario, endpoint, time.perf_counter() - start, response.status_code)
+            return response
+
+        async def device(index):
+            sensor_id = f"load_device_{index:05d}"
+            # Devices start out of phase so bursts do not all line up
+            await asyncio.sleep(rng.uniform(0, args.burst_interval))
+            while time.perf_counter() < deadline:
+                detected_at = datetime.utcnow()
+                await asyncio.gather(*(
+                    request("ingest", "POST /api/alerts", "POST", "/api/alerts", json={
+                        "sensor_id": sensor_id,
+                        "alert_time": (detected_at + timedelta(milliseconds=i)).isoformat(),
+                    })
+                    for i in range(args.burst)
+                ))
+                await asyncio.sleep(args.burst_interval)
+
+        async def operator(token):
+            headers = {"Authorization": f"Bearer {token}"}
+            etags = {}
+            urls = ("/api/dashboard/overview", "/api/alerts?fields=summary", "/api/sensors")
+            await asyncio.sleep(rng.uniform(0, args.poll_interval))
+            while time.perf_counter() < deadline:
+                for url in urls:
+                    conditional = {"If-None-Match": etags[url]} if url in etags else {}
+                    response = await request("poll", f"GET {url.split('?')[0]}", "GET", url,
+                                             headers={**headers, **conditional})
+                    if not args.no_etag and "ETag" in response.headers:
+                        etags[url] = response.headers["ETag"]
+                await asyncio.sleep(args.poll_interval)
+
+        async def resolver(token):
+            headers = {"Authorization": f"Bearer {token}"}
+            while open_alert_ids and time.perf_counter() < deadline:
+                alert_id = open_alert_ids.pop()
+                await request(
+                    "resolve", "POST /api/alerts/{alert_id}/resolve", "POST", f"/api/alerts/{alert_id}/resolve",
+                    headers=headers,
+                    data={"threat_type": rng.choice(["real", "false"]), "details": "load test"},
+                    files={"file": ("evidence.bin", upload, "application/octet-stream")},
+                )
+
+        tasks = []
+        if "ingest" in args.scenarios:
+            tasks += [device(i) for i in range(args.devices)]
+        if "poll" in args.scenarios:
+            tasks += [operator(token) for token in tokens]
+        if "resolve" in args.scenarios:
+            tasks += [resolver(tokens[i % len(tokens)]) for i in range(args.resolvers)]
+
+        with common.timer() as elapsed:
+            await asyncio.gather(*tasks)
+
+    return recorder.report(elapsed["seconds"]), elapsed["seconds"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=str(Path(tempfile.gettempdir()) / "bench_load.db"),
+                        help="SQLite file, or a database URL")
+    parser.add_argument("--sensors", type=int, default=1000)
+    parser.add_argument("--alerts", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=20, help="operators polling the dashboard")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--burst-interval", type=float, default=1.0)
+    parser.add_argument("--queue", action="store_true", help="enable the ingestion queue")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--no-etag", action="store_true")
+    parser.add_argument("--resolvers", type=int, default=4)
+    parser.add_argument("--upload-kb", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    common.use_database(args.db)
+    if args.queue:
+        common.use_ingest_queue()
+
+    from sqlalchemy import func, select
+
+    from database import Base, create_missing_columns, create_missing_indexes, engine
+    from models import Alert, Sensor, User
+    from sensor_state import ensure_sensor_states
+
+    Base.metadata.create_all(bind=engine)
+    create_missing_columns(engine)
+    create_missing_indexes(engine)
+    with engine.begin() as conn:
+        ensure_sensor_states(conn)
+        seeded = conn.scalar(select(func.count()).select_from(Sensor))
+    if not seeded:
+        print(f"Seeding {args.sensors} sensors / {args.alerts} alerts ...")
+        with common.timer() as elapsed:
+            common.seed_database(engine, args.sensors, args.alerts)
+        print(f"Seeded in {elapsed['seconds']:.1f}s")
+
+    with engine.connect() as conn:
+        usernames = conn.scalars(select(User.username).where(User.username.like("bench_user_%"))).all()
+    if len(usernames) < args.users:
+        usernames += common.seed_users(engine, args.users - len(usernames), start=len(usernames))
+    usernames = usernames[:args.users]
+
+    with engine.connect() as conn:
+        open_alert_ids = conn.scalars(
+            select(Alert.id).where(Alert.resolved == False).order_by(Alert.id)  # noqa: E712
+        ).all()
+
+    import main as app_module
+
+    # Attachments go to a scratch directory, not the server's uploads/
+    app_module.UPLOAD_DIR = Path(tempfile.mkdtemp(prefix="bench_load_uploads_"))
+    # Operators authenticate with minted tokens: logins (bcrypt) are not the
+    # load under test here
+    tokens = [app_module.create_access_token({"sub": username}) for username in usernames]
+
+    report, seconds = asyncio.run(drive(app_module.app, args, tokens, list(open_alert_ids)))
+    report = {
+        "config": {
+            "database": engine.dialect.name,
+            "sensors": args.sensors,
+            "alerts": args.alerts,
+            "users": len(tokens),
+            "scenarios": args.scenarios,
+            "duration_s": round(seconds, 2),
+            "devices": args.devices,
+            "burst": args.burst,
+            "burst_interval_s": args.burst_interval,
+            "ingest_queue": args.queue,
+            "poll_interval_s": args.poll_interval,
+            "etag": not args.no_etag,
+            "resolvers": args.resolvers,
+            "upload_kb": args.upload_kb,
+        },
+        "results": report,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
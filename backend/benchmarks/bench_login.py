@@ -0,0 +1,106 @@
+"""
+Benchmark: a login storm and what it does to the rest of the API.
+
+    python benchmarks/bench_login.py --users 50 --devices 10
+
+``--users`` operators log in at once (a shift change) while ``--devices``
+sensors keep posting alerts and a probe hits GET /health every
+``--probe-interval`` seconds. With bcrypt on the event loop every other
+request queues behind each ~0.3 s verification; with it on the password
+worker pool, ingestion and /health latency stay flat while logins take
+their turn. Prints a JSON report (p50/p95/p99 per endpoint). Compare
+revisions, or PASSWORD_HASH_WORKERS values, on the same ``--db``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import common
+
+
+async def drive(app, args, usernames):
+    import httpx
+
+    latencies = {"login": [], "alert": [], "health": []}
+    statuses = {name: {} for name in latencies}
+    done = asyncio.Event()
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)  # 500s are counted, not raised
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+        async def timed(name, method, url, start=None, **kwargs):
+            start = start or time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies[name].append(time.perf_counter() - start)
+            statuses[name][response.status_code] = statuses[name].get(response.status_code, 0) + 1
+
+        async def logins():
+            with common.timer() as elapsed:
+                await asyncio.gather(*(
+                    timed("login", "POST", "/api/auth/login", data={"username": username, "password": "benchpass"})
+                    for username in usernames
+                ))
+            done.set()
+            return elapsed
+
+        async def device(index):
+            while not done.is_set():
+                await timed("alert", "POST", "/api/alerts", json={
+                    "sensor_id": f"login_bench_{index}", "alert_time": datetime.utcnow().isoformat()
+                })
+                await asyncio.sleep(0.05)
+
+        async def probe():
+            # Measured from the scheduled send time, so a blocked loop counts
+            scheduled = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                await timed("health", "GET", "/health", start=scheduled)
+                scheduled += args.probe_interval
+
+        elapsed, *_ = await asyncio.gather(logins(), probe(), *(device(i) for i in range(args.devices)))
+
+    report = {"users": len(usernames), "devices": args.devices, "login_storm_s": round(elapsed["seconds"], 2)}
+    for name, samples in latencies.items():
+        report[name] = {**common.latency_summary(samples), "statuses": statuses[name]}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--db", default=str(Path(tempfile.gettempdir()) / "bench_login.db"))
+    args = parser.parse_args()
+
+    common.use_database(args.db)
+    # Sensors post back to back here
+    os.environ.setdefault("ALERT_RATE_PER_SECOND", "0")
+
+    from sqlalchemy import select
+
+    from database import Base, engine
+    from models import User
+    import models  # noqa: F401  (registers the tables on Base)
+
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        usernames = conn.scalars(select(User.username).where(User.username.like("bench_user_%"))).all()
+    if len(usernames) < args.users:
+        print(f"Seeding {args.users - len(usernames)} users ...")
+        usernames += common.seed_users(engine, args.users - len(usernames), start=len(usernames))
+
+    import main as app_module
+
+    report = asyncio.run(drive(app_module.app, args, usernames[:args.users]))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
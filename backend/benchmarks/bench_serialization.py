@@ -0,0 +1,114 @@
+"""
+Microbenchmark: encoding a page of alerts for GET /api/alerts.
+
+    python benchmarks/bench_serialization.py --alerts 10000
+
+Loads ``--alerts`` alerts from a seeded SQLite database and times turning
+them into a response body:
+
+* pydantic: ORM objects validated into List[AlertResponse] and rendered by
+  FastAPI's response_model path (jsonable_encoder + JSONResponse), as the
+  endpoint used to;
+* rows + json: the model's columns selected as rows, encoded with the
+  stdlib encoder (http_cache.serialize_json without orjson);
+* rows + orjson: the same rows through orjson (what the endpoint does now).
+
+Also times fetching ORM objects vs. column rows, and checks all encodings
+decode to the same JSON. The seeded database is kept at ``--db``.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+from pathlib import Path
+from typing import List
+
+import common
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        with common.timer() as elapsed:
+            result = fn()
+        timings.append(elapsed["seconds"])
+    return result, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alerts", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--db", default=str(Path(tempfile.gettempdir()) / "bench_serialization.db"))
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    common.use_database(db_path)
+    fresh = not db_path.exists()
+
+    from database import Base, SessionLocal, engine
+    import models  # noqa: F401  (registers the tables on Base)
+
+    Base.metadata.create_all(bind=engine)
+    if fresh:
+        print(f"Seeding 100 sensors / {args.alerts} alerts into {db_path} ...")
+        common.seed_database(engine, 100, args.alerts)
+
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    from sqlalchemy import desc, select
+
+    import http_cache
+    from main import ALERT_COLUMNS, row_dicts
+    from models import Alert
+    from schemas import AlertResponse
+
+    order = (desc(Alert.alert_time), desc(Alert.id))
+
+    def fetch_objects():
+        # A fresh session each time, as per request (no identity map reuse)
+        with SessionLocal() as db:
+            return db.scalars(select(Alert).order_by(*order).limit(args.alerts)).all()
+
+    def fetch_rows():
+        with SessionLocal() as db:
+            return row_dicts(db.execute(select(*ALERT_COLUMNS).order_by(*order).limit(args.alerts)))
+
+    alerts, orm_seconds = timed(fetch_objects, args.repeat)
+    rows, rows_seconds = timed(fetch_rows, args.repeat)
+    print(f"{len(alerts)} alerts")
+    print(f"   fetch ORM objects: median {orm_seconds * 1000:8.1f} ms")
+    print(f"   fetch as rows:     median {rows_seconds * 1000:8.1f} ms")
+
+    field = create_response_field(name="response", type_=List[AlertResponse])
+
+    def pydantic_body():
+        content = asyncio.run(serialize_response(
+            field=field, response_content=alerts, exclude_unset=True, is_coroutine=True
+        ))
+        return JSONResponse(content).body
+
+    orjson = http_cache.orjson
+    http_cache.orjson = None
+    json_body, json_seconds = timed(lambda: http_cache.serialize_json(rows), args.repeat)
+    http_cache.orjson = orjson
+
+    baseline, pydantic_seconds = timed(pydantic_body, args.repeat)
+    print(f"   pydantic:          median {pydantic_seconds * 1000:8.1f} ms")
+    print(f"   rows + json:       median {json_seconds * 1000:8.1f} ms "
+          f"({pydantic_seconds / json_seconds:.1f}x)")
+    if orjson is not None:
+        orjson_body, orjson_seconds = timed(lambda: http_cache.serialize_json(rows), args.repeat)
+        print(f"   rows + orjson:     median {orjson_seconds * 1000:8.1f} ms "
+              f"({pydantic_seconds / orjson_seconds:.1f}x)")
+        assert json.loads(orjson_body) == json.loads(baseline)
+    else:
+        print("   rows + orjson:     (orjson not installed)")
+    assert json.loads(json_body) == json.loads(baseline)
+    print(f"Same JSON ({len(baseline) / 1024:.0f} KiB).")
+
+
+if __name__ == "__main__":
+    main()
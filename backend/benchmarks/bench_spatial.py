@@ -0,0 +1,84 @@
+"""
+Benchmark: map queries over many sensors.
+
+    python benchmarks/bench_spatial.py --sensors 50000
+
+Seeds ``--sensors`` sensors over a 2 x 2 degree area and times, per request:
+the full GET /api/sensors list the map used to load, a zoomed-in
+``?bbox=`` view, GET /api/sensors/clusters for the whole area at low zoom,
+and GET /api/sensors/nearest. Nearest results are checked against a brute
+force scan. The seeded database is kept at ``--db``.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import common
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=50_000)
+    parser.add_argument("--alerts", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", default=str(Path(tempfile.gettempdir()) / "bench_spatial.db"))
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    common.use_database(db_path)
+    fresh = not db_path.exists()
+
+    from database import Base, create_missing_indexes, engine
+    import models  # noqa: F401  (registers the tables on Base)
+
+    Base.metadata.create_all(bind=engine)
+    create_missing_indexes(engine)
+    if fresh:
+        print(f"Seeding {args.sensors} sensors / {args.alerts} alerts into {db_path} ...")
+        common.seed_database(engine, args.sensors, args.alerts)
+
+    from fastapi.testclient import TestClient
+    from main import app
+    from models import Sensor
+    from database import SessionLocal
+    from spatial import haversine_km
+
+    with TestClient(app) as client:
+        client.post("/api/auth/register", json={
+            "username": "bench", "email": "bench@example.com", "full_name": "Bench", "password": "benchpass"
+        })
+        response = client.post("/api/auth/login", data={"username": "bench", "password": "benchpass"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        cases = [
+            ("all sensors", "/api/sensors"),
+            ("bbox 0.1 deg", "/api/sensors?bbox=36.95,-0.55,37.05,-0.45"),
+            ("clusters z8", "/api/sensors/clusters?bbox=36,-1.5,38,0.5&zoom=8"),
+            ("clusters z12", "/api/sensors/clusters?bbox=36.9,-0.6,37.1,-0.4&zoom=12"),
+            ("nearest 10", "/api/sensors/nearest?lat=-0.5&lon=37&limit=10"),
+        ]
+        for name, url in cases:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                response = client.get(url, headers=headers)
+                timings.append(time.perf_counter() - start)
+                response.raise_for_status()
+            print(f"{name:>13}: {len(response.json()):>6} items, "
+                  f"median {statistics.median(timings) * 1000:8.1f} ms, "
+                  f"{len(response.content) / 1024:8.1f} KiB")
+
+        nearest = client.get("/api/sensors/nearest?lat=-0.5&lon=37&limit=10", headers=headers).json()
+        with SessionLocal() as db:
+            brute = sorted(
+                (haversine_km(-0.5, 37, sensor.latitude, sensor.longitude), sensor.sensor_id)
+                for sensor in db.query(Sensor)
+            )[:10]
+        assert [sensor["sensor_id"] for sensor in nearest] == [sensor_id for _, sensor_id in brute]
+        print("Nearest matches brute force.")
+
+
+if __name__ == "__main__":
+    main()
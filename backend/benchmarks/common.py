@@ -0,0 +1,175 @@
+"""
+Shared helpers for the backend benchmarks.
+
+The benchmarks import the backend modules directly (``main``, ``models``,
+``database``), so ``DATABASE_URL`` has to point at the benchmark database
+before any of them are imported. Use ``use_database()`` first thing.
+"""
+import atexit
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+def use_database(path):
+    """
+    Point the backend at a benchmark SQLite file, or at any database URL
+    (e.g. a scratch PostgreSQL), before importing it.
+    """
+    if "://" in str(path):
+        os.environ["DATABASE_URL"] = str(path)
+    else:
+        os.environ["DATABASE_URL"] = f"sqlite:///{Path(path).resolve()}"
+    # Alerts are written synchronously, as by default in production, even if
+    # the shell exports the server's queue; see use_ingest_queue()
+    os.environ.pop("INGEST_QUEUE_PATH", None)
+
+
+def use_ingest_queue():
+    """
+    Enable the ingestion queue (after use_database()), with a fresh file per
+    run so nothing is left over from (or to) the server's own. It is removed
+    with its WAL files on exit.
+    """
+    queue_dir = tempfile.mkdtemp(prefix="bench_ingest_queue_")
+    atexit.register(shutil.rmtree, queue_dir, ignore_errors=True)
+    os.environ["INGEST_QUEUE_PATH"] = str(Path(queue_dir) / "ingest_queue.db")
+
+
+def seed_database(engine, n_sensors, n_alerts, unresolved_ratio=0.05, seed=42, batch_size=50_000):
+    """
+    Fill an empty database with ``n_sensors`` sensors and ``n_alerts`` alerts
+    spread over the last 90 days. Uses Core bulk inserts so a 1M-alert seed
+    takes seconds rather than minutes, then rebuilds sensor_states and the
+    alert rollups (which the API maintains on insert).
+    """
+    from models import Alert, Sensor
+    from rollups import backfill_rollups
+    from sensor_state import rebuild_sensor_states
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    sensor_ids = [f"sensor_{i:06d}" for i in range(n_sensors)]
+
+    with engine.begin() as conn:
+        conn.execute(Sensor.__table__.insert(), [
+            {
+                "sensor_id": sensor_id,
+                "sensor_name": f"Sensor {sensor_id}",
+                "latitude": rng.uniform(-1.5, 0.5),
+                "longitude": rng.uniform(36.0, 38.0),
+                "created_at": now,
+            }
+            for sensor_id in sensor_ids
+        ])
+
+        for start in range(0, n_alerts, batch_size):
+            rows = []
+            for _ in range(min(batch_size, n_alerts - start)):
+                sensor_id = rng.choice(sensor_ids)
+                resolved = rng.random() >= unresolved_ratio
+                alert_time = now - timedelta(seconds=rng.randint(0, 90 * 24 * 3600))
+                rows.append({
+                    "sensor_id": sensor_id,
+                    "sensor_name": f"Sensor {sensor_id}",
+                    "alert_time": alert_time,
+                    "resolved": resolved,
+                    "resolved_at": alert_time + timedelta(seconds=rng.randint(60, 6 * 3600)) if resolved else None,
+                    "threat_type": rng.choice(["real", "false"]) if resolved else None,
+                })
+            conn.execute(Alert.__table__.insert(), rows)
+
+    rebuild_sensor_states(engine)
+    backfill_rollups(engine)
+
+
+def seed_users(engine, n_users, password="benchpass", start=0):
+    """
+    Add ``n_users`` users named ``bench_user_{i}`` (i from ``start``), all
+    with ``password``. The bcrypt hash is computed once and shared, so
+    seeding stays fast. Returns the usernames.
+    """
+    from passlib.context import CryptContext
+
+    from models import User
+
+    hashed_password = CryptContext(schemes=["bcrypt"]).hash(password)
+    now = datetime.utcnow()
+    usernames = [f"bench_user_{i}" for i in range(start, start + n_users)]
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {
+                "username": username,
+                "email": f"{username}@example.com",
+                "full_name": username.replace("_", " ").title(),
+                "hashed_password": hashed_password,
+                "created_at": now,
+            }
+            for username in usernames
+        ])
+    return usernames
+
+
+class QueryCounter:
+    """Counts statements executed on an engine while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    @contextmanager
+    def track(self):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        try:
+            yield self
+        finally:
+            event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(samples, seconds=None):
+    """Request count and p50/p95/p99 (ms) for latency samples in seconds,
+    plus throughput when the wall-clock ``seconds`` they took is given."""
+    summary = {
+        "requests": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 1),
+        "p95_ms": round(percentile(samples, 95) * 1000, 1),
+        "p99_ms": round(percentile(samples, 99) * 1000, 1),
+        "max_ms": round(max(samples, default=0.0) * 1000, 1),
+    }
+    if seconds:
+        summary["throughput_rps"] = round(len(samples) / seconds, 1)
+    return summary
+
+
+@contextmanager
+def timer():
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - start
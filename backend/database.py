@@ -1,6 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateColumn
 import os
 
 # Use SQLite for development, PostgreSQL for production
@@ -10,14 +13,113 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./forest_protection.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+# Connection pool settings (PostgreSQL only; SQLite uses its default pool)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+def to_async_url(url: str):
+    """Map a sync database URL onto its async driver (aiosqlite / asyncpg)."""
+    url = make_url(url)
+    if url.drivername.startswith("sqlite"):
+        return url.set(drivername="sqlite+aiosqlite")
+    if url.drivername.startswith("postgresql"):
+        # asyncpg takes "ssl" where libpq takes "sslmode"
+        query = dict(url.query)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return url.set(drivername="postgresql+asyncpg", query=query)
+    return url
+
 if DATABASE_URL.startswith("sqlite"):
+    engine_options = {}
     engine = create_engine(
         DATABASE_URL, connect_args={"check_same_thread": False}
     )
 else:
-    engine = create_engine(DATABASE_URL)
+    engine_options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    engine = create_engine(DATABASE_URL, **engine_options)
+
+# The API uses the async engine; the sync engine is for scripts and
+# maintenance jobs that run outside the event loop.
+async_engine = create_async_engine(to_async_url(DATABASE_URL), **engine_options)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# expire_on_commit=False: attributes stay readable after commit without an
+# implicit (and, under asyncio, impossible) lazy refresh.
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
+def upsert(table, dialect_name: str):
+    """INSERT that supports on_conflict_do_update() on SQLite and PostgreSQL."""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+def create_missing_indexes(bind=engine):
+    """create_all() only indexes tables it creates; add indexes declared later."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+def create_missing_columns(bind=engine):
+    """create_all() does not alter existing tables; add columns declared later."""
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            return create_missing_columns(conn)
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                table_name = bind.dialect.identifier_preparer.format_table(table)
+                bind.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_ddl}"))
+
+def create_missing_autoincrement(bind=engine):
+    """
+    SQLite only: rebuild tables declared with sqlite_autoincrement=True that
+    were created without it. A plain INTEGER PRIMARY KEY hands the ids of
+    the highest deleted rows out again; AUTOINCREMENT never does.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            return create_missing_autoincrement(conn)
+    if bind.dialect.name != "sqlite":
+        return
+    for table in Base.metadata.sorted_tables:
+        if not table.dialect_options["sqlite"]["autoincrement"]:
+            continue
+        ddl = bind.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+        ).scalar()
+        if ddl is None or "AUTOINCREMENT" in ddl.upper():
+            continue
+        # Index names are per database, so the old ones go before the rename
+        for (index_name,) in bind.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :name AND sql IS NOT NULL"),
+            {"name": table.name},
+        ).all():
+            bind.execute(text(f'DROP INDEX "{index_name}"'))
+        old_name = f"_{table.name}_before_autoincrement"
+        bind.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{old_name}"'))
+        table.create(bind)
+        columns = ", ".join(f'"{column["name"]}"' for column in inspect(bind).get_columns(old_name))
+        bind.execute(text(f'INSERT INTO "{table.name}" ({columns}) SELECT {columns} FROM "{old_name}"'))
+        bind.execute(text(f'DROP TABLE "{old_name}"'))
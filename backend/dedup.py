@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from cache import TTLCache
+
+
+def as_naive_utc(value: datetime) -> datetime:
+    """Stored alert times are naive UTC; Node-RED may send offset-aware ones."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class OpenAlertIndex:
+    """
+    In-memory index of the latest open alert per sensor: sensor_id ->
+    (alert_id, last_seen). A detection within ``window_seconds`` of the open
+    alert's last detection is coalesced into it instead of becoming a new
+    alert. Entries expire after the window, so the index only holds sensors
+    that are currently firing.
+
+    The index is per process and is only a fast path: on a miss, callers
+    look the open alert up in the database, and the update itself checks the
+    alert is still unresolved.
+    """
+
+    def __init__(self, window_seconds: float, max_size: int = 10000):
+        self.window_seconds = window_seconds
+        self._entries = TTLCache(max_size=max_size, ttl_seconds=window_seconds)
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    def within_window(self, last_seen: datetime, detected_at: datetime) -> bool:
+        delta = as_naive_utc(detected_at) - as_naive_utc(last_seen)
+        return abs(delta.total_seconds()) <= self.window_seconds
+
+    def lookup(self, sensor_id: str) -> Optional[tuple]:
+        """(alert_id, last_seen) of the sensor's open alert, if indexed."""
+        return self._entries.get(sensor_id)
+
+    def remember(self, sensor_id: str, alert_id: int, last_seen: datetime):
+        self._entries.set(sensor_id, (alert_id, last_seen))
+
+    def forget(self, sensor_id: str, alert_id: Optional[int] = None):
+        """Drop the sensor's entry (only if it points at ``alert_id``, when given)."""
+        entry = self._entries.get(sensor_id)
+        if entry is not None and (alert_id is None or entry[0] == alert_id):
+            self._entries.invalidate(sensor_id)
+
+    def stats(self) -> dict:
+        return {"window_seconds": self.window_seconds, **self._entries.stats()}
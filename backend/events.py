@@ -0,0 +1,100 @@
+import asyncio
+import itertools
+import json
+import uuid
+from collections import deque
+from typing import Optional
+
+# Event ids look like "<boot_id>-<sequence>". The boot id changes on every
+# process start, so a client resuming with an id from a previous run (or
+# from another worker) is told to resync instead of silently missing events.
+RESYNC_EVENT = "resync"
+
+
+class Subscription:
+    """One connected client: a bounded queue of events to send."""
+
+    def __init__(self, max_queue_size: int):
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+        self.overflowed = False
+
+    def push(self, event: dict):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop what is queued and ask it to refetch.
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"id": None, "type": RESYNC_EVENT, "data": {"reason": "overflow"}})
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker:
+    """
+    In-process pub/sub for alert events, fanned out to Server-Sent Events
+    clients. Keeps the last ``history_size`` events so reconnecting clients
+    can resume from their Last-Event-ID.
+
+    State lives in this process only: run a single worker, or each worker's
+    clients only see writes handled by that worker.
+    """
+
+    def __init__(self, history_size: int = 1000, max_queue_size: int = 256):
+        self.boot_id = uuid.uuid4().hex[:8]
+        self.history = deque(maxlen=history_size)
+        self.max_queue_size = max_queue_size
+        self.subscribers = set()
+        self._sequence = itertools.count(1)
+
+    def publish(self, event_type: str, data: dict) -> dict:
+        event = {"id": f"{self.boot_id}-{next(self._sequence)}", "type": event_type, "data": data}
+        self.history.append(event)
+        for subscription in list(self.subscribers):
+            subscription.push(event)
+        return event
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscription:
+        subscription = Subscription(self.max_queue_size)
+        if last_event_id:
+            for event in self._replay(last_event_id):
+                subscription.push(event)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    def _replay(self, last_event_id: str):
+        boot_id, _, sequence = last_event_id.partition("-")
+        resync = [{"id": None, "type": RESYNC_EVENT, "data": {"reason": "history_unavailable"}}]
+        if boot_id != self.boot_id or not sequence.isdigit():
+            return resync
+        sequence = int(sequence)
+        if self.history and sequence < self._sequence_of(self.history[0]) - 1:
+            # Some events after the client's last one were already evicted.
+            return resync
+        return [event for event in self.history if self._sequence_of(event) > sequence]
+
+    @staticmethod
+    def _sequence_of(event: dict) -> int:
+        return int(event["id"].rsplit("-", 1)[1])
+
+
+def format_sse(event: dict) -> str:
+    lines = []
+    if event["id"]:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event['data'], default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+alert_events = EventBroker()
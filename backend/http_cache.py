@@ -0,0 +1,98 @@
+import itertools
+import json
+import uuid
+from typing import Awaitable, Callable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from cache import TTLCache
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib encoder gives the same JSON
+    orjson = None
+
+
+def _default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def serialize_json(payload) -> bytes:
+    """
+    Encode plain data (dicts, lists, str/int/float/bool/None, datetimes) the
+    way the response models would render it, without validating each row.
+    Callers select exactly the schema's columns, so the shape is the same.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+class ResponseCache:
+    """
+    Conditional GET for polled read endpoints. Every committed write to
+    alerts or sensors bumps a data version (see the session listeners in
+    main.py); responses carry it as their ETag, so a client sending it back
+    in If-None-Match gets a 304 without any query running. Serialized bodies
+    are also kept for ``ttl_seconds`` per URL, so other clients polling the
+    same URL at the same version skip the queries and serialization too.
+
+    The version lives in this process and only sees writes made through it,
+    so this assumes a single API worker (as the alert stream does).
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.boot_id = uuid.uuid4().hex[:8]
+        self._versions = itertools.count(1)
+        self.version = 0
+        self._responses = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.not_modified = 0
+
+    def bump(self):
+        self.version = next(self._versions)
+
+    def etag(self, version: int) -> str:
+        return f'"{self.boot_id}-{version}"'
+
+    async def respond(
+        self,
+        request: Request,
+        build: Callable[[], Awaitable[Tuple[object, dict]]],
+        serialize: Callable[[object], bytes] = serialize_json,
+    ) -> Response:
+        """
+        304 if the client has the current version, else the cached body for
+        this URL, else ``build()`` -> (payload, extra headers) serialized
+        and cached. The version is read before building, so a write that
+        lands mid-build leaves the entry already stale.
+        """
+        version = self.version
+        etag = self.etag(version)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        key = f"{request.url.path}?{request.url.query}"
+        entry = self._responses.get(key)
+        if entry is not None and entry[0] == version:
+            _, body, extra_headers = entry
+        else:
+            payload, extra_headers = await build()
+            body = serialize(payload)
+            self._responses.set(key, (version, body, extra_headers))
+        return Response(body, media_type="application/json", headers={**extra_headers, **headers})
+
+    def stats(self) -> dict:
+        return {"version": self.version, "not_modified": self.not_modified, **self._responses.stats()}
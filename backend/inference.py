@@ -0,0 +1,275 @@
+import asyncio
+import io
+import os
+import sys
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+
+# The preprocessing is shared with training (audio_features.py at the repo
+# root). When the backend is deployed on its own, point MODEL_CODE_DIR at a
+# copy of it; without it only pre-computed feature tensors can be classified.
+MODEL_CODE_DIR = Path(os.getenv("MODEL_CODE_DIR", Path(__file__).resolve().parents[1]))
+if str(MODEL_CODE_DIR) not in sys.path:
+    sys.path.append(str(MODEL_CODE_DIR))
+
+try:
+    import audio_features
+except ImportError:
+    audio_features = None
+
+INFERENCE_MODEL_PATH = Path(os.getenv(
+    "INFERENCE_MODEL_PATH", MODEL_CODE_DIR / "audio_classifier_quantized.tflite"
+))
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "32"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+INFERENCE_NUM_THREADS = int(os.getenv("INFERENCE_NUM_THREADS", "1"))
+
+WAV_CONTENT_TYPES = ("audio/wav", "audio/x-wav", "audio/wave")
+
+
+def _interpreter_class():
+    # Prefer the standalone runtimes; fall back to full TensorFlow.
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        import tensorflow as tf
+        return tf.lite.Interpreter
+    except ImportError:
+        return None
+
+
+class TFLiteClassifier:
+    """
+    One TFLite interpreter for the audio classifier. Handles the int8
+    quantization of the model's input and output, and resizes the batch
+    dimension to fit each call. Not thread-safe: call from one thread.
+    """
+
+    def __init__(self, model_path: Path, num_threads: int = 1):
+        interpreter_class = _interpreter_class()
+        if interpreter_class is None:
+            raise RuntimeError("No TFLite runtime installed (ai-edge-litert, tflite-runtime or tensorflow)")
+        self.interpreter = interpreter_class(model_path=str(model_path), num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        input_details = self.interpreter.get_input_details()[0]
+        output_details = self.interpreter.get_output_details()[0]
+        self.input_index = input_details["index"]
+        self.output_index = output_details["index"]
+        self.input_dtype = input_details["dtype"]
+        self.input_quantization = input_details["quantization"]
+        self.output_quantization = output_details["quantization"]
+        self.input_shape = tuple(int(dim) for dim in input_details["shape"][1:])
+        self.num_classes = int(output_details["shape"][-1])
+        self._batch_size = int(input_details["shape"][0])
+
+    @property
+    def feature_shape(self):
+        """Shape of one feature tensor, without the trailing channel axis."""
+        if len(self.input_shape) == 3 and self.input_shape[-1] == 1:
+            return self.input_shape[:-1]
+        return self.input_shape
+
+    @property
+    def class_names(self) -> List[str]:
+        if audio_features is not None and len(audio_features.CLASS_NAMES) == self.num_classes:
+            return audio_features.CLASS_NAMES
+        return [f"class_{i}" for i in range(self.num_classes)]
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Class probabilities for an (N, *feature_shape) float array."""
+        batch = np.asarray(features, dtype=np.float32).reshape((len(features),) + self.input_shape)
+        if len(batch) != self._batch_size:
+            self.interpreter.resize_tensor_input(self.input_index, batch.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = len(batch)
+
+        if self.input_dtype != np.float32:
+            scale, zero_point = self.input_quantization
+            info = np.iinfo(self.input_dtype)
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(self.input_dtype)
+        self.interpreter.set_tensor(self.input_index, batch)
+        self.interpreter.invoke()
+        scores = self.interpreter.get_tensor(self.output_index).astype(np.float32)
+        if self.output_quantization[0]:
+            scale, zero_point = self.output_quantization
+            scores = (scores - zero_point) * scale
+        return scores
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> TFLiteClassifier:
+    """Load the model once; 503 if it (or a runtime) is not available."""
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            if not INFERENCE_MODEL_PATH.exists():
+                raise HTTPException(status_code=503, detail="Inference model not available")
+            try:
+                _classifier = TFLiteClassifier(INFERENCE_MODEL_PATH, INFERENCE_NUM_THREADS)
+            except (RuntimeError, ValueError) as e:
+                print(f"Failed to load inference model {INFERENCE_MODEL_PATH}: {e}")
+                raise HTTPException(status_code=503, detail="Inference model not available")
+        return _classifier
+
+
+def prepare_audio(samples) -> np.ndarray:
+    """Pad or truncate a mono clip to the model's clip length."""
+    if audio_features is None:
+        raise HTTPException(status_code=503, detail="Audio preprocessing not available; send features")
+    clip = np.asarray(samples, dtype=np.float32).ravel()
+    n_samples = audio_features.N_SAMPLES
+    if len(clip) >= n_samples:
+        return clip[:n_samples]
+    return np.pad(clip, (0, n_samples - len(clip)))
+
+
+def decode_wav(body: bytes) -> np.ndarray:
+    """16-bit mono PCM WAV at the training sample rate -> float samples in [-1, 1)."""
+    try:
+        with wave.open(io.BytesIO(body)) as wav:
+            params = wav.getparams()
+            frames = wav.readframes(params.nframes)
+    except (wave.Error, EOFError):
+        raise HTTPException(status_code=400, detail="Invalid WAV file")
+    if params.sampwidth != 2 or params.nchannels != 1:
+        raise HTTPException(status_code=422, detail="WAV must be 16-bit mono PCM")
+    if audio_features is not None and params.framerate != audio_features.SAMPLE_RATE:
+        raise HTTPException(
+            status_code=422, detail=f"WAV sample rate must be {audio_features.SAMPLE_RATE} Hz"
+        )
+    return np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent classification requests into one interpreter call.
+    The first queued request opens a batch; it is run once ``max_batch_size``
+    requests have joined or ``max_wait_ms`` has passed, whichever comes first.
+    Requests that arrive while a batch is running are already waiting when it
+    finishes, so under load batches fill without waiting for the deadline.
+    Feature extraction and inference run on a single worker thread, off the
+    event loop.
+    """
+
+    def __init__(self, max_batch_size: int = INFERENCE_MAX_BATCH_SIZE, max_wait_ms: float = INFERENCE_MAX_WAIT_MS):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.batches = 0
+        self.items = 0
+
+    async def classify(self, kind: str, data: np.ndarray) -> dict:
+        """Queue one clip (``kind="audio"``) or feature tensor (``"features"``)."""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((kind, data, future))
+        return await future
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            try:
+                results = await loop.run_in_executor(self._executor, self._process, batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _process(self, batch: list) -> List[dict]:
+        classifier = get_classifier()
+        features = np.zeros((len(batch),) + classifier.feature_shape, dtype=np.float32)
+        audio_rows = [i for i, (kind, _, _) in enumerate(batch) if kind == "audio"]
+        if audio_rows:
+            clips = np.stack([batch[i][1] for i in audio_rows])
+            features[audio_rows] = audio_features.extract_spectrogram_features_batch(
+                clips, audio_features.SAMPLE_RATE, classifier.feature_shape[0],
+                fixed_time_steps=classifier.feature_shape[1], dtype=np.float32, verbose=False
+            )
+        for i, (kind, data, _) in enumerate(batch):
+            if kind == "features":
+                features[i] = data
+
+        scores = classifier.predict(features)
+        class_names = classifier.class_names
+        results = []
+        for row in scores:
+            best = int(np.argmax(row))
+            results.append({
+                "label": class_names[best],
+                "confidence": float(row[best]),
+                "scores": {name: float(score) for name, score in zip(class_names, row)},
+                "batch_size": len(batch),
+            })
+        return results
+
+
+batcher = MicroBatcher()
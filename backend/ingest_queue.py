@@ -0,0 +1,307 @@
+"""
+Durable local queue in front of alert ingestion.
+
+When INGEST_QUEUE_PATH is set (it is empty, i.e. off, by default),
+POST /api/alerts appends each accepted detection to a SQLite file in WAL
+mode and answers 202 straight away instead of 200 with the stored alert, so
+clients must accept 202 as success (see NODE_RED_INTEGRATION.md). A
+background task drains the file into
+the database in batches (through the same path as POST /api/alerts/batch,
+so coalescing, sensor_states and the rollups are maintained as usual).
+While the database is slow or restarting, detections wait on local disk
+instead of failing the request; Node-RED's HTTP node does not retry.
+
+Every entry carries an idempotency key: the client's Idempotency-Key
+header, or a generated one. A key already queued is not queued twice, and
+the drain records applied keys in the database (ingest_keys) in the same
+transaction as the alerts, so an entry replayed after a crash between that
+commit and its removal from the file is skipped rather than counted twice.
+
+Connection-level errors (database down, locked, pool exhausted) back the
+drain off exponentially, up to INGEST_QUEUE_MAX_BACKOFF_SECONDS, and retry
+indefinitely. Any other error retries the failed batch one entry at a time;
+an entry that fails INGEST_QUEUE_MAX_ATTEMPTS times is parked as dead (see
+the ingest stats) so it cannot hold up the entries behind it.
+``python ingest_queue.py requeue`` puts dead entries back.
+
+The file belongs to one process: run the API with a single worker, or give
+each worker its own INGEST_QUEUE_PATH. Without INGEST_QUEUE_PATH,
+POST /api/alerts writes to the database directly.
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable, List, NamedTuple, Optional
+
+from sqlalchemy import exc as sa_exc
+
+import metrics
+
+INGEST_QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "")
+INGEST_QUEUE_BATCH_SIZE = int(os.getenv("INGEST_QUEUE_BATCH_SIZE", "500"))
+INGEST_QUEUE_MAX_ATTEMPTS = int(os.getenv("INGEST_QUEUE_MAX_ATTEMPTS", "10"))
+INGEST_QUEUE_MAX_BACKOFF_SECONDS = float(os.getenv("INGEST_QUEUE_MAX_BACKOFF_SECONDS", "30"))
+# FULL survives power loss; NORMAL only process crashes, but appends faster
+INGEST_QUEUE_SYNCHRONOUS = os.getenv("INGEST_QUEUE_SYNCHRONOUS", "FULL").upper()
+
+# Errors that say nothing about the entries themselves
+TRANSIENT_ERRORS = (
+    sa_exc.OperationalError, sa_exc.InterfaceError, sa_exc.TimeoutError, sa_exc.DisconnectionError,
+    ConnectionError, OSError, asyncio.TimeoutError,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    dead INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_entries_dead_seq ON entries (dead, seq);
+"""
+
+
+def _describe(error: Exception) -> str:
+    lines = str(error).strip().splitlines()
+    return f"{type(error).__name__}: {lines[0] if lines else ''}"[:500]
+
+
+class Entry(NamedTuple):
+    seq: int
+    key: str
+    payload: str
+    attempts: int
+
+
+class IngestQueue:
+    """
+    The queue file and its drain task. All SQLite access happens on one
+    worker thread, off the event loop; the drain task is started by the
+    first put() or by start(), whichever comes first.
+    """
+
+    def __init__(self, path: str = INGEST_QUEUE_PATH, batch_size: int = INGEST_QUEUE_BATCH_SIZE,
+                 max_attempts: int = INGEST_QUEUE_MAX_ATTEMPTS,
+                 max_backoff_seconds: float = INGEST_QUEUE_MAX_BACKOFF_SECONDS,
+                 synchronous: str = INGEST_QUEUE_SYNCHRONOUS):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.max_backoff = max_backoff_seconds
+        self.synchronous = synchronous
+        self.handler: Optional[Callable[[List[Entry]], Awaitable[None]]] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.pending = 0
+        self.dead = 0
+        self.enqueued = 0
+        self.duplicates = 0
+        self.drained = 0
+        self.batches = 0
+        self.transient_failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    # --- SQLite, on the queue thread ---
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.executescript(SCHEMA)
+            counts = dict(conn.execute("SELECT dead, COUNT(*) FROM entries GROUP BY dead").fetchall())
+            self.pending, self.dead = counts.get(0, 0), counts.get(1, 0)
+            self._conn = conn
+        return self._conn
+
+    def _append(self, key: str, payload: str) -> bool:
+        cursor = self._connection().execute(
+            "INSERT OR IGNORE INTO entries (idempotency_key, payload, enqueued_at) VALUES (?, ?, ?)",
+            (key, payload, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def _claim(self, limit: int) -> List[Entry]:
+        rows = self._connection().execute(
+            "SELECT seq, idempotency_key, payload, attempts FROM entries WHERE dead = 0 ORDER BY seq LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [Entry(*row) for row in rows]
+
+    def _ack(self, seqs: List[int]):
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany("DELETE FROM entries WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def _fail(self, seq: int, error: str, dead: bool):
+        self._connection().execute(
+            "UPDATE entries SET attempts = attempts + 1, last_error = ?, dead = ? WHERE seq = ?",
+            (error, int(dead), seq),
+        )
+
+    def _requeue_dead(self) -> int:
+        cursor = self._connection().execute("UPDATE entries SET dead = 0, attempts = 0 WHERE dead = 1")
+        return cursor.rowcount
+
+    def _close_connection(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _call(self, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-queue")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    # --- API ---
+
+    async def put(self, key: str, payload: str) -> bool:
+        """Durably queue one payload; False if ``key`` is already queued."""
+        added = await self._call(self._append, key, payload)
+        if added:
+            self.enqueued += 1
+            self.pending += 1
+            metrics.ingest_queue_depth.set(self.pending)
+        else:
+            self.duplicates += 1
+        self.start()
+        self._wakeup.set()
+        return added
+
+    def start(self):
+        """Start draining (also picks up entries left by a previous run)."""
+        if self.handler is None:
+            raise RuntimeError("IngestQueue.handler is not set")
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._executor is not None:
+            await self._call(self._close_connection)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def requeue_dead(self) -> int:
+        count = await self._call(self._requeue_dead)
+        self.pending += count
+        self.dead -= count
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return count
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": self.pending,
+            "dead": self.dead,
+            "enqueued": self.enqueued,
+            "duplicates": self.duplicates,
+            "drained": self.drained,
+            "batches": self.batches,
+            "transient_failures": self.transient_failures,
+            "last_error": self.last_error,
+        }
+
+    # --- Drain ---
+
+    async def _backoff(self, delay: float) -> float:
+        delay = min(max(delay * 2, 0.5), self.max_backoff)
+        await asyncio.sleep(delay)
+        return delay
+
+    async def _run(self):
+        delay = 0.0
+        one_by_one = 0  # entries left to retry singly after a failed batch
+        while True:
+            try:
+                self._wakeup.clear()
+                entries = await self._call(self._claim, 1 if one_by_one else self.batch_size)
+                if not entries:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=5)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                try:
+                    await self.handler(entries)
+                except TRANSIENT_ERRORS as e:
+                    self.transient_failures += 1
+                    self.last_error = _describe(e)
+                    print(f"Ingest queue: database unavailable, retrying ({self.last_error})")
+                    delay = await self._backoff(delay)
+                    continue
+                except Exception as e:
+                    self.last_error = _describe(e)
+                    if len(entries) > 1:
+                        # Find the entry at fault by retrying them one at a time
+                        one_by_one = len(entries)
+                        continue
+                    entry = entries[0]
+                    dead = entry.attempts + 1 >= self.max_attempts
+                    await self._call(self._fail, entry.seq, self.last_error, dead)
+                    print(f"Ingest queue: entry {entry.key} failed"
+                          f"{' permanently' if dead else ''}: {self.last_error}")
+                    if dead:
+                        self.pending -= 1
+                        self.dead += 1
+                        metrics.ingest_queue_depth.set(self.pending)
+                        one_by_one = max(0, one_by_one - 1)
+                    delay = await self._backoff(delay)
+                    continue
+
+                await self._call(self._ack, [entry.seq for entry in entries])
+                delay = 0.0
+                one_by_one = max(0, one_by_one - len(entries))
+                self.pending -= len(entries)
+                self.drained += len(entries)
+                self.batches += 1
+                metrics.ingest_queue_depth.set(self.pending)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The queue file itself (disk full, ...); keep the task alive
+                self.last_error = _describe(e)
+                print(f"Ingest queue error: {self.last_error}")
+                delay = await self._backoff(delay)
+
+
+queue = IngestQueue()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or repair the alert ingestion queue")
+    parser.add_argument("command", choices=["stats", "requeue"])
+    args = parser.parse_args()
+
+    if not queue.enabled:
+        raise SystemExit("INGEST_QUEUE_PATH is not set: the queue is disabled")
+    if not Path(queue.path).exists():
+        raise SystemExit(f"{queue.path} does not exist")
+    if args.command == "requeue":
+        print(f"Requeued {queue._requeue_dead()} dead entries; a running API picks them up within seconds")
+    queue._connection()
+    print(f"{queue.pending} pending, {queue.dead} dead in {queue.path}")
+    queue._close_connection()
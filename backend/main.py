@@ -1,28 +1,96 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Request, Query, Header
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from fastapi.exceptions import RequestValidationError
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, desc, func, case, or_, and_, event
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Literal
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, ValidationError
+import asyncio
+import base64
+import json
+import math
+import numpy as np
+from contextlib import asynccontextmanager
 import os
+import time
+import uuid
 from pathlib import Path
 
-from database import SessionLocal, engine, Base
-from models import User, Alert, Sensor
+import archive
+from cache import TTLCache
+from database import (
+    AsyncSessionLocal, SessionLocal, async_engine, Base, create_missing_autoincrement, create_missing_columns,
+    create_missing_indexes, upsert
+)
+from dedup import OpenAlertIndex, as_naive_utc
+from events import alert_events, format_sse
+from http_cache import ResponseCache
+import inference
+import ingest_queue
+import metrics
+import passwords
+from models import User, Alert, AlertArchive, IngestKey, Sensor, SensorState
+from ratelimit import RateLimiter
+import rollups
+import sensor_state
+from spatial import (
+    KM_PER_DEGREE, MAX_ZOOM, around, bbox_condition, cluster_cell_degrees, grid_cell,
+    haversine_km, parse_bbox
+)
+from uploads import UploadSizeLimitMiddleware, discard_upload, save_upload, file_response, thumbnail_path_for
 from schemas import (
     UserCreate, UserResponse, Token, AlertCreate, AlertResponse,
-    AlertResolve, SensorResponse, SensorCreate
+    AlertResolve, SensorResponse, SensorCreate, AlertBatchResponse, AlertSummary,
+    ClassifyRequest, ClassifyResponse, SensorCluster, SensorDistance, AnalyticsResponse,
+    ArchivedAlertResponse
 )
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_missing_columns)
+        await conn.run_sync(create_missing_indexes)
+        await conn.run_sync(create_missing_autoincrement)
+        await conn.run_sync(archive.reserve_archived_ids)
+        await conn.run_sync(sensor_state.ensure_sensor_states)
+    if ingest_queue.queue.enabled:
+        # Drains whatever the previous run left queued
+        ingest_queue.queue.start()
+    archiver = asyncio.create_task(archive_periodically()) if archive.ARCHIVE_AFTER_DAYS > 0 else None
+    yield
+    if archiver is not None:
+        archiver.cancel()
+    await ingest_queue.queue.close()
+    await inference.batcher.close()
+    await async_engine.dispose()
+
+app = FastAPI(title="Forest Protection IoT Dashboard API", lifespan=lifespan)
 
-app = FastAPI(title="Forest Protection IoT Dashboard API")
+# Batch ingestion
+MAX_ALERT_BATCH_SIZE = int(os.getenv("MAX_ALERT_BATCH_SIZE", "5000"))
+MAX_ALERT_BATCH_BYTES = int(float(os.getenv("MAX_ALERT_BATCH_MB", "10")) * 1024 * 1024)
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+# A 2 s clip is 64 KB as WAV, roughly 700 KB as JSON floats
+MAX_CLASSIFY_BYTES = int(float(os.getenv("MAX_CLASSIFY_MB", "1")) * 1024 * 1024)
+
+# Oversized bodies are refused from their Content-Length before any of them
+# is read (the form parser would otherwise spool a whole evidence upload).
+# Registered before CORS so that CORS wraps them and the 413 reaches
+# browsers with its CORS headers.
+app.add_middleware(UploadSizeLimitMiddleware, path_pattern=r"/api/alerts/[^/]+/resolve")
+app.add_middleware(UploadSizeLimitMiddleware, path_pattern=r"/api/alerts/batch", max_bytes=MAX_ALERT_BATCH_BYTES,
+                   detail=f"Batch exceeds {MAX_ALERT_BATCH_BYTES // (1024 * 1024)} MB")
+app.add_middleware(UploadSizeLimitMiddleware, path_pattern=r"/api/inference/classify", max_bytes=MAX_CLASSIFY_BYTES,
+                   detail=f"Request body exceeds {MAX_CLASSIFY_BYTES // 1024} KB")
 
 # CORS configuration
 # Get frontend URL from environment variable, default to allow all for development
@@ -52,31 +120,98 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Request/DB metrics for GET /metrics (outermost, so it times everything)
+app.add_middleware(metrics.MetricsMiddleware, fastapi_app=app)
+metrics.instrument_engine(async_engine.sync_engine)
+
 # Security
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+# Authentication caches: decoded JWT payloads keyed by the raw token (skips
+# signature verification on repeat requests) and users keyed by the token's
+# subject (skips the users lookup). Both are per process; the TTL bounds how
+# stale a user can be when it is changed by another worker.
+token_cache = TTLCache(
+    max_size=int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300")),
+)
+user_cache = TTLCache(
+    max_size=int(os.getenv("USER_CACHE_MAX_SIZE", "1000")),
+    ttl_seconds=float(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+)
+
+# Polled reads (alerts, sensors, dashboard) answer If-None-Match with 304
+# until the next committed alert/sensor write, and share serialized bodies
+# per URL for a few seconds.
+response_cache = ResponseCache(
+    max_size=int(os.getenv("RESPONSE_CACHE_MAX_SIZE", "256")),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "5")),
+)
+
+# Login throttling on failed attempts only, per client address (generous:
+# operators may share a NAT) and per client address and username, so
+# password guessing cannot tie up the bcrypt workers and nobody elsewhere
+# can lock an account out. Behind a proxy the client address is only right
+# with uvicorn --proxy-headers. Rates are per minute; 0 disables.
+login_ip_limiter = RateLimiter(
+    float(os.getenv("LOGIN_IP_RATE_PER_MINUTE", "60")) / 60, float(os.getenv("LOGIN_IP_BURST", "30"))
+)
+login_user_limiter = RateLimiter(
+    float(os.getenv("LOGIN_USER_RATE_PER_MINUTE", "6")) / 60, float(os.getenv("LOGIN_USER_BURST", "5"))
+)
+
+# Repeat detections from a sensor within this many seconds of its open
+# alert's last detection update that alert instead of creating a new one
+# (0 disables). Misbehaving devices are throttled per sensor_id.
+ALERT_COALESCE_WINDOW_SECONDS = float(os.getenv("ALERT_COALESCE_WINDOW_SECONDS", "300"))
+ALERT_RATE_PER_SECOND = float(os.getenv("ALERT_RATE_PER_SECOND", "1"))
+ALERT_RATE_BURST = float(os.getenv("ALERT_RATE_BURST", "30"))
+open_alerts = OpenAlertIndex(ALERT_COALESCE_WINDOW_SECONDS)
+sensor_rate_limiter = RateLimiter(ALERT_RATE_PER_SECOND, ALERT_RATE_BURST)
+# Idempotency keys of queued detections are kept this long after being
+# applied (see ingest_queue.py); a client retry within it is not duplicated
+INGEST_KEY_RETENTION_HOURS = float(os.getenv("INGEST_KEY_RETENTION_HOURS", "24"))
+MAX_IDEMPOTENCY_KEY_LENGTH = 128
+
+# Alert list pagination
+DEFAULT_ALERT_PAGE_SIZE = 100
+MAX_ALERT_PAGE_SIZE = 1000
+# List endpoints select exactly their response model's columns and encode
+# the rows directly (http_cache.serialize_json) instead of validating ORM
+# objects one by one.
+ALERT_COLUMNS = [getattr(Alert, name) for name in AlertResponse.model_fields]
+ALERT_SUMMARY_COLUMNS = [getattr(Alert, name) for name in AlertSummary.model_fields]
+ARCHIVED_ALERT_COLUMNS = [getattr(AlertArchive, name) for name in ArchivedAlertResponse.model_fields]
+SENSOR_COLUMNS = [getattr(Sensor, name) for name in SensorResponse.model_fields]
+
+# Spatial queries
+MAX_NEAREST_SENSORS = 500
+NEAREST_INITIAL_RADIUS_DEGREES = 0.05  # about 5.5 km
+
+# Analytics
+ANALYTICS_DEFAULT_DAYS = 7
+
+# Server-Sent Events
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
 
 # Upload directory
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def row_dicts(result) -> List[dict]:
+    # zip() over the keys once is about twice as fast as RowMapping/_asdict()
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -88,38 +223,87 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def authenticate_token(token: str, db: AsyncSession) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
             raise credentials_exception
-    except JWTError:
+        # Never serve a cached payload past the token's own expiry
+        token_cache.set(token, payload, ttl_seconds=payload.get("exp", 0) - time.time())
+    username: str = payload.get("sub")
+    if username is None:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+    user = user_cache.get(username)
     if user is None:
-        raise credentials_exception
+        user = await db.scalar(select(User).where(User.username == username))
+        if user is None:
+            raise credentials_exception
+        # Detach so the cached instance can be shared across sessions
+        db.expunge(user)
+        user_cache.set(username, user)
     return user
 
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.username)
+
+# Any committed write to alerts or sensors (ORM objects or bulk statements)
+# moves the response cache to a new version, which changes every ETag.
+@event.listens_for(Session, "after_flush")
+def note_flushed_data_change(session, flush_context):
+    changed = (*session.new, *session.dirty, *session.deleted)
+    if any(isinstance(instance, (Alert, Sensor)) for instance in changed):
+        session.info["data_changed"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def note_executed_data_change(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["data_changed"] = True
+
+@event.listens_for(Session, "after_commit")
+def bump_data_version(session):
+    if session.info.pop("data_changed", False):
+        response_cache.bump()
+
+@event.listens_for(Session, "after_rollback")
+def forget_data_change(session):
+    session.info.pop("data_changed", None)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    return await authenticate_token(token, db)
+
+async def get_browser_user(
+    header_token: Optional[str] = Depends(optional_oauth2_scheme),
+    token: Optional[str] = Query(None)
+):
+    # EventSource and <img>/<video> tags cannot send headers, so the token may
+    # come as ?token=. Uses its own short-lived session: a get_db session would
+    # stay checked out for as long as the response is streaming.
+    async with AsyncSessionLocal() as db:
+        return await authenticate_token(header_token or token or "", db)
+
 # Auth endpoints
 @app.post("/api/auth/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     # Check if user exists
-    db_user = db.query(User).filter(User.username == user_data.username).first()
+    db_user = await db.scalar(select(User).where(User.username == user_data.username))
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    db_user = db.query(User).filter(User.email == user_data.email).first()
+    db_user = await db.scalar(select(User).where(User.email == user_data.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await passwords.hash_password(user_data.password)
     db_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -127,19 +311,45 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     return db_user
 
 @app.post("/api/auth/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_db)
+):
+    client_host = request.client.host if request.client else "unknown"
+    user_key = (client_host, form_data.username.lower())
+    # The (address, username) token is spent up front so concurrent guesses
+    # cannot overrun it, and handed back by the reset on success; the
+    # address bucket only counts failures, so a shift change behind one NAT
+    # is never throttled.
+    retry_after = login_ip_limiter.peek(client_host) or login_user_limiter.check(user_key)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+    user = await db.scalar(select(User).where(User.username == form_data.username))
+    valid, new_hash = (
+        await passwords.verify_password(form_data.password, user.hashed_password) if user else (False, None)
+    )
+    if not valid:
+        login_ip_limiter.check(client_host)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored with a different bcrypt cost than BCRYPT_ROUNDS
+        user.hashed_password = new_hash
+        await db.commit()
+    login_user_limiter.reset(user_key)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
@@ -150,10 +360,20 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
 async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
+@app.get("/api/auth/cache/stats")
+async def get_auth_cache_stats(current_user: User = Depends(get_current_user)):
+    return {
+        "token_cache": token_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "password_hashing": passwords.stats(),
+        "login_throttle": {"ip": login_ip_limiter.stats(), "username": login_user_limiter.stats()}
+    }
+
 # Sensor endpoints
 @app.post("/api/sensors", response_model=SensorResponse)
-async def create_sensor(sensor_data: SensorCreate, db: Session = Depends(get_db)):
-    db_sensor = db.query(Sensor).filter(Sensor.sensor_id == sensor_data.sensor_id).first()
+async def create_sensor(sensor_data: SensorCreate, db: AsyncSession = Depends(get_db)):
+    db_sensor = await db.scalar(select(Sensor).where(Sensor.sensor_id == sensor_data.sensor_id))
     if db_sensor:
         raise HTTPException(status_code=400, detail="Sensor ID already exists")
     
@@ -164,133 +384,728 @@ async def create_sensor(sensor_data: SensorCreate, db: Session = Depends(get_db)
         longitude=sensor_data.longitude
     )
     db.add(db_sensor)
-    db.commit()
-    db.refresh(db_sensor)
+    await db.commit()
     return db_sensor
 
 @app.get("/api/sensors", response_model=List[SensorResponse])
-async def get_sensors(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    sensors = db.query(Sensor).all()
-    return sensors
+async def get_sensors(
+    request: Request,
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    query = select(*SENSOR_COLUMNS)
+    if bbox:
+        query = query.where(bbox_condition(Sensor.latitude, Sensor.longitude, *parse_bbox(bbox)))
+
+    async def build():
+        return row_dicts(await db.execute(query)), {}
+
+    return await response_cache.respond(request, build)
+
+@app.get("/api/sensors/nearest", response_model=List[SensorDistance])
+async def get_nearest_sensors(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(10, ge=1, le=MAX_NEAREST_SENSORS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    The ``limit`` sensors closest to lat/lon by great-circle distance.
+    Searches a box around the point, doubling it until it holds ``limit``
+    sensors nearer than the circle the box encloses (so nothing outside the
+    box can be nearer).
+    """
+    radius = NEAREST_INITIAL_RADIUS_DEGREES
+    while True:
+        box = around(lat, lon, radius)
+        candidates = (await db.scalars(
+            select(Sensor).where(bbox_condition(Sensor.latitude, Sensor.longitude, *box))
+        )).all()
+        ranked = sorted(
+            ((haversine_km(lat, lon, sensor.latitude, sensor.longitude), sensor) for sensor in candidates),
+            key=lambda pair: pair[0]
+        )
+        if radius >= 180 or (len(ranked) >= limit and ranked[limit - 1][0] <= radius * KM_PER_DEGREE):
+            break
+        radius *= 2 if ranked else 4
+    return [
+        SensorDistance(**SensorResponse.model_validate(sensor).model_dump(), distance_km=round(distance, 3))
+        for distance, sensor in ranked[:limit]
+    ]
+
+@app.get("/api/sensors/clusters", response_model=List[SensorCluster])
+async def get_sensor_clusters(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    zoom: int = Query(..., ge=0, le=MAX_ZOOM),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Map markers for a view: the sensors inside ``bbox`` grouped into grid
+    cells sized for the zoom level, aggregated in the database. The grid is
+    anchored globally, so clusters do not shift as the map pans.
+    """
+    row, column = grid_cell(Sensor.latitude, Sensor.longitude, cluster_cell_degrees(zoom), db.bind.dialect.name)
+    clusters = (await db.execute(
+        select(
+            func.avg(Sensor.latitude).label("latitude"),
+            func.avg(Sensor.longitude).label("longitude"),
+            func.count(Sensor.id).label("count"),
+            func.count(case((SensorState.open_alerts > 0, 1))).label("alerting"),
+            func.min(Sensor.sensor_id).label("sensor_id"),
+        )
+        .outerjoin(SensorState, SensorState.sensor_id == Sensor.sensor_id)
+        .where(bbox_condition(Sensor.latitude, Sensor.longitude, *parse_bbox(bbox)))
+        .group_by(row, column)
+    )).all()
+    return [
+        {
+            "latitude": cluster.latitude,
+            "longitude": cluster.longitude,
+            "count": cluster.count,
+            "alerting": cluster.alerting,
+            "sensor_id": cluster.sensor_id if cluster.count == 1 else None
+        }
+        for cluster in clusters
+    ]
 
 # Alert endpoints - for Node-RED (no auth required)
-@app.post("/api/alerts", response_model=AlertResponse)
-async def create_alert(alert_data: AlertCreate, db: Session = Depends(get_db)):
-    # Check if sensor exists, if not create it
-    sensor = db.query(Sensor).filter(Sensor.sensor_id == alert_data.sensor_id).first()
-    if not sensor:
-        sensor = Sensor(
-            sensor_id=alert_data.sensor_id,
-            sensor_name=alert_data.sensor_name or f"Sensor {alert_data.sensor_id}",
-            latitude=0.0,
-            longitude=0.0
+async def coalesce_detections(
+    db: AsyncSession, sensor_id: str, first_seen: datetime, last_seen: datetime, count: int = 1
+) -> Optional[Alert]:
+    """
+    Fold ``count`` detections (first_seen..last_seen) into the sensor's open
+    alert when its last detection is within the coalescing window. Returns
+    the updated alert, or None if the detections need a new alert. The
+    caller commits.
+    """
+    if not open_alerts.enabled:
+        return None
+    entry = open_alerts.lookup(sensor_id)
+    if entry is None:
+        row = (await db.execute(
+            select(Alert.id, func.coalesce(Alert.last_seen, Alert.alert_time))
+            .where(Alert.sensor_id == sensor_id, Alert.resolved == False)
+            .order_by(desc(Alert.alert_time), desc(Alert.id))
+            .limit(1)
+        )).first()
+        entry = tuple(row) if row else None
+    if entry is None or not open_alerts.within_window(entry[1], first_seen):
+        return None
+    # Guarded on resolved: the index may be stale if another worker resolved it
+    return await db.scalar(
+        update(Alert)
+        .where(Alert.id == entry[0], Alert.resolved == False)
+        .values(
+            detection_count=Alert.detection_count + count,
+            last_seen=case((Alert.last_seen > last_seen, Alert.last_seen), else_=last_seen)
+        )
+        .returning(Alert)
+    )
+
+@app.post("/api/alerts", response_model=AlertResponse, responses={
+    202: {"description": "Queued for ingestion (returns status and idempotency_key)"}
+})
+async def create_alert(
+    alert_data: AlertCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=MAX_IDEMPOTENCY_KEY_LENGTH),
+    db: AsyncSession = Depends(get_db)
+):
+    retry_after = sensor_rate_limiter.check(alert_data.sensor_id)
+    if retry_after:
+        metrics.alerts_ingested.inc(source="single", outcome="rate_limited")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many alerts from this sensor",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    detected_at = as_naive_utc(alert_data.alert_time or datetime.utcnow())
+
+    if ingest_queue.queue.enabled:
+        # Detection time is fixed now, not when the queue is drained
+        key = idempotency_key or uuid.uuid4().hex
+        payload = alert_data.model_copy(update={"alert_time": detected_at}).model_dump_json()
+        try:
+            added = await ingest_queue.queue.put(key, payload)
+        except Exception as e:
+            # The queue file is unusable (disk full, ...): store directly
+            print(f"Ingest queue unavailable, writing alert directly: {e}")
+        else:
+            metrics.alerts_ingested.inc(source="single", outcome="queued" if added else "duplicate")
+            return JSONResponse(status_code=202, content={
+                "status": "queued" if added else "duplicate", "idempotency_key": key
+            })
+
+    # A repeat detection of an ongoing event updates the open alert
+    coalesced = await coalesce_detections(db, alert_data.sensor_id, detected_at, detected_at)
+    if coalesced:
+        await db.commit()
+        open_alerts.remember(coalesced.sensor_id, coalesced.id, coalesced.last_seen)
+        metrics.alerts_ingested.inc(source="single", outcome="coalesced")
+        alert_events.publish("alert_updated", AlertResponse.model_validate(coalesced).model_dump(mode="json"))
+        return coalesced
+
+    # Check if sensor exists, if not create it. ON CONFLICT DO NOTHING: a
+    # concurrent first detection from the same sensor may create it first.
+    sensor_name = await db.scalar(select(Sensor.sensor_name).where(Sensor.sensor_id == alert_data.sensor_id))
+    if sensor_name is None:
+        sensor_name = alert_data.sensor_name or f"Sensor {alert_data.sensor_id}"
+        await db.execute(
+            upsert(Sensor.__table__, db.bind.dialect.name)
+            .values(sensor_id=alert_data.sensor_id, sensor_name=sensor_name, latitude=0.0, longitude=0.0)
+            .on_conflict_do_nothing(index_elements=[Sensor.__table__.c.sensor_id])
         )
-        db.add(sensor)
-        db.commit()
-        db.refresh(sensor)
     
-    # Create alert
+    # Create alert (committed together with a newly created sensor)
     db_alert = Alert(
         sensor_id=alert_data.sensor_id,
-        sensor_name=alert_data.sensor_name or sensor.sensor_name,
-        alert_time=alert_data.alert_time or datetime.utcnow(),
+        sensor_name=alert_data.sensor_name or sensor_name,
+        alert_time=detected_at,
+        last_seen=detected_at,
+        detection_count=1,
         resolved=False
     )
     db.add(db_alert)
-    db.commit()
-    db.refresh(db_alert)
+    await sensor_state.record_new_alerts(db, [db_alert])
+    await rollups.record_new_alerts(db, [db_alert])
+    await db.commit()
+    open_alerts.remember(db_alert.sensor_id, db_alert.id, db_alert.last_seen)
+    metrics.alerts_ingested.inc(source="single", outcome="created")
+    alert_events.publish("alert_created", AlertResponse.model_validate(db_alert).model_dump(mode="json"))
     return db_alert
 
-@app.get("/api/alerts", response_model=List[AlertResponse])
+async def iter_limited_body(request: Request, max_bytes: int, detail: str):
+    """The body in chunks, stopping with a 413 past max_bytes (chunked uploads included)."""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail=detail)
+        yield chunk
+
+async def read_limited_body(request: Request, max_bytes: int, detail: str) -> bytes:
+    return b"".join([chunk async for chunk in iter_limited_body(request, max_bytes, detail)])
+
+def read_batch_body(request: Request):
+    return iter_limited_body(request, MAX_ALERT_BATCH_BYTES, f"Batch exceeds {MAX_ALERT_BATCH_BYTES // (1024 * 1024)} MB")
+
+async def read_alert_batch(request: Request) -> list:
+    """Read a batch body: a JSON array, or NDJSON (one object per line)."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_CONTENT_TYPES:
+        items = []
+        buffer = b""
+        async for chunk in read_batch_body(request):
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    items.append(line)
+                if len(items) > MAX_ALERT_BATCH_SIZE:
+                    raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_ALERT_BATCH_SIZE} alerts")
+        if buffer.strip():
+            items.append(buffer)
+        return items
+
+    body = b"".join([chunk async for chunk in read_batch_body(request)])
+    try:
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array or NDJSON")
+    return items
+
+async def insert_alert_batch(
+    db: AsyncSession, alerts_data: List[AlertCreate], idempotency_keys: Optional[List[str]] = None
+) -> List[tuple]:
+    """
+    Upsert missing sensors and store all alerts in a single transaction.
+    Detections of the same sensor no more than the coalescing window apart
+    become one alert (the first group may extend the sensor's open alert).
+    idempotency_keys (one per item) are recorded in ingest_keys in the same
+    transaction. Returns (alert, coalesced) per item, in order; call
+    remember_batch() once committed.
+    """
+    sensor_ids = {alert_data.sensor_id for alert_data in alerts_data}
+    sensor_names = dict((await db.execute(
+        select(Sensor.sensor_id, Sensor.sensor_name).where(Sensor.sensor_id.in_(sensor_ids))
+    )).all())
+
+    new_sensors = []
+    for alert_data in alerts_data:
+        if alert_data.sensor_id not in sensor_names:
+            sensor_name = alert_data.sensor_name or f"Sensor {alert_data.sensor_id}"
+            sensor_names[alert_data.sensor_id] = sensor_name
+            new_sensors.append(Sensor(
+                sensor_id=alert_data.sensor_id,
+                sensor_name=sensor_name,
+                latitude=0.0,
+                longitude=0.0
+            ))
+    db.add_all(new_sensors)
+
+    now = datetime.utcnow()
+    detected = [as_naive_utc(alert_data.alert_time or now) for alert_data in alerts_data]
+
+    # Group each sensor's detections in time order
+    groups = []
+    for index in sorted(range(len(alerts_data)), key=lambda i: (alerts_data[i].sensor_id, detected[i])):
+        sensor_id = alerts_data[index].sensor_id
+        if (open_alerts.enabled and groups and groups[-1][0] == sensor_id
+                and open_alerts.within_window(detected[groups[-1][1][-1]], detected[index])):
+            groups[-1][1].append(index)
+        else:
+            groups.append((sensor_id, [index]))
+
+    results = [None] * len(alerts_data)
+    new_alerts = []
+    previous_sensor = None
+    for sensor_id, indices in groups:
+        first_seen, last_seen = detected[indices[0]], detected[indices[-1]]
+        alert = None
+        if sensor_id != previous_sensor:
+            alert = await coalesce_detections(db, sensor_id, first_seen, last_seen, count=len(indices))
+        previous_sensor = sensor_id
+        if alert is None:
+            first = alerts_data[indices[0]]
+            alert = Alert(
+                sensor_id=sensor_id,
+                sensor_name=first.sensor_name or sensor_names[sensor_id],
+                alert_time=first_seen,
+                last_seen=last_seen,
+                detection_count=len(indices),
+                resolved=False
+            )
+            new_alerts.append(alert)
+            results[indices[0]] = (alert, False)
+            indices = indices[1:]
+        for index in indices:
+            results[index] = (alert, True)
+    db.add_all(new_alerts)
+    await sensor_state.record_new_alerts(db, new_alerts)
+    await rollups.record_new_alerts(db, new_alerts)
+    if idempotency_keys:
+        await db.flush()  # assigns the new alerts' ids
+        db.add_all(IngestKey(key=key, alert_id=alert.id) for key, (alert, _) in zip(idempotency_keys, results))
+    await db.commit()
+    return [(AlertResponse.model_validate(alert), coalesced) for alert, coalesced in results]
+
+def remember_batch(results: List[tuple]):
+    """Index the latest alert of each sensor in a committed batch."""
+    latest = {}
+    for alert, _ in results:
+        current = latest.get(alert.sensor_id)
+        if current is None or (alert.last_seen, alert.id) > (current.last_seen, current.id):
+            latest[alert.sensor_id] = alert
+    for alert in latest.values():
+        open_alerts.remember(alert.sensor_id, alert.id, alert.last_seen)
+
+async def store_alert_batch(
+    db: AsyncSession, alerts_data: List[AlertCreate], idempotency_keys: Optional[List[str]] = None
+) -> List[tuple]:
+    """insert_alert_batch, then index and announce the result."""
+    try:
+        stored = await insert_alert_batch(db, alerts_data, idempotency_keys)
+    except IntegrityError:
+        # A concurrent request created one of our new sensors; retry once
+        # now that it exists.
+        await db.rollback()
+        stored = await insert_alert_batch(db, alerts_data, idempotency_keys)
+    remember_batch(stored)
+    updated = {}
+    for alert, was_coalesced in stored:
+        if was_coalesced:
+            # Announce each coalesced alert once, in its final state
+            updated[alert.id] = alert
+        else:
+            alert_events.publish("alert_created", alert.model_dump(mode="json"))
+    for alert in updated.values():
+        alert_events.publish("alert_updated", alert.model_dump(mode="json"))
+    return stored
+
+_ingest_keys_purged_at = 0.0
+
+async def apply_queued_alerts(entries: List[ingest_queue.Entry]):
+    """
+    Drain handler for the ingestion queue: stores a batch of queued
+    detections, skipping keys that were already applied. Raises on failure
+    so the queue keeps the entries and retries.
+    """
+    global _ingest_keys_purged_at
+    async with AsyncSessionLocal() as db:
+        keys = [entry.key for entry in entries]
+        applied = set((await db.scalars(select(IngestKey.key).where(IngestKey.key.in_(keys)))).all())
+        fresh = [entry for entry in entries if entry.key not in applied]
+        if fresh:
+            alerts_data = [AlertCreate.model_validate_json(entry.payload) for entry in fresh]
+            stored = await store_alert_batch(db, alerts_data, [entry.key for entry in fresh])
+            coalesced = sum(1 for _, was_coalesced in stored if was_coalesced)
+            metrics.alerts_ingested.inc(len(stored) - coalesced, source="queue", outcome="created")
+            metrics.alerts_ingested.inc(coalesced, source="queue", outcome="coalesced")
+        metrics.alerts_ingested.inc(len(applied), source="queue", outcome="duplicate")
+
+        if time.monotonic() - _ingest_keys_purged_at > 3600:
+            cutoff = datetime.utcnow() - timedelta(hours=INGEST_KEY_RETENTION_HOURS)
+            await db.execute(IngestKey.__table__.delete().where(IngestKey.created_at < cutoff))
+            await db.commit()
+            _ingest_keys_purged_at = time.monotonic()
+
+ingest_queue.queue.handler = apply_queued_alerts
+
+def archive_old_alerts() -> int:
+    with SessionLocal() as session:
+        return archive.archive_alerts(session)
+
+async def archive_periodically():
+    """Move old resolved alerts to alerts_archive every ARCHIVE_INTERVAL_HOURS (see archive.py)."""
+    while True:
+        try:
+            # On a worker thread with a sync session, so the queries and the
+            # export's compression and fsync never block the event loop
+            count = await run_in_threadpool(archive_old_alerts)
+            if count:
+                response_cache.bump()
+                print(f"Archived {count} alerts")
+        except Exception as e:
+            print(f"Alert archival failed: {e}")
+        await asyncio.sleep(archive.ARCHIVE_INTERVAL_HOURS * 3600)
+
+@app.post("/api/alerts/batch", response_model=AlertBatchResponse)
+async def create_alerts_batch(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Ingest many alerts at once (e.g. Node-RED replaying buffered uplinks).
+    Accepts a JSON array or an NDJSON stream of AlertCreate objects.
+    Invalid items are reported individually; valid ones are stored together,
+    with repeat detections coalesced as in POST /api/alerts.
+    """
+    items = await read_alert_batch(request)
+    if len(items) > MAX_ALERT_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_ALERT_BATCH_SIZE} alerts")
+
+    results = []
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            if isinstance(item, bytes):
+                alert_data = AlertCreate.model_validate_json(item)
+            else:
+                alert_data = AlertCreate.model_validate(item)
+        except ValidationError as e:
+            error = e.errors()[0]
+            location = ".".join(str(part) for part in error["loc"])
+            results.append({
+                "index": index,
+                "status": "error",
+                "error": f"{location}: {error['msg']}" if location else error["msg"]
+            })
+            continue
+        valid.append((index, alert_data))
+
+    created = coalesced = 0
+    if valid:
+        stored = await store_alert_batch(db, [alert_data for _, alert_data in valid])
+        for (index, _), (alert, was_coalesced) in zip(valid, stored):
+            if was_coalesced:
+                coalesced += 1
+                results.append({"index": index, "status": "coalesced", "alert_id": alert.id})
+            else:
+                created += 1
+                results.append({"index": index, "status": "created", "alert_id": alert.id})
+
+    results.sort(key=lambda result: result["index"])
+    metrics.alerts_ingested.inc(created, source="batch", outcome="created")
+    metrics.alerts_ingested.inc(coalesced, source="batch", outcome="coalesced")
+    metrics.alerts_ingested.inc(len(items) - len(valid), source="batch", outcome="error")
+    return {
+        "received": len(items),
+        "created": created,
+        "coalesced": coalesced,
+        "failed": len(items) - len(valid),
+        "results": results
+    }
+
+@app.get("/api/alerts/ingest/stats")
+async def get_alert_ingest_stats(current_user: User = Depends(get_current_user)):
+    return {
+        "open_alerts": open_alerts.stats(),
+        "rate_limiter": sensor_rate_limiter.stats(),
+        "queue": ingest_queue.queue.stats()
+    }
+
+def encode_alert_cursor(alert_time: datetime, alert_id: int) -> str:
+    raw = f"{alert_time.isoformat()}|{alert_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_alert_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        alert_time, alert_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(alert_time), int(alert_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# The rows are encoded by response_cache; response_model documents them.
+# Summary rows only carry the summary fields (the rest are left out rather
+# than sent as nulls).
+@app.get("/api/alerts", response_model=List[AlertResponse], response_model_exclude_unset=True)
 async def get_alerts(
+    request: Request,
     resolved: Optional[bool] = None,
-    db: Session = Depends(get_db),
+    sensor_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_ALERT_PAGE_SIZE, ge=1, le=MAX_ALERT_PAGE_SIZE),
+    fields: Literal["full", "summary"] = "full",
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Alert)
+    """
+    Alerts newest first, one page at a time. When more results exist the
+    X-Next-Cursor response header holds the value to pass as ?cursor= for
+    the next page. fields=summary leaves out resolution text and attachment.
+    Send the ETag back in If-None-Match to get a 304 while nothing changed.
+    """
+    query = select(*(ALERT_SUMMARY_COLUMNS if fields == "summary" else ALERT_COLUMNS))
     if resolved is not None:
-        query = query.filter(Alert.resolved == resolved)
-    alerts = query.order_by(desc(Alert.alert_time)).all()
-    return alerts
+        query = query.where(Alert.resolved == resolved)
+    if sensor_id is not None:
+        query = query.where(Alert.sensor_id == sensor_id)
+    if since is not None:
+        query = query.where(Alert.alert_time >= since)
+    if until is not None:
+        query = query.where(Alert.alert_time < until)
+    if cursor is not None:
+        cursor_time, cursor_id = decode_alert_cursor(cursor)
+        query = query.where(or_(
+            Alert.alert_time < cursor_time,
+            and_(Alert.alert_time == cursor_time, Alert.id < cursor_id)
+        ))
+
+    async def build():
+        result = await db.execute(query.order_by(desc(Alert.alert_time), desc(Alert.id)).limit(limit + 1))
+        alerts = row_dicts(result)
+        headers = {}
+        if len(alerts) > limit:
+            alerts = alerts[:limit]
+            headers["X-Next-Cursor"] = encode_alert_cursor(alerts[-1]["alert_time"], alerts[-1]["id"])
+        return alerts, headers
+
+    return await response_cache.respond(request, build)
+
+@app.get("/api/alerts/archive", response_model=List[ArchivedAlertResponse])
+async def get_archived_alerts(
+    request: Request,
+    sensor_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_ALERT_PAGE_SIZE, ge=1, le=MAX_ALERT_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Alerts moved to the archive by archive.py, newest first, paged like
+    GET /api/alerts (X-Next-Cursor). since/until narrow it to the
+    partitions of those months on PostgreSQL.
+    """
+    query = select(*ARCHIVED_ALERT_COLUMNS)
+    if sensor_id is not None:
+        query = query.where(AlertArchive.sensor_id == sensor_id)
+    if since is not None:
+        query = query.where(AlertArchive.alert_time >= since)
+    if until is not None:
+        query = query.where(AlertArchive.alert_time < until)
+    if cursor is not None:
+        cursor_time, cursor_id = decode_alert_cursor(cursor)
+        query = query.where(or_(
+            AlertArchive.alert_time < cursor_time,
+            and_(AlertArchive.alert_time == cursor_time, AlertArchive.id < cursor_id)
+        ))
+
+    async def build():
+        result = await db.execute(
+            query.order_by(desc(AlertArchive.alert_time), desc(AlertArchive.id)).limit(limit + 1)
+        )
+        alerts = row_dicts(result)
+        headers = {}
+        if len(alerts) > limit:
+            alerts = alerts[:limit]
+            headers["X-Next-Cursor"] = encode_alert_cursor(alerts[-1]["alert_time"], alerts[-1]["id"])
+        return alerts, headers
+
+    return await response_cache.respond(request, build)
+
+@app.get("/api/alerts/stream")
+async def stream_alerts(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_browser_user)
+):
+    """
+    Server-Sent Events feed of alert_created / alert_resolved events.
+    Reconnecting clients send Last-Event-ID (EventSource does this itself)
+    and get the events they missed; if those are no longer available they
+    receive a "resync" event and should refetch.
+    """
+    subscription = alert_events.subscribe(last_event_id or request.query_params.get("last_event_id"))
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                yield format_sse(event) if event else ": keep-alive\n\n"
+        finally:
+            alert_events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/api/alerts/{alert_id}", response_model=AlertResponse)
-async def get_alert(alert_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    alert = db.query(Alert).filter(Alert.id == alert_id).first()
+async def get_alert(alert_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    alert = await db.get(Alert, alert_id)
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     return alert
 
+async def discard_unreferenced_upload(db: AsyncSession, stored):
+    """Delete an upload that lost its resolve race, unless an alert uses the same file."""
+    path = str(stored.path)
+    for model in (Alert, AlertArchive):
+        if await db.scalar(select(model.id).where(model.attachment_path == path).limit(1)) is not None:
+            return
+    await discard_upload(stored)
+
 @app.post("/api/alerts/{alert_id}/resolve", response_model=AlertResponse)
 async def resolve_alert(
     alert_id: int,
     threat_type: str = Form(...),
     details: str = Form(...),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    alert = db.query(Alert).filter(Alert.id == alert_id).first()
-    if not alert:
+    resolved = await db.scalar(select(Alert.resolved).where(Alert.id == alert_id))
+    if resolved is None:
         raise HTTPException(status_code=404, detail="Alert not found")
-    
-    if alert.resolved:
+    if resolved:
         raise HTTPException(status_code=400, detail="Alert already resolved")
     
-    # Save uploaded file
-    file_path = UPLOAD_DIR / f"{alert_id}_{file.filename}"
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    # Save uploaded file (streamed to disk, deduplicated by content hash)
+    stored = await save_upload(file, UPLOAD_DIR)
     
-    # Update alert
-    alert.resolved = True
-    alert.resolved_by = current_user.id
-    alert.resolved_at = datetime.utcnow()
-    alert.threat_type = threat_type
-    alert.resolution_details = details
-    alert.attachment_path = str(file_path)
+    # Guarded on resolved: of two concurrent requests only one updates the
+    # row (the other waits for its lock, or for SQLite's write lock) and
+    # gets it back; the loser changes nothing.
+    alert = await db.scalar(
+        update(Alert)
+        .where(Alert.id == alert_id, Alert.resolved == False)
+        .values(
+            resolved=True,
+            resolved_by=current_user.id,
+            resolved_at=datetime.utcnow(),
+            threat_type=threat_type,
+            resolution_details=details,
+            attachment_path=str(stored.path),
+        )
+        .returning(Alert)
+    )
+    if alert is None:
+        await db.rollback()
+        await discard_unreferenced_upload(db, stored)
+        exists = await db.scalar(select(Alert.id).where(Alert.id == alert_id))
+        if exists is None:
+            raise HTTPException(status_code=404, detail="Alert not found")
+        raise HTTPException(status_code=400, detail="Alert already resolved")
+    await sensor_state.record_resolved_alert(db, alert)
+    await rollups.record_resolved_alert(db, alert)
     
-    db.commit()
-    db.refresh(alert)
+    await db.commit()
+    open_alerts.forget(alert.sensor_id, alert.id)
+    alert_events.publish("alert_resolved", AlertResponse.model_validate(alert).model_dump(mode="json"))
     return alert
 
+@app.get("/api/alerts/{alert_id}/attachment")
+async def get_alert_attachment(
+    alert_id: int,
+    thumbnail: bool = False,
+    range_header: Optional[str] = Header(None, alias="range"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_browser_user)
+):
+    """Download an alert's evidence file (or its thumbnail); supports Range requests."""
+    alert = await db.get(Alert, alert_id)
+    if not alert:
+        alert = (await db.execute(select(AlertArchive).where(AlertArchive.id == alert_id))).scalars().first()
+    if not alert or not alert.attachment_path:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+
+    path = Path(alert.attachment_path)
+    if thumbnail:
+        path = thumbnail_path_for(alert.attachment_path, UPLOAD_DIR)
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return file_response(path, range_header)
+
 @app.get("/api/sensors/{sensor_id}/status")
-async def get_sensor_status(sensor_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if sensor has unresolved alerts
-    unresolved_alert = db.query(Alert).filter(
-        Alert.sensor_id == sensor_id,
-        Alert.resolved == False
-    ).order_by(desc(Alert.alert_time)).first()
+async def get_sensor_status(sensor_id: str, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    # Primary-key lookup of the incrementally maintained state
+    state = await db.get(SensorState, sensor_id)
+    has_unresolved_alert = bool(state and state.open_alerts)
     
     return {
         "sensor_id": sensor_id,
-        "status": "red" if unresolved_alert else "green",
-        "has_unresolved_alert": unresolved_alert is not None
+        "status": "red" if has_unresolved_alert else "green",
+        "has_unresolved_alert": has_unresolved_alert,
+        "open_alerts": state.open_alerts if state else 0,
+        "total_alerts": state.total_alerts if state else 0,
+        "last_unresolved_time": state.last_unresolved_time if state else None,
+        "last_alert_time": state.last_alert_time if state else None
     }
 
 @app.get("/api/dashboard/overview")
-async def get_dashboard_overview(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    sensors = db.query(Sensor).all()
+async def get_dashboard_overview(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    async def build():
+        return await dashboard_overview(db), {}
+
+    return await response_cache.respond(request, build)
+
+async def dashboard_overview(db: AsyncSession) -> dict:
+    # Sensors joined with their maintained state: one query, no scan of alerts
+    sensors = (await db.execute(
+        select(
+            Sensor.sensor_id, Sensor.sensor_name, Sensor.latitude, Sensor.longitude,
+            SensorState.open_alerts, SensorState.total_alerts, SensorState.last_unresolved_time
+        ).outerjoin(SensorState, SensorState.sensor_id == Sensor.sensor_id)
+    )).all()
     sensor_statuses = []
     
     for sensor in sensors:
-        unresolved_alert = db.query(Alert).filter(
-            Alert.sensor_id == sensor.sensor_id,
-            Alert.resolved == False
-        ).order_by(desc(Alert.alert_time)).first()
+        last_unresolved_time = sensor.last_unresolved_time if sensor.open_alerts else None
         
         sensor_statuses.append({
             "sensor_id": sensor.sensor_id,
             "sensor_name": sensor.sensor_name,
             "latitude": sensor.latitude,
             "longitude": sensor.longitude,
-            "status": "red" if unresolved_alert else "green",
-            "last_alert_time": unresolved_alert.alert_time.isoformat() if unresolved_alert else None
+            "status": "red" if last_unresolved_time else "green",
+            "last_alert_time": last_unresolved_time.isoformat() if last_unresolved_time else None
         })
     
-    total_alerts = db.query(Alert).count()
-    unresolved_count = db.query(Alert).filter(Alert.resolved == False).count()
-    resolved_count = db.query(Alert).filter(Alert.resolved == True).count()
+    total_alerts = sum(sensor.total_alerts or 0 for sensor in sensors)
+    unresolved_count = sum(sensor.open_alerts or 0 for sensor in sensors)
+    resolved_count = total_alerts - unresolved_count
     
     return {
         "sensors": sensor_statuses,
@@ -302,11 +1117,103 @@ async def get_dashboard_overview(db: Session = Depends(get_db), current_user: Us
         }
     }
 
+@app.get("/api/analytics", response_model=AnalyticsResponse)
+async def get_analytics(
+    interval: Literal["hour", "day"] = "day",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    sensor_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Alert histogram, per-sensor false-positive rate and mean time-to-resolve
+    for [since, until) (default: the last 7 days), read from the hourly or
+    daily rollup tables. Alerts are bucketed by the time they were raised.
+    """
+    until = as_naive_utc(until) if until else datetime.utcnow()
+    since = as_naive_utc(since) if since else until - timedelta(days=ANALYTICS_DEFAULT_DAYS)
+    rollup = rollups.ROLLUP_MODELS[interval]
+    conditions = [rollup.bucket >= rollups.bucket_start(since, interval), rollup.bucket < until]
+    if sensor_id:
+        conditions.append(rollup.sensor_id == sensor_id)
+    sums = [func.sum(getattr(rollup, name)).label(name) for name in rollups.COUNTERS]
+
+    histogram = (await db.execute(
+        select(rollup.bucket, *sums).where(*conditions).group_by(rollup.bucket).order_by(rollup.bucket)
+    )).all()
+    per_sensor = (await db.execute(
+        select(rollup.sensor_id, *sums).where(*conditions).group_by(rollup.sensor_id).order_by(rollup.sensor_id)
+    )).all()
+
+    totals = {
+        name: sum(getattr(row, name) or 0 for row in per_sensor) for name in rollups.COUNTERS
+    }
+    return {
+        "interval": interval,
+        "since": since,
+        "until": until,
+        "totals": rollups.summarize(totals),
+        "histogram": [{"bucket": row.bucket, **rollups.summarize(row._mapping)} for row in histogram],
+        "sensors": [{"sensor_id": row.sensor_id, **rollups.summarize(row._mapping)} for row in per_sensor]
+    }
+
+# Inference endpoints - re-verify edge detections centrally (no auth, like alert ingestion)
+@app.post("/api/inference/classify", response_model=ClassifyResponse)
+async def classify_audio(request: Request, current_user: User = Depends(get_current_user)):
+    """
+    Classify one clip with the quantized TFLite model. Accepts a 16-bit mono
+    WAV body (Content-Type: audio/wav) or JSON with either "audio" (float
+    samples) or "features" (a spectrogram feature tensor), up to
+    MAX_CLASSIFY_MB. Concurrent requests are coalesced into a single
+    interpreter call by the micro-batcher.
+    """
+    body = await read_limited_body(request, MAX_CLASSIFY_BYTES,
+                                   f"Request body exceeds {MAX_CLASSIFY_BYTES // 1024} KB")
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in inference.WAV_CONTENT_TYPES:
+        samples = await run_in_threadpool(inference.decode_wav, body)
+        kind, data = "audio", inference.prepare_audio(samples)
+    else:
+        try:
+            payload = ClassifyRequest.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError([
+                {**error, "loc": ("body",) + tuple(error["loc"])}
+                for error in e.errors(include_input=False, include_context=False)
+            ])
+        if payload.audio is not None:
+            kind, data = "audio", inference.prepare_audio(payload.audio)
+        else:
+            kind, data = "features", payload.features
+
+    classifier = await run_in_threadpool(inference.get_classifier)
+    if kind == "features":
+        try:
+            data = np.asarray(data, dtype=np.float32)
+        except ValueError:
+            data = None
+        if data is None or data.shape != classifier.feature_shape:
+            raise HTTPException(
+                status_code=422,
+                detail=f"features must have shape {list(classifier.feature_shape)}"
+            )
+    return await inference.batcher.classify(kind, data)
+
+@app.get("/api/inference/stats")
+async def get_inference_stats():
+    return inference.batcher.stats()
+
 @app.get("/")
 @app.head("/")
 async def root():
     return {"message": "Forest Protection IoT Dashboard API", "status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint (text exposition format)."""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/health")
 @app.head("/health")
 async def health_check():
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -23,6 +23,12 @@ class Sensor(Base):
     longitude = Column(Float, default=0.0)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Bounding-box, nearest and cluster queries: latitude range scan, with
+    # longitude filtered from the same index entries
+    __table_args__ = (
+        Index("ix_sensors_latitude_longitude", "latitude", "longitude"),
+    )
+
 class Alert(Base):
     __tablename__ = "alerts"
     
@@ -36,5 +42,101 @@ class Alert(Base):
     threat_type = Column(String, nullable=True)  # "real" or "false"
     resolution_details = Column(Text, nullable=True)
     attachment_path = Column(String, nullable=True)
+    # Repeat detections coalesced into this alert (see dedup.OpenAlertIndex)
+    detection_count = Column(Integer, default=1, server_default="1", nullable=False)
+    last_seen = Column(DateTime, nullable=True)
+
+    # Keyset pagination on (alert_time, id), optionally narrowed by status or sensor
+    __table_args__ = (
+        Index("ix_alerts_alert_time_id", "alert_time", "id"),
+        Index("ix_alerts_resolved_alert_time_id", "resolved", "alert_time", "id"),
+        Index("ix_alerts_sensor_id_alert_time_id", "sensor_id", "alert_time", "id"),
+        # Latest open alert of a sensor, for coalescing repeat detections
+        Index("ix_alerts_sensor_id_resolved_alert_time", "sensor_id", "resolved", "alert_time"),
+        # Ids of archived (deleted) alerts are never reused on SQLite either
+        {"sqlite_autoincrement": True},
+    )
+
+
+class AlertArchive(Base):
+    """
+    Resolved alerts moved out of alerts by archive.py, served by
+    GET /api/alerts/archive. Same columns as alerts plus archived_at. On
+    PostgreSQL the table is range-partitioned by month of alert_time (the
+    partitions are created by archive.py), which is why alert_time is part
+    of the primary key; on SQLite it is a plain table.
+    """
+    __tablename__ = "alerts_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    alert_time = Column(DateTime, primary_key=True)
+    sensor_id = Column(String, nullable=False)
+    sensor_name = Column(String, nullable=False)
+    resolved = Column(Boolean, default=True, nullable=False)
+    resolved_by = Column(Integer, nullable=True)  # no foreign key across partitions
+    resolved_at = Column(DateTime, nullable=True)
+    threat_type = Column(String, nullable=True)
+    resolution_details = Column(Text, nullable=True)
+    attachment_path = Column(String, nullable=True)
+    detection_count = Column(Integer, default=1, server_default="1", nullable=False)
+    last_seen = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Same keyset pagination as alerts (newest first, optionally per sensor)
+    __table_args__ = (
+        Index("ix_alerts_archive_alert_time_id", "alert_time", "id"),
+        Index("ix_alerts_archive_sensor_id_alert_time_id", "sensor_id", "alert_time", "id"),
+        {"postgresql_partition_by": "RANGE (alert_time)"},
+    )
+
+
+class IngestKey(Base):
+    """
+    Idempotency keys of detections applied from the ingestion queue (see
+    ingest_queue.py), written in the same transaction as the alerts so a
+    replayed entry can be recognised. Rows older than
+    INGEST_KEY_RETENTION_HOURS are purged by the drain.
+    """
+    __tablename__ = "ingest_keys"
+
+    key = Column(String(128), primary_key=True)
+    alert_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class SensorState(Base):
+    """
+    Per-sensor alert state, maintained in the same transaction as every
+    alert insert and resolve (see sensor_state.py), so status reads are a
+    primary-key lookup instead of a scan of alerts.
+    """
+    __tablename__ = "sensor_states"
+
+    sensor_id = Column(String, primary_key=True)
+    open_alerts = Column(Integer, default=0, server_default="0", nullable=False)
+    total_alerts = Column(Integer, default=0, server_default="0", nullable=False)
+    last_unresolved_time = Column(DateTime, nullable=True)  # newest unresolved alert
+    last_alert_time = Column(DateTime, nullable=True)  # newest alert
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AlertRollupColumns:
+    """Alert counts for one sensor in one time bucket (see rollups.py)."""
+    bucket = Column(DateTime, primary_key=True)  # start of the hour/day, UTC
+    sensor_id = Column(String, primary_key=True)
+    alerts = Column(Integer, default=0, server_default="0", nullable=False)
+    # Resolutions are counted in the bucket of the alert they resolve
+    resolved = Column(Integer, default=0, server_default="0", nullable=False)
+    real_threats = Column(Integer, default=0, server_default="0", nullable=False)
+    false_alarms = Column(Integer, default=0, server_default="0", nullable=False)
+    resolve_seconds = Column(Float, default=0.0, server_default="0", nullable=False)  # sum of time-to-resolve
 
+class AlertRollupHourly(AlertRollupColumns, Base):
+    __tablename__ = "alert_rollups_hourly"
+    __table_args__ = (
+        Index("ix_alert_rollups_hourly_sensor_id_bucket", "sensor_id", "bucket"),
+    )
 
+class AlertRollupDaily(AlertRollupColumns, Base):
+    __tablename__ = "alert_rollups_daily"
+    __table_args__ = (
+        Index("ix_alert_rollups_daily_sensor_id_bucket", "sensor_id", "bucket"),
+    )
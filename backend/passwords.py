@@ -0,0 +1,77 @@
+"""
+Password hashing off the event loop.
+
+bcrypt is deliberately slow (~0.3 s at 12 rounds) and would stall every
+other request if run inline in an async handler. Hashes and verifications
+run on a small thread pool instead (bcrypt releases the GIL, so threads
+are enough); at most PASSWORD_HASH_WORKERS run at once and at most
+PASSWORD_HASH_MAX_PENDING wait, beyond which callers get a 503 rather than
+an ever-growing queue.
+
+Stored hashes whose cost differs from BCRYPT_ROUNDS are rehashed on the
+next successful login, so changing the cost needs no migration.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_executor = ThreadPoolExecutor(max_workers=max(1, PASSWORD_HASH_WORKERS), thread_name_prefix="passwords")
+_pending = 0
+_completed = 0
+_rejected = 0
+_rehashed = 0
+
+
+async def _run(fn, *args):
+    global _pending, _completed, _rejected
+    if _pending >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_PENDING:
+        _rejected += 1
+        raise HTTPException(status_code=503, detail="Authentication is busy, retry shortly",
+                            headers={"Retry-After": "1"})
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _pending -= 1
+        _completed += 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run(pwd_context.hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(matches, replacement hash if the stored one should be upgraded)."""
+    global _rehashed
+    valid, new_hash = await _run(pwd_context.verify_and_update, password, hashed_password)
+    if new_hash:
+        _rehashed += 1
+    return valid, new_hash
+
+
+def stats() -> dict:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "pending": _pending,
+        "completed": _completed,
+        "rejected": _rejected,
+        "rehashed": _rehashed,
+    }
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class TokenBucket:
+    """Allows ``capacity`` events at once, refilled at ``rate`` per second."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, cost: float = 1.0) -> float:
+        """Seconds until ``cost`` tokens are available (0 if they are), spending nothing."""
+        self._refill()
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def take(self, cost: float = 1.0) -> float:
+        """Spend ``cost`` tokens. Returns 0 if allowed, else seconds until it would be."""
+        retry_after = self.wait(cost)
+        if not retry_after:
+            self.tokens -= cost
+        return retry_after
+
+
+class RateLimiter:
+    """
+    A token bucket per key (sensor id, client address, ...). At most
+    ``max_keys`` buckets are kept; the least recently used is dropped first,
+    which only ever lets a forgotten key start again with a full bucket.
+    A ``rate`` of 0 or less disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def check(self, key: Hashable, cost: float = 1.0) -> float:
+        """Returns 0 if the event is allowed, else the Retry-After in seconds."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            retry_after = bucket.take(cost)
+            if retry_after:
+                self.limited += 1
+            else:
+                self.allowed += 1
+            return retry_after
+
+    def peek(self, key: Hashable, cost: float = 1.0) -> float:
+        """Like check(), without spending: for limits on outcomes known only later."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            bucket = self._buckets.get(key)
+            retry_after = bucket.wait(cost) if bucket else 0.0
+            if retry_after:
+                self.limited += 1
+            return retry_after
+
+    def reset(self, key: Hashable):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "keys": len(self._buckets),
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "allowed": self.allowed,
+                "limited": self.limited,
+            }
@@ -0,0 +1,139 @@
+"""
+Hourly and daily alert rollups for /api/analytics.
+
+Alert inserts and resolutions update both rollup tables in the same
+transaction (record_new_alerts() / record_resolved_alert()), so analytics
+never scan the alerts table. Everything is bucketed by the alert's
+alert_time: a resolution counts towards the hour/day the alert was raised
+in. Archiving alerts (archive.py) does not change them. To (re)build the
+rollups from existing and archived alerts (this also corrects resolutions
+counted twice by concurrent resolves before they were guarded):
+
+    python rollups.py backfill
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import delete, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import upsert
+from models import Alert, AlertArchive, AlertRollupDaily, AlertRollupHourly
+
+ROLLUP_MODELS = {"hour": AlertRollupHourly, "day": AlertRollupDaily}
+COUNTERS = ("alerts", "resolved", "real_threats", "false_alarms", "resolve_seconds")
+
+
+def bucket_start(value: datetime, interval: str) -> datetime:
+    if interval == "day":
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _resolution_counters(alert) -> dict:
+    seconds = max(0.0, (alert.resolved_at - alert.alert_time).total_seconds())
+    return {
+        "resolved": 1,
+        "real_threats": int(alert.threat_type == "real"),
+        "false_alarms": int(alert.threat_type == "false"),
+        "resolve_seconds": seconds,
+    }
+
+
+def summarize(counters) -> dict:
+    """Counts plus the derived rates for a row of summed rollup counters."""
+    counters = {name: counters[name] or 0 for name in COUNTERS}
+    classified = counters["real_threats"] + counters["false_alarms"]
+    return {
+        "alerts": counters["alerts"],
+        "resolved": counters["resolved"],
+        "real_threats": counters["real_threats"],
+        "false_alarms": counters["false_alarms"],
+        "false_positive_rate": counters["false_alarms"] / classified if classified else None,
+        "mean_time_to_resolve_seconds": (
+            counters["resolve_seconds"] / counters["resolved"] if counters["resolved"] else None
+        ),
+    }
+
+
+async def _add(db: AsyncSession, interval: str, rows: dict):
+    """Add {(bucket, sensor_id): counters} onto the rollup table for interval."""
+    if not rows:
+        return
+    table = ROLLUP_MODELS[interval].__table__
+    statement = upsert(table, db.bind.dialect.name).values([
+        {"bucket": bucket, "sensor_id": sensor_id, **{name: counters.get(name, 0) for name in COUNTERS}}
+        for (bucket, sensor_id), counters in rows.items()
+    ])
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.bucket, table.c.sensor_id],
+        set_={name: table.c[name] + statement.excluded[name] for name in COUNTERS}
+    ))
+
+
+async def record_new_alerts(db: AsyncSession, alerts: Iterable[Alert]):
+    alerts = list(alerts)
+    for interval in ROLLUP_MODELS:
+        rows = defaultdict(lambda: {"alerts": 0})
+        for alert in alerts:
+            rows[bucket_start(alert.alert_time, interval), alert.sensor_id]["alerts"] += 1
+        await _add(db, interval, rows)
+
+
+async def record_resolved_alert(db: AsyncSession, alert: Alert):
+    """
+    Count a resolution. Only the request whose guarded update resolved the
+    alert may call this, or a concurrent resolve is counted twice.
+    """
+    counters = _resolution_counters(alert)
+    for interval in ROLLUP_MODELS:
+        await _add(db, interval, {(bucket_start(alert.alert_time, interval), alert.sensor_id): counters})
+
+
+def backfill_rollups(bind, batch_size: int = 10_000) -> int:
+    """
+    Recompute both rollup tables from alerts and alerts_archive in one
+    transaction, streaming the alerts so memory is bounded by the number of
+    buckets. Returns the number of alerts read. Alerts written while it runs
+    may be missed, so run it when ingestion is quiet.
+    """
+    rows = {interval: defaultdict(lambda: dict.fromkeys(COUNTERS, 0)) for interval in ROLLUP_MODELS}
+    count = 0
+    with bind.begin() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(union_all(*(
+            select(model.sensor_id, model.alert_time, model.resolved, model.resolved_at, model.threat_type)
+            for model in (Alert, AlertArchive)
+        )))
+        for alert in result:
+            count += 1
+            for interval, buckets in rows.items():
+                counters = buckets[bucket_start(alert.alert_time, interval), alert.sensor_id]
+                counters["alerts"] += 1
+                if alert.resolved and alert.resolved_at:
+                    for name, value in _resolution_counters(alert).items():
+                        counters[name] += value
+
+        for interval, buckets in rows.items():
+            table = ROLLUP_MODELS[interval].__table__
+            conn.execute(delete(table))
+            values = [
+                {"bucket": bucket, "sensor_id": sensor_id, **counters}
+                for (bucket, sensor_id), counters in buckets.items()
+            ]
+            for start in range(0, len(values), batch_size):
+                conn.execute(table.insert(), values[start:start + batch_size])
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the alert rollup tables")
+    parser.add_argument("command", choices=["backfill"])
+    parser.parse_args()
+
+    from database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    count = backfill_rollups(engine)
+    print(f"Rolled up {count} alerts")
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List, Dict
 
 class UserCreate(BaseModel):
     username: str
@@ -39,6 +39,17 @@ class SensorResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class SensorDistance(SensorResponse):
+    distance_km: float
+
+class SensorCluster(BaseModel):
+    """A map marker standing for every sensor in one grid cell."""
+    latitude: float  # centroid of the sensors in the cell
+    longitude: float
+    count: int
+    alerting: int  # sensors with unresolved alerts
+    sensor_id: Optional[str] = None  # set when the cell holds a single sensor
+
 class AlertCreate(BaseModel):
     sensor_id: str
     sensor_name: Optional[str] = None
@@ -55,12 +66,83 @@ class AlertResponse(BaseModel):
     threat_type: Optional[str] = None
     resolution_details: Optional[str] = None
     attachment_path: Optional[str] = None
+    detection_count: int = 1
+    last_seen: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
+class AlertSummary(BaseModel):
+    """Slim alert projection for list views (no resolution text or attachment)."""
+    id: int
+    sensor_id: str
+    sensor_name: str
+    alert_time: datetime
+    resolved: bool
+    resolved_at: Optional[datetime] = None
+    threat_type: Optional[str] = None
+    detection_count: int = 1
+    last_seen: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class ArchivedAlertResponse(AlertResponse):
+    """An alert moved to alerts_archive (see archive.py)."""
+    archived_at: datetime
+
+class AlertBatchItemResult(BaseModel):
+    index: int
+    status: str  # "created", "coalesced" (into an open alert) or "error"
+    alert_id: Optional[int] = None
+    error: Optional[str] = None
+
+class AlertBatchResponse(BaseModel):
+    received: int
+    created: int
+    coalesced: int = 0
+    failed: int
+    results: List[AlertBatchItemResult]
+
 class AlertResolve(BaseModel):
     threat_type: str  # "real" or "false"
     details: str
 
+class ClassifyRequest(BaseModel):
+    """Either a raw mono clip (float samples at the model's sample rate) or a feature tensor."""
+    audio: Optional[List[float]] = None
+    features: Optional[List[List[float]]] = None
+    
+    @model_validator(mode="after")
+    def exactly_one_input(self):
+        if (self.audio is None) == (self.features is None):
+            raise ValueError("Provide exactly one of 'audio' or 'features'")
+        return self
+
+class ClassifyResponse(BaseModel):
+    label: str
+    confidence: float
+    scores: Dict[str, float]
+    batch_size: int  # requests served by the same interpreter call
+
+class AnalyticsCounts(BaseModel):
+    alerts: int
+    resolved: int
+    real_threats: int
+    false_alarms: int
+    false_positive_rate: Optional[float] = None  # false_alarms / (real_threats + false_alarms)
+    mean_time_to_resolve_seconds: Optional[float] = None
+
+class AnalyticsBucket(AnalyticsCounts):
+    bucket: datetime
+
+class SensorAnalytics(AnalyticsCounts):
+    sensor_id: str
 
+class AnalyticsResponse(BaseModel):
+    interval: str
+    since: datetime
+    until: datetime
+    totals: AnalyticsCounts
+    histogram: List[AnalyticsBucket]  # non-empty buckets only, oldest first
+    sensors: List[SensorAnalytics]
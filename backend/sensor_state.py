@@ -0,0 +1,133 @@
+"""
+Incremental maintenance of the sensor_states table.
+
+Every change to the alerts table that affects a sensor's status goes
+through record_new_alerts() / record_resolved_alert(), executed in the same
+transaction as the change itself, so sensor_states never disagrees with
+alerts after a commit. Archiving alerts (archive.py) leaves the counts
+alone. rebuild_sensor_states() recomputes the whole table from alerts and
+alerts_archive; run it after editing alerts by hand:
+
+    python sensor_state.py rebuild
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import case, delete, func, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import upsert
+from models import Alert, AlertArchive, SensorState
+
+
+def _latest(current, incoming):
+    """SQL max() of two nullable timestamps."""
+    return case((current.is_(None), incoming), (incoming > current, incoming), else_=current)
+
+
+async def record_new_alerts(db: AsyncSession, alerts: Iterable[Alert]):
+    """Count newly inserted (unresolved) alerts against their sensors' state."""
+    per_sensor = defaultdict(lambda: [0, None])
+    for alert in alerts:
+        entry = per_sensor[alert.sensor_id]
+        entry[0] += 1
+        if entry[1] is None or alert.alert_time > entry[1]:
+            entry[1] = alert.alert_time
+    if not per_sensor:
+        return
+
+    now = datetime.utcnow()
+    statement = upsert(SensorState.__table__, db.bind.dialect.name).values([
+        {
+            "sensor_id": sensor_id,
+            "open_alerts": count,
+            "total_alerts": count,
+            "last_unresolved_time": latest,
+            "last_alert_time": latest,
+            "updated_at": now,
+        }
+        for sensor_id, (count, latest) in per_sensor.items()
+    ])
+    excluded = statement.excluded
+    table = SensorState.__table__.c
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[table.sensor_id],
+        set_={
+            "open_alerts": table.open_alerts + excluded.open_alerts,
+            "total_alerts": table.total_alerts + excluded.total_alerts,
+            "last_unresolved_time": _latest(table.last_unresolved_time, excluded.last_unresolved_time),
+            "last_alert_time": _latest(table.last_alert_time, excluded.last_alert_time),
+            "updated_at": excluded.updated_at,
+        }
+    ))
+
+
+async def record_resolved_alert(db: AsyncSession, alert: Alert):
+    """Update the state of a sensor whose alert was just marked resolved."""
+    # The resolution must be visible to the lookup below
+    await db.flush()
+    state = SensorState.__table__.c
+    # Decrement first: the row lock it takes orders us after any concurrent
+    # insert for this sensor, so the lookup below sees that insert's alert.
+    await db.execute(
+        SensorState.__table__.update()
+        .where(state.sensor_id == alert.sensor_id)
+        .values(open_alerts=case((state.open_alerts > 0, state.open_alerts - 1), else_=0))
+    )
+    # Newest remaining unresolved alert: an index seek on
+    # (sensor_id, resolved, alert_time)
+    last_unresolved_time = await db.scalar(
+        select(func.max(Alert.alert_time))
+        .where(Alert.sensor_id == alert.sensor_id, Alert.resolved == False)
+    )
+    await db.execute(
+        SensorState.__table__.update()
+        .where(state.sensor_id == alert.sensor_id)
+        .values(last_unresolved_time=last_unresolved_time, updated_at=datetime.utcnow())
+    )
+
+
+def _populate(conn) -> int:
+    alerts = union_all(*(
+        select(model.sensor_id, model.resolved, model.alert_time) for model in (Alert, AlertArchive)
+    )).subquery()
+    rows = conn.execute(select(
+        alerts.c.sensor_id,
+        func.count(case((alerts.c.resolved == False, 1))).label("open_alerts"),
+        func.count().label("total_alerts"),
+        func.max(case((alerts.c.resolved == False, alerts.c.alert_time))).label("last_unresolved_time"),
+        func.max(alerts.c.alert_time).label("last_alert_time"),
+    ).group_by(alerts.c.sensor_id)).all()
+    now = datetime.utcnow()
+    if rows:
+        conn.execute(SensorState.__table__.insert(), [{**row._asdict(), "updated_at": now} for row in rows])
+    return len(rows)
+
+
+def rebuild_sensor_states(bind) -> int:
+    """Recompute sensor_states from alerts (and archived alerts) in one transaction. Returns the row count."""
+    with bind.begin() as conn:
+        conn.execute(delete(SensorState.__table__))
+        return _populate(conn)
+
+
+def ensure_sensor_states(conn):
+    """Populate sensor_states on first start after upgrading an existing database."""
+    has_states = conn.execute(select(SensorState.sensor_id).limit(1)).first()
+    has_alerts = conn.execute(select(Alert.id).limit(1)).first()
+    if has_alerts and not has_states:
+        _populate(conn)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the sensor_states table")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    from database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    count = rebuild_sensor_states(engine)
+    print(f"Rebuilt state for {count} sensors")
@@ -0,0 +1,76 @@
+import math
+import os
+from typing import Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Integer, and_, cast, func, or_
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Marker clusters are grid cells of about this many screen pixels at the
+# requested zoom level (256px Web Mercator tiles).
+CLUSTER_CELL_PX = int(os.getenv("CLUSTER_CELL_PX", "60"))
+MAX_ZOOM = 22
+
+
+def parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    """
+    Parse "min_lon,min_lat,max_lon,max_lat" (GeoJSON order, as produced by
+    Leaflet's LatLngBounds.toBBoxString()). min_lon > max_lon means the box
+    crosses the antimeridian.
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise HTTPException(status_code=422, detail="bbox is out of range")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def bbox_condition(latitude, longitude, min_lon, min_lat, max_lon, max_lat):
+    """
+    SQL condition for points inside the box. The latitude range leads so the
+    (latitude, longitude) index narrows the scan; longitude is checked from
+    the same index entries.
+    """
+    in_latitude = latitude.between(min_lat, max_lat)
+    if min_lon <= max_lon:
+        return and_(in_latitude, longitude.between(min_lon, max_lon))
+    return and_(in_latitude, or_(longitude >= min_lon, longitude <= max_lon))
+
+
+def around(lat: float, lon: float, radius_deg: float) -> Tuple[float, float, float, float]:
+    """Bounding box containing every point within radius_deg (of arc) of lat/lon."""
+    min_lat, max_lat = max(-90.0, lat - radius_deg), min(90.0, lat + radius_deg)
+    if min_lat == -90.0 or max_lat == 90.0:
+        return -180.0, min_lat, 180.0, max_lat
+    lon_radius = radius_deg / math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if lon_radius >= 180:
+        return -180.0, min_lat, 180.0, max_lat
+    wrap = lambda value: (value + 180) % 360 - 180
+    return wrap(lon - lon_radius), min_lat, wrap(lon + lon_radius), max_lat
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def cluster_cell_degrees(zoom: int) -> float:
+    """Grid cell size, in degrees, for clustering markers at a map zoom level."""
+    return 360 / (256 * 2 ** zoom) * CLUSTER_CELL_PX
+
+
+def grid_cell(latitude, longitude, cell_degrees: float, dialect_name: str):
+    """SQL (row, column) of the fixed global grid cell containing a point."""
+    row, column = (latitude + 90) / cell_degrees, (longitude + 180) / cell_degrees
+    if dialect_name == "postgresql":
+        return func.floor(row), func.floor(column)
+    # SQLite may be built without floor(); its integer cast truncates, which
+    # is the floor here because the offsets keep the values non-negative.
+    return cast(row, Integer), cast(column, Integer)
@@ -0,0 +1,214 @@
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "100")) * 1024 * 1024
+# Multipart framing and the other form fields, on top of the file itself
+MAX_FORM_OVERHEAD_BYTES = 1024 * 1024
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_DIR_NAME = "thumbnails"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".tif", ".tiff"}
+
+_RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+@dataclass
+class StoredUpload:
+    path: Path
+    sha256: str
+    size: int
+    thumbnail_path: Optional[Path]
+    # False when an identical file was already stored
+    created: bool
+
+
+def _safe_suffix(filename: Optional[str]) -> str:
+    suffix = Path(filename or "").suffix.lower()
+    return suffix if re.fullmatch(r"\.[a-z0-9]{1,10}", suffix) else ""
+
+
+def _write_chunk(handle, hasher, chunk: bytes):
+    hasher.update(chunk)
+    handle.write(chunk)
+
+
+def _finalize(temp_path: Path, final_path: Path) -> bool:
+    # Content-addressed: an identical file already stored is reused as is.
+    if final_path.exists():
+        temp_path.unlink()
+        return False
+    os.replace(temp_path, final_path)
+    return True
+
+
+def thumbnail_path_for(attachment_path: str, upload_dir: Path) -> Path:
+    return upload_dir / THUMBNAIL_DIR_NAME / f"{Path(attachment_path).stem}.jpg"
+
+
+def _make_thumbnail(source: Path, destination: Path) -> Optional[Path]:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    if destination.exists():
+        return destination
+    try:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(THUMBNAIL_SIZE)
+            destination.parent.mkdir(exist_ok=True)
+            image.convert("RGB").save(destination, "JPEG", quality=80)
+    except (UnidentifiedImageError, OSError) as e:
+        print(f"Thumbnail generation failed for {source}: {e}")
+        return None
+    return destination
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware answering 413 before any of the body is read when a POST
+    to the matching routes declares a Content-Length over ``max_bytes``. The
+    form parser receives and spools the whole body before the route runs, so
+    the check in save_upload() alone does not spare bandwidth or temp space.
+    Chunked requests (no Content-Length) are only stopped by the route's own
+    check and by the body size limit of the server or proxy in front.
+    """
+
+    def __init__(self, app, path_pattern: str, max_bytes: int = MAX_UPLOAD_BYTES + MAX_FORM_OVERHEAD_BYTES,
+                 detail: str = f"Upload exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"):
+        self.app = app
+        self.path_pattern = re.compile(path_pattern)
+        self.max_bytes = max_bytes
+        self.detail = detail
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and self.path_pattern.fullmatch(scope["path"]):
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if length.isdigit() and int(length) > self.max_bytes:
+                response = JSONResponse(
+                    status_code=413,
+                    content={"detail": self.detail},
+                    headers={"Connection": "close"},
+                )
+                return await response(scope, receive, send)
+        return await self.app(scope, receive, send)
+
+
+async def save_upload(file: UploadFile, upload_dir: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> StoredUpload:
+    """
+    Stream an upload to disk in chunks, hashing as it goes. File I/O runs in
+    the threadpool so the event loop is never blocked, and at most one chunk
+    is held in memory. Files are stored under their SHA-256, so re-uploads of
+    the same photo share one copy. Images also get a JPEG thumbnail.
+    """
+    suffix = _safe_suffix(file.filename)
+    temp_path = upload_dir / f".upload-{uuid.uuid4().hex}"
+    hasher = hashlib.sha256()
+    size = 0
+
+    handle = await run_in_threadpool(open, temp_path, "wb")
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Upload exceeds {max_bytes // (1024 * 1024)} MB limit"
+                )
+            await run_in_threadpool(_write_chunk, handle, hasher, chunk)
+    except BaseException:
+        await run_in_threadpool(handle.close)
+        await run_in_threadpool(temp_path.unlink, True)
+        raise
+    await run_in_threadpool(handle.close)
+
+    sha256 = hasher.hexdigest()
+    final_path = upload_dir / f"{sha256}{suffix}"
+    created = await run_in_threadpool(_finalize, temp_path, final_path)
+    metrics.uploads.inc()
+    metrics.upload_bytes.inc(size)
+
+    thumbnail_path = None
+    is_image = (file.content_type or "").startswith("image/") or suffix in IMAGE_SUFFIXES
+    if is_image:
+        thumbnail_path = await run_in_threadpool(
+            _make_thumbnail, final_path, thumbnail_path_for(str(final_path), upload_dir)
+        )
+    return StoredUpload(path=final_path, sha256=sha256, size=size, thumbnail_path=thumbnail_path, created=created)
+
+
+def _remove(stored: StoredUpload):
+    for path in (stored.path, stored.thumbnail_path):
+        if path:
+            path.unlink(missing_ok=True)
+
+
+async def discard_upload(stored: StoredUpload):
+    """
+    Delete a file save_upload() just stored, and its thumbnail. Files that
+    were already there are kept; the caller checks that nothing else refers
+    to the path.
+    """
+    if stored.created:
+        await run_in_threadpool(_remove, stored)
+
+
+def _parse_range(range_header: str, file_size: int):
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        # Suffix range: the last N bytes
+        length = int(end)
+        return max(0, file_size - length), file_size - 1
+    end = min(int(end), file_size - 1) if end else file_size - 1
+    return int(start), end
+
+
+def file_response(path: Path, range_header: Optional[str] = None) -> StreamingResponse:
+    """Stream a file from disk, honouring a single-range ``Range`` header."""
+    file_size = path.stat().st_size
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    headers = {"Accept-Ranges": "bytes", "ETag": f'"{path.stem}"'}
+    start, end = 0, file_size - 1
+    status_code = 200
+
+    if range_header:
+        byte_range = _parse_range(range_header, file_size)
+        if byte_range is None or byte_range[0] > byte_range[1] or byte_range[0] >= file_size:
+            raise HTTPException(
+                status_code=416,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{file_size}"}
+            )
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    async def stream():
+        handle = await run_in_threadpool(open, path, "rb")
+        try:
+            await run_in_threadpool(handle.seek, start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await run_in_threadpool(handle.read, min(UPLOAD_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            await run_in_threadpool(handle.close)
+
+    return StreamingResponse(stream(), status_code=status_code, media_type=media_type, headers=headers)
@@ -0,0 +1,84 @@
+"""
+Benchmark: per-clip vs. batched spectrogram feature extraction.
+
+    python benchmarks/bench_feature_extraction.py --clips 10000
+
+Clips are written to a temporary memory-mapped .npy (float32, ~128 KB per
+clip) so the dataset does not have to fit in RAM. Reports clips/second and
+peak Python-tracked allocations for each path, and checks that the batched
+float64 features are identical to the per-clip ones.
+"""
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from msitushield_model import (  # noqa: E402
+    N_MFCC, N_SAMPLES, SAMPLE_RATE,
+    extract_spectrogram_features, extract_spectrogram_features_batch,
+)
+
+
+def make_clips(path, n_clips, seed=0, chunk_size=1000):
+    rng = np.random.default_rng(seed)
+    t = np.arange(N_SAMPLES, dtype=np.float32) / SAMPLE_RATE
+    clips = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n_clips, N_SAMPLES))
+    for start in range(0, n_clips, chunk_size):
+        n = min(chunk_size, n_clips - start)
+        freqs = rng.uniform(50, 500, size=(n, 1)).astype(np.float32)
+        clips[start:start + n] = 0.4 * np.sin(2 * np.pi * freqs * t) + 0.1 * rng.standard_normal((n, N_SAMPLES), dtype=np.float32)
+    clips.flush()
+    return np.load(path, mmap_mode="r")
+
+
+def measure(name, fn, n_clips):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>22}: {elapsed:7.2f}s  {n_clips / elapsed:8.0f} clips/s  peak {peak / 2**20:8.1f} MiB")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=10_000)
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--skip-baseline", action="store_true", help="only time the batched path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        clips = make_clips(Path(workdir) / "clips.npy", args.clips)
+
+        batched, batched_time = measure(
+            "batched float64",
+            lambda: extract_spectrogram_features_batch(clips, SAMPLE_RATE, N_MFCC, chunk_size=args.chunk_size),
+            args.clips,
+        )
+        measure(
+            "batched float32",
+            lambda: extract_spectrogram_features_batch(clips, SAMPLE_RATE, N_MFCC, chunk_size=args.chunk_size,
+                                                       dtype=np.float32),
+            args.clips,
+        )
+        if not args.skip_baseline:
+            baseline, baseline_time = measure(
+                "per-clip (original)",
+                lambda: extract_spectrogram_features((np.asarray(clip, dtype=np.float64) for clip in clips),
+                                                     SAMPLE_RATE, N_MFCC),
+                args.clips,
+            )
+            print(f"Speedup: {baseline_time / batched_time:.1f}x, identical: {np.array_equal(baseline, batched)}")
+        del clips
+
+
+if __name__ == "__main__":
+    main()
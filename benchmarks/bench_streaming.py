@@ -0,0 +1,144 @@
+"""
+Benchmark: real-time factor of the streaming detector on one CPU core.
+
+    python benchmarks/bench_streaming.py --seconds 60
+    python benchmarks/bench_streaming.py --model audio_classifier_quantized.tflite
+
+Streams ``--seconds`` of synthetic 16 kHz audio through streaming_detector
+in ``--chunk-ms`` reads and reports the real-time factor (processing time /
+audio duration; below 1 keeps up) for:
+
+* features: incremental frames only, against recomputing the whole
+  window's spectrogram every hop (what clip-based code would do);
+* each model: the full detector, running the model every hop and every
+  4th hop.
+
+Without ``--model``, an untrained model from msitushield_model.build_model
+is exported to Keras, float32 TFLite and int8 TFLite in a temporary
+directory (timing does not depend on the weights). The process is pinned to
+one core and every runtime limited to one thread.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# One core, one thread per runtime: set before NumPy/TensorFlow start pools
+for variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                 "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+    os.environ.setdefault(variable, "1")
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+if hasattr(os, "sched_setaffinity"):
+    os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+
+import numpy as np  # noqa: E402
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from audio_features import (  # noqa: E402
+    FIXED_TIME_STEPS, N_MFCC, SAMPLE_RATE, extract_spectrogram_features_batch,
+)
+from streaming_detector import (  # noqa: E402
+    HOP_LENGTH, N_FFT, HysteresisSmoother, SpectrogramStream, StreamingDetector, load_model,
+)
+
+WINDOW_SAMPLES = N_FFT + (FIXED_TIME_STEPS - 1) * HOP_LENGTH
+
+
+def make_stream(seconds, seed=0):
+    """Forest noise with a chainsaw-like and a truck-like stretch in the middle."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    audio = 0.05 * rng.standard_normal(n)
+    third = n // 3
+    audio[third:2 * third] += 0.4 * np.sin(2 * np.pi * 110 * t[third:2 * third])
+    audio[2 * third:] += 0.5 * np.sin(2 * np.pi * 60 * t[2 * third:])
+    return audio
+
+
+def chunks(audio, chunk_ms):
+    size = int(SAMPLE_RATE * chunk_ms / 1000)
+    return [audio[start:start + size] for start in range(0, len(audio), size)]
+
+
+def export_models(workdir):
+    import tensorflow as tf
+    from msitushield_model import NUM_CLASSES, build_model
+
+    tf.config.threading.set_intra_op_parallelism_threads(1)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    model = build_model((N_MFCC, FIXED_TIME_STEPS, 1), NUM_CLASSES)
+    keras_path = Path(workdir) / "model.keras"
+    model.save(keras_path)
+
+    float_path = Path(workdir) / "model_float32.tflite"
+    float_path.write_bytes(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+
+    def representative_dataset():
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            yield [rng.random((1, N_MFCC, FIXED_TIME_STEPS, 1), dtype=np.float32) * 1e-3]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    int8_path = Path(workdir) / "model_int8.tflite"
+    int8_path.write_bytes(converter.convert())
+    return [keras_path, float_path, int8_path]
+
+
+def report(name, seconds, audio_seconds, hops):
+    print(f"{name:>34}: RTF {seconds / audio_seconds:7.4f}  "
+          f"{seconds / hops * 1e6:8.1f} us/hop  ({audio_seconds / seconds:6.0f}x real time)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--chunk-ms", type=float, default=100.0)
+    parser.add_argument("--model", action="append", help=".tflite/.h5/.keras (repeatable)")
+    args = parser.parse_args()
+
+    audio = make_stream(args.seconds)
+    pieces = chunks(audio, args.chunk_ms)
+    hops = (len(audio) - N_FFT) // HOP_LENGTH + 1
+    print(f"{args.seconds:.0f} s of audio, {hops} hops of {HOP_LENGTH / SAMPLE_RATE * 1000:.0f} ms, "
+          f"{args.chunk_ms:.0f} ms reads, pinned to CPU {sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else '?'}")
+
+    stream = SpectrogramStream()
+    start = time.perf_counter()
+    for piece in pieces:
+        stream.push(piece)
+    report("features, incremental", time.perf_counter() - start, args.seconds, hops)
+
+    # Baseline: every hop, the spectrogram of the whole window from scratch
+    start = time.perf_counter()
+    for end in range(WINDOW_SAMPLES, len(audio) + 1, HOP_LENGTH):
+        extract_spectrogram_features_batch(audio[np.newaxis, end - WINDOW_SAMPLES:end], SAMPLE_RATE, N_MFCC,
+                                           verbose=False)
+    report("features, recomputed per hop", time.perf_counter() - start, args.seconds, hops)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        model_paths = args.model or export_models(workdir)
+        for path in model_paths:
+            model = load_model(path, num_threads=1)
+            model(stream.window())  # load / trace outside the timing
+            for infer_every in (1, 4):
+                detector = StreamingDetector(model, HysteresisSmoother(), infer_every=infer_every)
+                start = time.perf_counter()
+                events = []
+                for piece in pieces:
+                    events += detector.process(piece)
+                report(f"{Path(path).name}, model every {infer_every} hop(s)",
+                       time.perf_counter() - start, args.seconds, hops)
+            print(f"{'':>34}  {detector.inferences} inferences, {len(events)} detection events")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,31 @@
 import { useState, useEffect } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { useAuth } from '../context/AuthContext'
-import api from '../services/api'
+import api, { API_URL } from '../services/api'
+import { subscribeToAlerts } from '../services/alertStream'
 import ResolveAlertModal from '../components/ResolveAlertModal'
 import './Alerts.css'
 
+// GET /api/alerts is paged; the next page's cursor is in X-Next-Cursor
+const withCursor = (path, cursor) => (cursor ? `${path}&cursor=${encodeURIComponent(cursor)}` : path)
+
+// Every page of a list, for the open queue, which must never be truncated
+const fetchAllPages = async (path) => {
+  const alerts = []
+  let cursor = null
+  do {
+    const response = await api.get(withCursor(path, cursor))
+    alerts.push(...response.data)
+    cursor = response.headers['x-next-cursor'] || null
+  } while (cursor)
+  return alerts
+}
+
 function Alerts() {
   const [unresolvedAlerts, setUnresolvedAlerts] = useState([])
   const [resolvedAlerts, setResolvedAlerts] = useState([])
+  const [resolvedCursor, setResolvedCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [loading, setLoading] = useState(true)
   const [selectedAlert, setSelectedAlert] = useState(null)
   const [showResolveModal, setShowResolveModal] = useState(false)
@@ -16,18 +34,38 @@ function Alerts() {
 
   useEffect(() => {
     fetchAlerts()
-    const interval = setInterval(fetchAlerts, 10000) // Refresh every 10 seconds
-    return () => clearInterval(interval)
+    // Apply pushed changes in place instead of re-downloading both lists.
+    const unsubscribe = subscribeToAlerts({
+      onAlertCreated: (alert) => {
+        setUnresolvedAlerts((alerts) =>
+          alerts.some((a) => a.id === alert.id) ? alerts : [alert, ...alerts]
+        )
+      },
+      onAlertUpdated: (alert) => {
+        setUnresolvedAlerts((alerts) => alerts.map((a) => (a.id === alert.id ? alert : a)))
+      },
+      onAlertResolved: (alert) => {
+        setUnresolvedAlerts((alerts) => alerts.filter((a) => a.id !== alert.id))
+        setResolvedAlerts((alerts) => [alert, ...alerts.filter((a) => a.id !== alert.id)])
+      },
+      onResync: fetchAlerts,
+    })
+    const interval = setInterval(fetchAlerts, 60000) // Fallback refresh
+    return () => {
+      unsubscribe()
+      clearInterval(interval)
+    }
   }, [])
 
   const fetchAlerts = async () => {
     try {
-      const [unresolvedRes, resolvedRes] = await Promise.all([
-        api.get('/api/alerts?resolved=false'),
+      const [unresolved, resolvedRes] = await Promise.all([
+        fetchAllPages('/api/alerts?resolved=false&fields=summary&limit=1000'),
         api.get('/api/alerts?resolved=true')
       ])
-      setUnresolvedAlerts(unresolvedRes.data)
+      setUnresolvedAlerts(unresolved)
       setResolvedAlerts(resolvedRes.data)
+      setResolvedCursor(resolvedRes.headers['x-next-cursor'] || null)
     } catch (error) {
       console.error('Error fetching alerts:', error)
     } finally {
@@ -35,6 +73,22 @@ function Alerts() {
     }
   }
 
+  const loadMoreResolved = async () => {
+    setLoadingMore(true)
+    try {
+      const response = await api.get(withCursor('/api/alerts?resolved=true', resolvedCursor))
+      setResolvedAlerts((alerts) => [
+        ...alerts,
+        ...response.data.filter((alert) => !alerts.some((a) => a.id === alert.id))
+      ])
+      setResolvedCursor(response.headers['x-next-cursor'] || null)
+    } catch (error) {
+      console.error('Error fetching alerts:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleResolve = (alert) => {
     setSelectedAlert(alert)
     setShowResolveModal(true)
@@ -51,6 +105,11 @@ function Alerts() {
     navigate('/login')
   }
 
+  const attachmentUrl = (alert, thumbnail = false) => {
+    const token = encodeURIComponent(localStorage.getItem('token') || '')
+    return `${API_URL}/api/alerts/${alert.id}/attachment?token=${token}${thumbnail ? '&thumbnail=true' : ''}`
+  }
+
   const formatDate = (dateString) => {
     return new Date(dateString).toLocaleString()
   }
@@ -102,6 +161,9 @@ function Alerts() {
                     <p><strong>Sensor ID:</strong> {alert.sensor_id}</p>
                     <p><strong>Sensor Name:</strong> {alert.sensor_name}</p>
                     <p><strong>Alert Time:</strong> {formatDate(alert.alert_time)}</p>
+                    {alert.detection_count > 1 && (
+                      <p><strong>Detections:</strong> {alert.detection_count} (last {formatDate(alert.last_seen)})</p>
+                    )}
                   </div>
                   <button
                     onClick={() => handleResolve(alert)}
@@ -138,11 +200,27 @@ function Alerts() {
                     {alert.resolution_details && (
                       <p><strong>Details:</strong> {alert.resolution_details}</p>
                     )}
+                    {alert.attachment_path && (
+                      <a href={attachmentUrl(alert)} target="_blank" rel="noreferrer">
+                        <img
+                          className="alert-thumbnail"
+                          src={attachmentUrl(alert, true)}
+                          alt="Evidence"
+                          loading="lazy"
+                          onError={(e) => { e.currentTarget.style.display = 'none' }}
+                        />
+                      </a>
+                    )}
                   </div>
                 </div>
               ))}
             </div>
           )}
+          {resolvedCursor && (
+            <button onClick={loadMoreResolved} className="load-more-button" disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          )}
         </div>
       </div>
 
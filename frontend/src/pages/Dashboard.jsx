@@ -2,6 +2,7 @@ import { useState, useEffect } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { useAuth } from '../context/AuthContext'
 import api from '../services/api'
+import { subscribeToAlerts } from '../services/alertStream'
 import './Dashboard.css'
 
 function Dashboard() {
@@ -13,8 +14,24 @@ function Dashboard() {
 
   useEffect(() => {
     fetchDashboardData()
-    const interval = setInterval(fetchDashboardData, 10000) // Refresh every 10 seconds
-    return () => clearInterval(interval)
+    // Refresh when the alert stream reports a change; bursts of events are
+    // coalesced into one request. A slow poll remains as a fallback.
+    let refreshTimer = null
+    const scheduleRefresh = () => {
+      clearTimeout(refreshTimer)
+      refreshTimer = setTimeout(fetchDashboardData, 500)
+    }
+    const unsubscribe = subscribeToAlerts({
+      onAlertCreated: scheduleRefresh,
+      onAlertResolved: scheduleRefresh,
+      onResync: scheduleRefresh,
+    })
+    const interval = setInterval(fetchDashboardData, 60000)
+    return () => {
+      unsubscribe()
+      clearTimeout(refreshTimer)
+      clearInterval(interval)
+    }
   }, [])
 
   const fetchDashboardData = async () => {
@@ -0,0 +1,24 @@
+import { API_URL } from './api'
+
+// Subscribes to the backend's Server-Sent Events alert feed.
+// EventSource reconnects on its own and resends Last-Event-ID, so missed
+// events are replayed by the server (or a "resync" event is sent).
+export function subscribeToAlerts(handlers) {
+  const token = localStorage.getItem('token')
+  const source = new EventSource(`${API_URL}/api/alerts/stream?token=${encodeURIComponent(token || '')}`)
+
+  const listen = (type, handler) => {
+    if (!handler) return
+    source.addEventListener(type, (event) => handler(JSON.parse(event.data)))
+  }
+  listen('alert_created', handlers.onAlertCreated)
+  listen('alert_updated', handlers.onAlertUpdated)
+  listen('alert_resolved', handlers.onAlertResolved)
+  listen('resync', handlers.onResync)
+
+  source.onerror = (error) => {
+    console.error('Alert stream error:', error)
+  }
+
+  return () => source.close()
+}
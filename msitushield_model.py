@@ -2,25 +2,33 @@ import numpy as np
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, Dropout, Conv2D, MaxPooling2D, Flatten, BatchNormalization, Input
-from tensorflow.keras.utils import to_categorical
-from sklearn.model_selection import train_test_split
-import scipy.signal # Use scipy.signal directly
+import functools
+import os
+from pathlib import Path
+
+from audio_features import (
+    SAMPLE_RATE, DURATION, N_SAMPLES, N_MFCC, FIXED_TIME_STEPS, CLASS_NAMES,
+    extract_spectrogram_features, extract_spectrogram_features_batch,
+)
 
 # --- 1. Configuration & Hyperparameters ---
 
-SAMPLE_RATE = 16000  # Hz, typical for audio processing
-DURATION = 2.0       # seconds per audio clip
-N_SAMPLES = int(SAMPLE_RATE * DURATION)
-N_MFCC = 13          # Number of MFCC features to extract
+# Audio and feature settings (SAMPLE_RATE, DURATION, N_SAMPLES, N_MFCC,
+# FIXED_TIME_STEPS) are defined in audio_features.py
 
 # Data generation parameters
 N_SAMPLES_PER_CLASS = 500 # Number of synthetic samples to generate for each class
+DATASET_PATH = "synthetic_audio.npy" # Memory-mapped clips (labels in synthetic_audio_labels.npy)
+FEATURE_CACHE_DIR = "feature_cache"   # On-disk tf.data cache of validation features
 
 # Model parameters
 # We will define the input shape dynamically after feature extraction
-NUM_CLASSES = 3 # chainsaw, truck_engine, forest_noise
+NUM_CLASSES = len(CLASS_NAMES) # chainsaw, truck_engine, forest_noise
 EPOCHS = 50
 BATCH_SIZE = 32
+# Random gain, noise mix and time shift on training clips. Off by default so
+# runs stay comparable with models trained before it; MSITUSHIELD_AUGMENT=1 enables it
+AUGMENT = os.getenv("MSITUSHIELD_AUGMENT", "").lower() in ("1", "true", "yes")
 
 # --- 2. Synthetic Data Generation ---
 
@@ -76,89 +84,300 @@ def create_synthetic_audio():
     print(f"Generated {len(data)} audio samples.")
     return np.array(data), np.array(labels)
 
+@functools.lru_cache(maxsize=8)
+def _time_axis(duration, sample_rate):
+    """Shared, read-only time axis (computed once per duration/sample rate)."""
+    t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
+    t.setflags(write=False)
+    return t
+
+def _fill_class_chunk(out, label, rng):
+    """Fills out, an (n, N_SAMPLES) view, with n clips of one class in place."""
+    n = out.shape[0]
+    dtype = out.dtype
+    two_pi_t = (2 * np.pi * _time_axis(DURATION, SAMPLE_RATE)).astype(dtype)[np.newaxis, :]
+    scratch = np.empty_like(out)
+
+    def add_sines(low, high, amplitude):
+        freqs = rng.uniform(low, high, size=(n, 1)).astype(dtype)
+        np.multiply(freqs, two_pi_t, out=scratch)
+        np.sin(scratch, out=scratch)
+        np.multiply(scratch, amplitude, out=scratch)
+        np.add(out, scratch, out=out)
+
+    # Start from white noise, then add the tonal components
+    rng.standard_normal(out=out, dtype=dtype)
+    if label == 0:
+        # Chainsaw: high-frequency buzz + some mid-range noise
+        out *= 0.05
+        add_sines(100, 120, 0.4)
+        add_sines(400, 500, 0.2)
+    elif label == 1:
+        # Truck engine: low-frequency rumble
+        out *= 0.05
+        add_sines(50, 80, 0.5)
+        add_sines(100, 150, 0.2)
+    else:
+        # Forest noise: half of the clips get a short low thump at a random position
+        out *= 0.3
+        has_thump = np.flatnonzero(rng.random(n) > 0.5)
+        thump_len = int(SAMPLE_RATE * 0.2)
+        thump_t = (2 * np.pi * _time_axis(0.2, SAMPLE_RATE)).astype(dtype)[np.newaxis, :]
+        freqs = rng.uniform(20, 40, size=(len(has_thump), 1)).astype(dtype)
+        starts = rng.integers(0, N_SAMPLES - thump_len, size=len(has_thump))
+        columns = starts[:, np.newaxis] + np.arange(thump_len)
+        out[has_thump[:, np.newaxis], columns] += 0.5 * np.sin(freqs * thump_t)
+
+def create_synthetic_audio_vectorized(n_per_class=N_SAMPLES_PER_CLASS, seed=None, dtype=np.float64,
+                                      chunk_size=1000, out=None):
+    """
+    Vectorized version of create_synthetic_audio: fills up to chunk_size clips
+    of a class per NumPy call, in place. Draws come from a
+    numpy.random.Generator, so a given (seed, chunk_size) always produces the
+    same dataset. Clips are written into out (e.g. a memory map) when given;
+    the layout matches create_synthetic_audio, class by class.
+    """
+    print("Generating synthetic audio data (vectorized)...")
+    rng = np.random.default_rng(seed)
+    n_total = NUM_CLASSES * n_per_class
+    if out is None:
+        out = np.empty((n_total, N_SAMPLES), dtype=dtype)
+
+    for label in range(NUM_CLASSES):
+        class_start = label * n_per_class
+        for start in range(0, n_per_class, chunk_size):
+            n = min(chunk_size, n_per_class - start)
+            offset = class_start + start
+            chunk = out[offset:offset + n]
+            if isinstance(chunk, np.memmap) or not chunk.flags.c_contiguous:
+                # Generate in RAM, then copy once into the memory map
+                buffer = np.empty(chunk.shape, dtype=chunk.dtype)
+                _fill_class_chunk(buffer, label, rng)
+                chunk[...] = buffer
+            else:
+                _fill_class_chunk(chunk, label, rng)
+
+    labels = np.repeat(np.arange(NUM_CLASSES), n_per_class)
+    print(f"Generated {n_total} audio samples.")
+    return out, labels
+
+def labels_path_for(audio_path):
+    audio_path = Path(audio_path)
+    return audio_path.with_name(f"{audio_path.stem}_labels.npy")
+
+def write_synthetic_dataset(path, n_per_class=N_SAMPLES_PER_CLASS, seed=None, dtype=np.float32, chunk_size=1000):
+    """
+    Generates the synthetic dataset straight into a memory-mapped .npy file
+    (labels go next to it in <name>_labels.npy), so datasets larger than RAM
+    can be built. Returns the audio opened read-only with mmap_mode="r".
+    """
+    n_total = NUM_CLASSES * n_per_class
+    audio = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(n_total, N_SAMPLES))
+    _, labels = create_synthetic_audio_vectorized(n_per_class, seed=seed, dtype=dtype,
+                                                  chunk_size=chunk_size, out=audio)
+    audio.flush()
+    del audio
+    np.save(labels_path_for(path), labels)
+    return load_synthetic_dataset(path)
+
+def load_synthetic_dataset(path):
+    """Opens a dataset written by write_synthetic_dataset without loading it into RAM."""
+    return np.load(path, mmap_mode="r"), np.load(labels_path_for(path))
+
 # --- 3. Feature Extraction (Spectrogram) ---
+# extract_spectrogram_features and extract_spectrogram_features_batch live in
+# audio_features.py (NumPy/SciPy only) so the backend inference service can
+# share them without TensorFlow; they are imported above.
 
-def extract_spectrogram_features(audio_data, sample_rate, n_mfcc, n_fft=512, hop_length=256):
+def write_feature_file(audio, path, chunk_size=1024):
     """
-    Extracts spectrogram features from audio data.
-    This is a more robust approach for our CNN.
+    Extracts float32 features for every clip in audio (e.g. a dataset memory
+    map) straight into a memory-mapped (n_clips, N_MFCC, FIXED_TIME_STEPS)
+    .npy and returns it opened read-only. Processes that open the same file
+    share its pages through the OS page cache instead of each holding a copy.
     """
-    print("Extracting spectrogram features...")
-    features = []
-    # We'll use a fixed number of time steps for the model input
-    fixed_time_steps = 32 
-    
-    for audio in audio_data:
-        # Compute the spectrogram
-        f, t, Sxx = scipy.signal.spectrogram(audio, fs=sample_rate, nperseg=n_fft, noverlap=n_fft - hop_length)
-        
-        # Take the first n_mfcc frequency bins (simulating MFCCs)
-        feature = Sxx[:n_mfcc, :]
-        
-        # FIX: Ensure the time dimension is consistent
-        # Pad with zeros if the spectrogram is too short, or truncate if too long
-        if feature.shape[1] < fixed_time_steps:
-            pad_width = fixed_time_steps - feature.shape[1]
-            feature = np.pad(feature, pad_width=((0, 0), (0, pad_width)), mode='constant')
-        elif feature.shape[1] > fixed_time_steps:
-            feature = feature[:, :fixed_time_steps]
-            
-        features.append(feature)
-        
-    return np.array(features)
+    features = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32,
+                                         shape=(len(audio), N_MFCC, FIXED_TIME_STEPS))
+    extract_spectrogram_features_batch(audio, SAMPLE_RATE, N_MFCC, dtype=np.float32, chunk_size=chunk_size,
+                                       out=features)
+    features.flush()
+    del features
+    return np.load(path, mmap_mode="r")
 
+def features_path_for(audio_path):
+    audio_path = Path(audio_path)
+    return audio_path.with_name(f"{audio_path.stem}_features.npy")
 
-# --- 4. Model Definition ---
+def load_feature_file(dataset_path=DATASET_PATH, n_per_class=N_SAMPLES_PER_CLASS):
+    """
+    (features, labels) for the dataset at dataset_path, features memory-mapped
+    from <name>_features.npy. The dataset is generated (seed 42, as for
+    training) if missing, and the features re-extracted if missing or older
+    than it.
+    """
+    dataset_path = Path(dataset_path)
+    if not dataset_path.exists():
+        write_synthetic_dataset(dataset_path, n_per_class, seed=42)
+    audio, labels = load_synthetic_dataset(dataset_path)
+    path = features_path_for(dataset_path)
+    if (path.exists() and path.stat().st_mtime >= dataset_path.stat().st_mtime
+            and np.load(path, mmap_mode="r").shape[0] == len(audio)):
+        return np.load(path, mmap_mode="r"), labels
+    print(f"Extracting features for {len(audio)} clips into {path}...")
+    return write_feature_file(audio, path), labels
 
-def build_model(input_shape, num_classes):
-    """Builds a CNN model for audio classification."""
-    model = Sequential([
-        Input(shape=input_shape),
-        
-        Conv2D(32, kernel_size=(3, 3), activation='relu', padding='same'),
-        BatchNormalization(),
-        MaxPooling2D(pool_size=(2, 2)),
-        Dropout(0.3),
-
-        Conv2D(64, kernel_size=(3, 3), activation='relu', padding='same'),
-        BatchNormalization(),
-        MaxPooling2D(pool_size=(2, 2)),
-        Dropout(0.3),
+# --- 4. Model Definition ---
 
+def build_model(input_shape, num_classes, conv_filters=(32, 64), dense_units=128, conv_dropout=0.3,
+                dense_dropout=0.5, learning_rate=None):
+    """
+    Builds a CNN model for audio classification: one Conv2D/BatchNorm/
+    MaxPool/Dropout block per entry of conv_filters, then a Dense layer of
+    dense_units. The defaults are the deployed model; learning_rate=None
+    keeps Adam's default.
+    """
+    layers = [Input(shape=input_shape)]
+    for filters in conv_filters:
+        layers += [
+            Conv2D(filters, kernel_size=(3, 3), activation='relu', padding='same'),
+            BatchNormalization(),
+            MaxPooling2D(pool_size=(2, 2)),
+            Dropout(conv_dropout),
+        ]
+    layers += [
         Flatten(),
-        Dense(128, activation='relu'),
-        Dropout(0.5),
+        Dense(dense_units, activation='relu'),
+        Dropout(dense_dropout),
         Dense(num_classes, activation='softmax')
-    ])
-    
-    model.compile(optimizer='adam',
+    ]
+    model = Sequential(layers)
+
+    optimizer = 'adam' if learning_rate is None else tf.keras.optimizers.Adam(learning_rate)
+    model.compile(optimizer=optimizer,
                   loss='categorical_crossentropy',
                   metrics=['accuracy'])
     
     return model
 
-# --- 5. Main Execution Block ---
+# --- 5. Input Pipeline (tf.data) ---
+
+def _augment_batch(clips, labels):
+    """Random gain, additive noise and circular time shift, per clip, in TF ops."""
+    batch = tf.shape(clips)[0]
+    n_samples = tf.shape(clips)[1]
+
+    # Gain: +/- 6 dB
+    gain_db = tf.random.uniform([batch, 1], -6.0, 6.0)
+    clips = clips * tf.pow(10.0, gain_db / 20.0)
+
+    # Noise mix: white noise at a random 10-30 dB signal-to-noise ratio
+    snr_db = tf.random.uniform([batch, 1], 10.0, 30.0)
+    rms = tf.sqrt(tf.reduce_mean(tf.square(clips), axis=1, keepdims=True) + 1e-12)
+    noise_rms = rms / tf.pow(10.0, snr_db / 20.0)
+    clips = clips + noise_rms * tf.random.normal(tf.shape(clips))
+
+    # Time shift: roll each clip by up to half its length
+    shifts = tf.random.uniform([batch, 1], 0, n_samples // 2, dtype=tf.int32)
+    positions = (tf.range(n_samples)[tf.newaxis, :] + shifts) % n_samples
+    clips = tf.gather(clips, positions, batch_dims=1)
+    return clips, labels
+
+def make_dataset(audio, labels, indices, batch_size=BATCH_SIZE, shuffle=False, augment=False,
+                 cache_path=None, seed=None):
+    """
+    Streams (features, one-hot label) batches for the clips at indices.
+    audio may be a memory-mapped array (see write_synthetic_dataset): clips
+    are read one batch at a time, so the dataset never has to fit in RAM.
+    Features are extracted with extract_spectrogram_features_batch in
+    parallel map calls and the next batches are prefetched while the model
+    trains. cache_path caches the extracted features on disk after the first
+    epoch; it cannot be combined with augment, which must change every epoch.
+    """
+    if augment and cache_path:
+        raise ValueError("Feature caching would freeze the augmentation; use one or the other")
+
+    def load_batch(batch_indices):
+        # Sorted reads are much faster on a memory map; labels follow the same order
+        batch_indices = np.sort(batch_indices)
+        return np.asarray(audio[batch_indices], dtype=np.float32), labels[batch_indices].astype(np.int32)
+
+    def features_batch(clips):
+        features = extract_spectrogram_features_batch(clips, SAMPLE_RATE, N_MFCC, dtype=np.float32, verbose=False)
+        return features[..., np.newaxis]
+
+    def load(batch_indices):
+        clips, batch_labels = tf.numpy_function(load_batch, [batch_indices], [tf.float32, tf.int32])
+        clips.set_shape([None, N_SAMPLES])
+        batch_labels.set_shape([None])
+        return clips, batch_labels
+
+    def extract(clips, batch_labels):
+        features = tf.numpy_function(features_batch, [clips], tf.float32)
+        features.set_shape([None, N_MFCC, FIXED_TIME_STEPS, 1])
+        return features, tf.one_hot(batch_labels, NUM_CLASSES)
+
+    ds = tf.data.Dataset.from_tensor_slices(np.asarray(indices, dtype=np.int64))
+    if shuffle and not cache_path:
+        ds = ds.shuffle(len(indices), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+    ds = ds.map(load, num_parallel_calls=tf.data.AUTOTUNE)
+    if augment:
+        ds = ds.map(_augment_batch, num_parallel_calls=tf.data.AUTOTUNE)
+    ds = ds.map(extract, num_parallel_calls=tf.data.AUTOTUNE)
+    if cache_path:
+        Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+        ds = ds.unbatch().cache(str(cache_path))
+        if shuffle:
+            ds = ds.shuffle(len(indices), seed=seed, reshuffle_each_iteration=True)
+        ds = ds.batch(batch_size)
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+def make_feature_dataset(features, labels, indices, batch_size=BATCH_SIZE, shuffle=False, seed=None):
+    """
+    Like make_dataset, for features already extracted by write_feature_file:
+    batches are gathered from the (memory-mapped) feature array as they are
+    needed. No augmentation, since that works on the raw clips.
+    """
+    def load_batch(batch_indices):
+        batch_indices = np.sort(batch_indices)
+        return np.asarray(features[batch_indices], dtype=np.float32)[..., np.newaxis], labels[batch_indices].astype(np.int32)
+
+    def load(batch_indices):
+        batch_features, batch_labels = tf.numpy_function(load_batch, [batch_indices], [tf.float32, tf.int32])
+        batch_features.set_shape([None, N_MFCC, FIXED_TIME_STEPS, 1])
+        batch_labels.set_shape([None])
+        return batch_features, tf.one_hot(batch_labels, NUM_CLASSES)
+
+    ds = tf.data.Dataset.from_tensor_slices(np.asarray(indices, dtype=np.int64))
+    if shuffle:
+        ds = ds.shuffle(len(indices), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size).map(load, num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+def train_test_indices(n_clips, test_size=0.2, seed=42):
+    """Shuffled train/test index split (no copies of the data itself)."""
+    indices = np.random.default_rng(seed).permutation(n_clips)
+    n_test = int(round(n_clips * test_size))
+    return indices[n_test:], indices[:n_test]
+
+
+# --- 6. Main Execution Block ---
 
 if __name__ == "__main__":
-    # Generate data
-    X_audio, y = create_synthetic_audio()
-    
-    # Extract features
-    X = extract_spectrogram_features(X_audio, SAMPLE_RATE, N_MFCC)
-    
-    # Reshape data for CNN: add a channel dimension
-    # The input shape is now determined dynamically
-    INPUT_SHAPE = (X.shape[1], X.shape[2], 1)
-    X = X.reshape(X.shape[0], *INPUT_SHAPE)
-    
-    # One-hot encode labels
-    y_categorical = to_categorical(y, num_classes=NUM_CLASSES)
+    # Generate the dataset once into a memory map, then stream it
+    if Path(DATASET_PATH).exists():
+        X_audio, y = load_synthetic_dataset(DATASET_PATH)
+    else:
+        X_audio, y = write_synthetic_dataset(DATASET_PATH, N_SAMPLES_PER_CLASS, seed=42)
     
-    # Split data into training and testing sets
-    X_train, X_test, y_train, y_test = train_test_split(X, y_categorical, test_size=0.2, random_state=42)
+    # Split data into training and testing sets (indices only)
+    train_idx, test_idx = train_test_indices(len(y), test_size=0.2, seed=42)
+    train_ds = make_dataset(X_audio, y, train_idx, shuffle=True, augment=AUGMENT, seed=42)
+    test_ds = make_dataset(X_audio, y, test_idx, cache_path=Path(FEATURE_CACHE_DIR) / "test")
     
-    print(f"Training data shape: {X_train.shape}")
-    print(f"Test data shape: {X_test.shape}")
+    INPUT_SHAPE = (N_MFCC, FIXED_TIME_STEPS, 1)
+    print(f"Training clips: {len(train_idx)}")
+    print(f"Test clips: {len(test_idx)}")
     print(f"Model Input Shape: {INPUT_SHAPE}")
     
     # Build and summarize the model
@@ -167,15 +386,14 @@ if __name__ == "__main__":
     
     # Train the model
     print("\nStarting model training...")
-    history = model.fit(X_train, y_train,
+    history = model.fit(train_ds,
                         epochs=EPOCHS,
-                        batch_size=BATCH_SIZE,
-                        validation_data=(X_test, y_test),
+                        validation_data=test_ds,
                         verbose=1)
     
     # Evaluate the model
     print("\nEvaluating model on test data...")
-    loss, accuracy = model.evaluate(X_test, y_test, verbose=0)
+    loss, accuracy = model.evaluate(test_ds, verbose=0)
     print(f"Test Accuracy: {accuracy*100:.2f}%")
     
     # Save the trained model
@@ -0,0 +1,294 @@
+"""
+Streaming threat detection for field gateways.
+
+Takes a continuous 16 kHz mono PCM stream in chunks of any size instead of
+fixed 2-second clips. Each hop (hop_length new samples) adds one
+spectrogram frame, computed from just the last n_fft samples; the model
+input is the most recent FIXED_TIME_STEPS frames, kept in a ring buffer, so
+nothing is recomputed as the window slides. The frames are the same as
+extract_spectrogram_features computes for a clip (audio_features.py).
+
+Model scores are smoothed with an exponential moving average and a
+detection opens when a threat class rises above on_threshold and closes
+when it falls below off_threshold (hysteresis), so one chainsaw run is one
+event rather than a flicker of per-hop hits.
+
+    python streaming_detector.py --model audio_classifier_quantized.tflite recording.wav
+    arecord -q -f S16_LE -r 16000 -c 1 -t raw | python streaming_detector.py --model audio_classifier.h5 -
+
+Events are printed as JSON lines. Real-time factor: benchmarks/bench_streaming.py.
+"""
+import argparse
+import json
+import sys
+import wave
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+import scipy.signal
+
+from audio_features import CLASS_NAMES, FIXED_TIME_STEPS, N_MFCC, SAMPLE_RATE
+
+N_FFT = 512
+HOP_LENGTH = 256
+BACKGROUND_CLASSES = ("forest_noise",)
+
+
+class SpectrogramStream:
+    """
+    Incremental version of extract_spectrogram_features. push() takes any
+    number of new samples and returns how many frames they completed; the
+    latest fixed_time_steps frames are available from window().
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, n_mfcc=N_MFCC, n_fft=N_FFT, hop_length=HOP_LENGTH,
+                 fixed_time_steps=FIXED_TIME_STEPS):
+        self.n_mfcc = n_mfcc
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.fixed_time_steps = fixed_time_steps
+
+        # scipy.signal.spectrogram's defaults (Tukey window, constant detrend,
+        # one-sided density scaling), evaluated only for the n_mfcc bins kept:
+        # one small matrix product per frame instead of a full FFT.
+        window = scipy.signal.get_window(("tukey", 0.25), n_fft)
+        bins = np.arange(n_mfcc)[:, np.newaxis]
+        self._dft = window * np.exp(-2j * np.pi * bins * np.arange(n_fft) / n_fft)
+        self._scale = np.full(n_mfcc, 2.0 / (sample_rate * np.sum(window ** 2)))
+        self._scale[0] /= 2  # DC is not doubled
+        if n_mfcc > n_fft // 2:
+            self._scale[n_fft // 2] /= 2  # nor is Nyquist
+
+        # The last n_fft samples; the newest hop_length go at the end
+        self._samples = np.zeros(n_fft)
+        self._buffered = 0  # samples in _samples (until it first fills)
+        self._since_frame = 0  # samples received since the last frame
+        # Each frame is written twice, fixed_time_steps apart, so the window
+        # is always one contiguous slice of the ring
+        self._frames = np.zeros((n_mfcc, 2 * fixed_time_steps))
+        self._next = 0
+        self.frames = 0  # frames computed so far
+
+    @property
+    def samples_to_next_frame(self) -> int:
+        if self._buffered < self.n_fft:
+            return self.n_fft - self._buffered
+        return self.hop_length - self._since_frame
+
+    @property
+    def ready(self) -> bool:
+        """Whether a full window of frames is available."""
+        return self.frames >= self.fixed_time_steps
+
+    def push(self, samples) -> int:
+        samples = np.asarray(samples, dtype=np.float64).ravel()
+        new_frames = 0
+        while len(samples):
+            needed = self.samples_to_next_frame
+            taken, samples = samples[:needed], samples[needed:]
+            self._samples[:-len(taken)] = self._samples[len(taken):]
+            self._samples[-len(taken):] = taken
+            if self._buffered < self.n_fft:
+                self._buffered += len(taken)
+                complete = self._buffered == self.n_fft
+            else:
+                self._since_frame += len(taken)
+                complete = self._since_frame == self.hop_length
+            if complete:
+                self._add_frame()
+                self._since_frame = 0
+                new_frames += 1
+        return new_frames
+
+    def _add_frame(self):
+        segment = self._samples - self._samples.mean()
+        frame = np.abs(self._dft @ segment) ** 2 * self._scale
+        self._frames[:, self._next] = frame
+        self._frames[:, self._next + self.fixed_time_steps] = frame
+        self._next = (self._next + 1) % self.fixed_time_steps
+        self.frames += 1
+
+    def window(self) -> np.ndarray:
+        """The latest (n_mfcc, fixed_time_steps) frames, oldest first (a view)."""
+        return self._frames[:, self._next:self._next + self.fixed_time_steps]
+
+
+class TFLiteModel:
+    """A TFLite classifier taking one (n_mfcc, time_steps) window; int8 I/O handled."""
+
+    def __init__(self, model_path, num_threads=1):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                import tensorflow as tf
+                Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=str(model_path), num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+
+    def __call__(self, window: np.ndarray) -> np.ndarray:
+        batch = np.asarray(window, dtype=np.float32).reshape(self.input["shape"])
+        if self.input["dtype"] != np.float32:
+            scale, zero_point = self.input["quantization"]
+            info = np.iinfo(self.input["dtype"])
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(self.input["dtype"])
+        self.interpreter.set_tensor(self.input["index"], batch)
+        self.interpreter.invoke()
+        scores = self.interpreter.get_tensor(self.output["index"])[0].astype(np.float32)
+        if self.output["quantization"][0]:
+            scale, zero_point = self.output["quantization"]
+            scores = (scores - zero_point) * scale
+        return scores
+
+
+class KerasModel:
+    """A Keras (.h5 / .keras) classifier taking one (n_mfcc, time_steps) window."""
+
+    def __init__(self, model_path):
+        import tensorflow as tf
+
+        self.model = tf.keras.models.load_model(model_path)
+        # A traced call avoids Model.predict()'s per-call setup, which would
+        # dominate at one window per hop
+        self._predict = tf.function(lambda batch: self.model(batch, training=False))
+
+    def __call__(self, window: np.ndarray) -> np.ndarray:
+        batch = np.asarray(window, dtype=np.float32)[np.newaxis, ..., np.newaxis]
+        return self._predict(batch).numpy()[0]
+
+
+def load_model(model_path, num_threads=1) -> Callable[[np.ndarray], np.ndarray]:
+    if Path(model_path).suffix == ".tflite":
+        return TFLiteModel(model_path, num_threads)
+    return KerasModel(model_path)
+
+
+@dataclass
+class Detection:
+    label: str
+    start_seconds: float
+    end_seconds: Optional[float]  # None while still ongoing
+    peak_score: float
+
+
+class HysteresisSmoother:
+    """
+    Per-class EMA of the model scores. A class becomes active when its
+    smoothed score reaches on_threshold and stays active until it drops
+    below off_threshold; background classes never raise detections.
+    """
+
+    def __init__(self, class_names: Sequence[str] = CLASS_NAMES, alpha=0.3, on_threshold=0.7,
+                 off_threshold=0.4, background: Sequence[str] = BACKGROUND_CLASSES):
+        if not 0 <= off_threshold <= on_threshold <= 1:
+            raise ValueError("Need 0 <= off_threshold <= on_threshold <= 1")
+        self.class_names = list(class_names)
+        self.alpha = alpha
+        self.on_threshold = on_threshold
+        self.off_threshold = off_threshold
+        self.watched = [i for i, name in enumerate(self.class_names) if name not in background]
+        self.smoothed: Optional[np.ndarray] = None
+        self.active = {}  # class index -> open Detection
+
+    def update(self, scores: np.ndarray, time_seconds: float) -> List[Detection]:
+        """Feed one hop's scores; returns detections that opened or closed."""
+        scores = np.asarray(scores, dtype=np.float64)
+        if self.smoothed is None:
+            self.smoothed = scores.copy()
+        else:
+            self.smoothed += self.alpha * (scores - self.smoothed)
+
+        changed = []
+        for index in self.watched:
+            score = float(self.smoothed[index])
+            detection = self.active.get(index)
+            if detection is None and score >= self.on_threshold:
+                detection = self.active[index] = Detection(self.class_names[index], time_seconds, None, score)
+                changed.append(detection)
+            elif detection is not None:
+                detection.peak_score = max(detection.peak_score, score)
+                if score < self.off_threshold:
+                    detection.end_seconds = time_seconds
+                    del self.active[index]
+                    changed.append(detection)
+        return changed
+
+
+class StreamingDetector:
+    """
+    Feeds audio through SpectrogramStream and runs the model every
+    infer_every hops once a full window is available (1 = every hop,
+    16 ms at the defaults). Times are seconds of audio since the start.
+    """
+
+    def __init__(self, model: Callable[[np.ndarray], np.ndarray], smoother: Optional[HysteresisSmoother] = None,
+                 infer_every=1, sample_rate=SAMPLE_RATE, **stream_options):
+        self.model = model
+        self.smoother = smoother or HysteresisSmoother()
+        self.infer_every = max(1, infer_every)
+        self.sample_rate = sample_rate
+        self.stream = SpectrogramStream(sample_rate=sample_rate, **stream_options)
+        self.samples_seen = 0
+        self.inferences = 0
+
+    def process(self, samples) -> List[Detection]:
+        """Feed a chunk of float samples in [-1, 1); returns detections opened or closed in it."""
+        samples = np.asarray(samples, dtype=np.float64).ravel()
+        events = []
+        # Split at frame boundaries so each inference sees the window as of its own hop
+        while len(samples):
+            step = self.stream.samples_to_next_frame
+            chunk, samples = samples[:step], samples[step:]
+            self.samples_seen += len(chunk)
+            if self.stream.push(chunk) and self.stream.ready \
+                    and (self.stream.frames - self.stream.fixed_time_steps) % self.infer_every == 0:
+                scores = self.model(self.stream.window())
+                self.inferences += 1
+                events += self.smoother.update(scores, self.samples_seen / self.sample_rate)
+        return events
+
+
+def read_pcm_chunks(source, chunk_samples):
+    """Float chunks from a 16-bit mono WAV path, or raw s16le PCM on stdin ("-")."""
+    if source == "-":
+        stream = sys.stdin.buffer
+        while chunk := stream.read(chunk_samples * 2):
+            yield np.frombuffer(chunk[:len(chunk) // 2 * 2], dtype="<i2") / 32768.0
+        return
+    with wave.open(str(source)) as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1 or wav.getframerate() != SAMPLE_RATE:
+            raise SystemExit(f"{source}: need 16-bit mono PCM at {SAMPLE_RATE} Hz")
+        while chunk := wav.readframes(chunk_samples):
+            yield np.frombuffer(chunk, dtype="<i2") / 32768.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="16 kHz 16-bit mono WAV file, or - for raw s16le PCM on stdin")
+    parser.add_argument("--model", default="audio_classifier_quantized.tflite", help=".tflite, .h5 or .keras")
+    parser.add_argument("--infer-every", type=int, default=1, help="run the model every N hops")
+    parser.add_argument("--alpha", type=float, default=0.3, help="EMA smoothing factor per inference")
+    parser.add_argument("--on-threshold", type=float, default=0.7)
+    parser.add_argument("--off-threshold", type=float, default=0.4)
+    parser.add_argument("--chunk-ms", type=float, default=100, help="read size")
+    parser.add_argument("--threads", type=int, default=1, help="TFLite interpreter threads")
+    args = parser.parse_args()
+
+    detector = StreamingDetector(
+        load_model(args.model, args.threads),
+        HysteresisSmoother(alpha=args.alpha, on_threshold=args.on_threshold, off_threshold=args.off_threshold),
+        infer_every=args.infer_every,
+    )
+    for chunk in read_pcm_chunks(args.source, int(SAMPLE_RATE * args.chunk_ms / 1000)):
+        for detection in detector.process(chunk):
+            print(json.dumps(asdict(detection)), flush=True)
+    # Close whatever is still active when the stream ends
+    for detection in detector.smoother.active.values():
+        detection.end_seconds = detector.samples_seen / SAMPLE_RATE
+        print(json.dumps(asdict(detection)), flush=True)
@@ -0,0 +1,199 @@
+"""
+Hyperparameter sweep: trains every combination of the given settings in
+parallel worker processes and tabulates the results.
+
+    python sweep_models.py --conv-filters 16,32 32,64 --dense-units 64 128 --epochs 20
+    python sweep_models.py --workers 2 --threads-per-worker 2 --learning-rate 1e-3 3e-4
+
+The synthetic dataset (msitushield_model.DATASET_PATH) is generated if it
+does not exist, and its features are extracted once into a memory-mapped
+.npy next to it. Workers open that file read-only, so all of them share one
+copy through the page cache instead of each extracting or holding their
+own. Training uses these fixed features (no augmentation) on the same
+train/test split as msitushield_model.py.
+
+Each worker is a separate process limited to ``--threads-per-worker``
+threads (TensorFlow intra-op, tf.data and BLAS), so ``--workers`` x
+``--threads-per-worker`` should not exceed the cores available. Per
+configuration the sweep saves ``<out>/<name>/model.keras`` and
+``model.tflite`` (float32) and reports test accuracy, training time,
+parameter count, file sizes and single-threaded TFLite latency per window;
+the table is printed best first and written to ``<out>/results.csv``.
+"""
+import argparse
+import csv
+import itertools
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                    "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS")
+COLUMNS = ("name", "conv_filters", "dense_units", "batch_size", "learning_rate", "epochs", "seed",
+           "accuracy", "train_seconds", "params", "keras_kb", "tflite_kb", "tflite_us", "error")
+
+
+def run_name(config):
+    learning_rate = config["learning_rate"] or "default"
+    return (f"c{'-'.join(map(str, config['conv_filters']))}_d{config['dense_units']}_b{config['batch_size']}"
+            f"_lr{learning_rate}_e{config['epochs']}_s{config['seed']}")
+
+
+def _init_worker(threads):
+    # Runs before TensorFlow is imported in the worker, so the limits apply to
+    # every pool it creates
+    for variable in THREAD_VARIABLES:
+        os.environ[variable] = str(threads)
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def train_config(config, features_path, labels_path, out_dir, threads, tflite_runs):
+    """Trains one configuration in a worker process; returns its results row."""
+    import tensorflow as tf
+
+    from msitushield_model import NUM_CLASSES, build_model, make_feature_dataset, train_test_indices
+    from streaming_detector import TFLiteModel
+
+    features = np.load(features_path, mmap_mode="r")
+    labels = np.load(labels_path)
+    train_idx, test_idx = train_test_indices(len(labels), test_size=0.2, seed=42)
+
+    tf.keras.backend.clear_session()
+    tf.keras.utils.set_random_seed(config["seed"])
+    options = tf.data.Options()
+    options.threading.private_threadpool_size = threads
+    train_ds = make_feature_dataset(features, labels, train_idx, batch_size=config["batch_size"],
+                                    shuffle=True, seed=config["seed"]).with_options(options)
+    test_ds = make_feature_dataset(features, labels, test_idx, batch_size=256).with_options(options)
+
+    model = build_model(features.shape[1:] + (1,), NUM_CLASSES, conv_filters=config["conv_filters"],
+                        dense_units=config["dense_units"], learning_rate=config["learning_rate"])
+    start = time.perf_counter()
+    model.fit(train_ds, epochs=config["epochs"], verbose=0)
+    train_seconds = time.perf_counter() - start
+    _, accuracy = model.evaluate(test_ds, verbose=0)
+
+    run_dir = Path(out_dir) / config["name"]
+    run_dir.mkdir(parents=True, exist_ok=True)
+    keras_path = run_dir / "model.keras"
+    model.save(keras_path)
+    tflite_path = run_dir / "model.tflite"
+    tflite_path.write_bytes(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+
+    interpreter = TFLiteModel(tflite_path, num_threads=1)
+    window = np.asarray(features[test_idx[0]])
+    for _ in range(10):
+        interpreter(window)
+    start = time.perf_counter()
+    for _ in range(tflite_runs):
+        interpreter(window)
+    tflite_us = (time.perf_counter() - start) / tflite_runs * 1e6
+
+    return {
+        **config,
+        "conv_filters": "-".join(map(str, config["conv_filters"])),
+        "accuracy": round(float(accuracy), 4),
+        "train_seconds": round(train_seconds, 1),
+        "params": model.count_params(),
+        "keras_kb": round(keras_path.stat().st_size / 1024, 1),
+        "tflite_kb": round(tflite_path.stat().st_size / 1024, 1),
+        "tflite_us": round(tflite_us, 1),
+        "error": "",
+    }
+
+
+def prepare_features(dataset_path, clips_per_class):
+    """Paths of the feature memory map and labels, built when missing or stale."""
+    from msitushield_model import features_path_for, labels_path_for, load_feature_file
+
+    load_feature_file(dataset_path, clips_per_class)
+    return features_path_for(dataset_path), labels_path_for(dataset_path)
+
+
+def print_table(rows):
+    shown = [column for column in COLUMNS if column != "error"]
+    widths = {column: max(len(column), *(len(str(row.get(column, ""))) for row in rows)) for column in shown}
+    print("  ".join(column.rjust(widths[column]) for column in shown))
+    for row in rows:
+        line = "  ".join(str(row.get(column, "")).rjust(widths[column]) for column in shown)
+        print(line + (f"  FAILED: {row['error']}" if row.get("error") else ""))
+
+
+def main():
+    from msitushield_model import BATCH_SIZE, DATASET_PATH, EPOCHS, N_SAMPLES_PER_CLASS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conv-filters", nargs="+", default=["32,64"],
+                        help="comma-separated filters per conv block, e.g. 16,32 32,64,64")
+    parser.add_argument("--dense-units", nargs="+", type=int, default=[128])
+    parser.add_argument("--batch-size", nargs="+", type=int, default=[BATCH_SIZE])
+    parser.add_argument("--learning-rate", nargs="+", type=float, default=[None])
+    parser.add_argument("--epochs", nargs="+", type=int, default=[EPOCHS])
+    parser.add_argument("--seeds", nargs="+", type=int, default=[42], help="repeat each configuration per seed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--threads-per-worker", type=int)
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--clips-per-class", type=int, default=N_SAMPLES_PER_CLASS,
+                        help="when generating the dataset")
+    parser.add_argument("--tflite-runs", type=int, default=500)
+    parser.add_argument("--out", default="sweep_results")
+    args = parser.parse_args()
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+
+    configs = []
+    for filters, dense_units, batch_size, learning_rate, epochs, seed in itertools.product(
+            args.conv_filters, args.dense_units, args.batch_size, args.learning_rate, args.epochs, args.seeds):
+        config = {"conv_filters": tuple(int(f) for f in filters.split(",")), "dense_units": dense_units,
+                  "batch_size": batch_size, "learning_rate": learning_rate, "epochs": epochs, "seed": seed}
+        configs.append({"name": run_name(config), **config})
+
+    features_path, labels_path = prepare_features(args.dataset, args.clips_per_class)
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    print(f"{len(configs)} configurations on {args.workers} workers x {threads} threads")
+
+    rows = []
+    start = time.perf_counter()
+    # spawn: TensorFlow is not fork-safe, and each worker must set its thread
+    # limits before importing it
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context("spawn"),
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        futures = {
+            pool.submit(train_config, config, str(features_path), str(labels_path), str(out_dir), threads,
+                        args.tflite_runs): config
+            for config in configs
+        }
+        for future in as_completed(futures):
+            config = futures[future]
+            try:
+                row = future.result()
+            except Exception as exc:
+                traceback.print_exc()
+                message = (str(exc).strip().splitlines() or [""])[0]
+                row = {**config, "conv_filters": "-".join(map(str, config["conv_filters"])),
+                       "error": f"{type(exc).__name__}: {message}"}
+            rows.append(row)
+            print(f"[{len(rows)}/{len(configs)}] {row['name']}: "
+                  + (row["error"] or f"accuracy {row['accuracy']:.4f}, {row['train_seconds']}s"))
+
+    rows.sort(key=lambda row: (row.get("accuracy") is None, -(row.get("accuracy") or 0), row.get("tflite_us", 0)))
+    print(f"\nSweep finished in {time.perf_counter() - start:.0f}s\n")
+    print_table(rows)
+    with open(out_dir / "results.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"\nResults written to {out_dir / 'results.csv'}")
+
+
+if __name__ == "__main__":
+    main()